@@ -1,10 +1,14 @@
 import streamlit as st
 import pandas as pd
+import functools
 import math
 import database as db
+import jobs
 
 # --- Configuration de la Page ---
 st.set_page_config(layout="wide", page_title="Gestion Fournisseurs GA")
+db.init_db()
+db.start_maintenance()
 
 st.markdown("""
 <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/bootstrap-icons.min.css">
@@ -13,20 +17,64 @@ st.markdown("""
 # --- Constantes pour les options ---
 TAG_OPTIONS = ["Fournisseur critique", "Fournisseur non critique", "Conforme", "Non conforme", "Audit à planifier", "RSE+", "Innovation"]
 AUDIT_STATUS_OPTIONS = ["Non concerné", "En attente", "Planifié", "Réalisé", "Non-conformité majeure"]
+CANTON_OPTIONS = ["Genève", "Vaud", "France", "Autre"]
+IMPORT_FIELD_LABELS = {field: label for label, field in db.IMPORT_COLUMNS.items()}
+PROSPECT_OPTIONS = {"Tous": None, "Prospects": True, "Non prospects": False}
+EXPORT_LABELS = {"csv": "CSV", "xlsx": "Excel", "parquet": "Parquet"}
+SORT_OPTIONS = {"Raison sociale": "raison_sociale", "Numéro de fournisseur": "id_oracle", "Date de création": "date_creation", "Dernière modification": "derniere_modif"}
 
 # --- État de Session ---
 if 'page_number' not in st.session_state:
     st.session_state.page_number = 1
+if 'page_cursors' not in st.session_state:
+    st.session_state.page_cursors = [None]
+if 'list_query' not in st.session_state:
+    st.session_state.list_query = None
 if 'import_analysis' not in st.session_state:
     st.session_state.import_analysis = None
+if 'import_job' not in st.session_state:
+    st.session_state.import_job = None
+if 'conflict_editor' not in st.session_state:
+    st.session_state.conflict_editor = 0
+if 'import_error' not in st.session_state:
+    st.session_state.import_error = None
 if 'user_message' not in st.session_state:
     st.session_state.user_message = None
 if 'show_delete_all_confirmation' not in st.session_state:
     st.session_state.show_delete_all_confirmation = False
 if 'supplier_to_delete' not in st.session_state:
     st.session_state.supplier_to_delete = None
+if 'suppliers_to_delete' not in st.session_state:
+    st.session_state.suppliers_to_delete = None
+if 'backup_to_restore' not in st.session_state:
+    st.session_state.backup_to_restore = None
+if 'grid_version' not in st.session_state:
+    st.session_state.grid_version = 0
 
 RECORDS_PER_PAGE = 10
+# Mode tableau : une seule grille par page, d'où des pages bien plus grandes.
+LIST_MODES = ["Fiches", "Tableau"]
+GRID_PAGE_SIZES = [100, 250, 500, 1000]
+GRID_COLUMNS = {
+    "raison_sociale": "Raison sociale",
+    "id_oracle": "Numéro de fournisseur",
+    "pays_canton": "Pays/Canton",
+    "statut_audit": "Statut Audit",
+    "tags": "Tags",
+    "est_prospect": st.column_config.CheckboxColumn("Prospect"),
+    "date_creation": "Date de création",
+    "derniere_modif": "Dernière modification",
+}
+JOB_POLL_SECONDS = 1
+# Revue des conflits d'import : seule la page affichée est chargée depuis la table des conflits.
+CONFLICT_PAGE_SIZE = 50
+CONFLICT_VIEWS = {"Tous": None, "À approuver": False, "Approuvés": True}
+# Actions groupées : None laisse la valeur de chaque fournisseur inchangée.
+BULK_UNCHANGED = "Inchangé"
+BULK_PROSPECT_OPTIONS = {BULK_UNCHANGED: None, "Prospect": True, "Non prospect": False}
+BACKUP_REASONS = {"manuelle": "Manuelle", "periodique": "Périodique", "import": "Avant import",
+                  "suppression_totale": "Avant suppression totale", "suppression_groupee": "Avant suppression groupée",
+                  "modification_groupee": "Avant modification groupée", "restauration": "Avant restauration"}
 
 # --- Fonctions de l'UI ---
 @st.dialog("Ajouter / Modifier un Fournisseur")
@@ -36,15 +84,22 @@ def supplier_form(supplier_id=None):
     else:
         supplier_data = {}
 
-    prefill_data = db.get_suppliers_prefill_data()
-    supplier_names = [""] + list(prefill_data.keys())
+    st.write("Pour pré-remplir, recherchez un fournisseur connu :")
+    prefill_term = st.text_input("Rechercher un fournisseur", placeholder="Début ou partie du nom...", label_visibility="collapsed")
+    selected_data = {}
+    if prefill_term:
+        suggestions = {row['id']: row for row in db.suggest_suppliers(prefill_term).to_dict('records')}
+        if suggestions:
+            selected_id = st.selectbox("Choisir un fournisseur", options=[None] + list(suggestions), index=0, label_visibility="collapsed",
+                                       format_func=lambda i: "" if i is None else f"{suggestions[i]['raison_sociale']} ({suggestions[i]['id_oracle'] or 'sans numéro'})")
+            if selected_id is not None:
+                selected_data = db.get_supplier_by_id(selected_id) or {}
+        else:
+            st.caption("Aucun fournisseur correspondant.")
 
     with st.form("supplier_form"):
-        st.write("Pour pré-remplir, choisissez un fournisseur connu :")
-        selected_name = st.selectbox("Choisir un fournisseur", options=supplier_names, index=0, label_visibility="collapsed")
         st.markdown("---")
-        default_name = selected_name if selected_name else supplier_data.get('raison_sociale', '')
-        selected_data = prefill_data.get(selected_name, {})
+        default_name = selected_data.get('raison_sociale', supplier_data.get('raison_sociale', ''))
         default_id_oracle = selected_data.get('id_oracle', supplier_data.get('id_oracle', ''))
         default_adresse = selected_data.get('adresse', supplier_data.get('adresse', ''))
 
@@ -53,7 +108,7 @@ def supplier_form(supplier_id=None):
             raison_sociale = st.text_input("Raison Sociale", value=default_name)
             id_oracle = st.text_input("Numéro de fournisseur", value=default_id_oracle)
             adresse = st.text_area("Adresse", value=default_adresse)
-            pays_canton = st.selectbox("Pays/Canton", ["Genève", "Vaud", "France", "Autre"], index=0)
+            pays_canton = st.selectbox("Pays/Canton", CANTON_OPTIONS, index=0)
             est_prospect = st.checkbox("Prospect", value=supplier_data.get('est_prospect', False))
         with tab2:
             contacts = st.text_area("Contacts", value=supplier_data.get('contacts', ''))
@@ -72,6 +127,133 @@ def supplier_form(supplier_id=None):
                 st.session_state.user_message = {"text": f"Fournisseur '{raison_sociale}' ajouté.", "icon": "🎉"}
             st.rerun()
 
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def import_job_status():
+    # Seul ce fragment est réexécuté pendant la tâche : le reste de la page reste utilisable.
+    job = jobs.get_job(st.session_state.import_job)
+    if job and job['statut'] in (jobs.QUEUED, jobs.RUNNING):
+        label = "Analyse du fichier" if job['type'] == 'analyse' else "Importation"
+        st.progress(job['progression'], text=f"{label} : {job['message'] or 'en attente...'}")
+        return
+
+    st.session_state.import_job = None
+    if job is None:
+        st.session_state.import_error = "La tâche d'import est introuvable."
+    elif job['statut'] == jobs.FAILED:
+        st.session_state.import_error = job['message']
+    elif job['type'] == 'analyse':
+        new, conflict_count = jobs.get_result(job['id'])
+        st.session_state.import_analysis = {'job': job['id'], 'new': new, 'conflicts': conflict_count}
+    else:
+        result = jobs.get_result(job['id'])
+        text = f"Importation terminée : {result['inserted']} fournisseurs ajoutés, {result['updated']} mis à jour."
+        if result.get('skipped'):
+            text += f" {result['skipped']} conflits ignorés (fournisseurs supprimés depuis l'analyse)."
+        st.session_state.user_message = {"text": text, "icon": "✅"}
+    st.rerun()
+
+def supplier_detail(supplier_id):
+    # Volet de détail du mode tableau : la fiche complète du fournisseur sélectionné.
+    supplier = db.get_supplier_by_id(supplier_id)
+    if not supplier:
+        st.info("Ce fournisseur n'existe plus.")
+        return
+    st.subheader(supplier['raison_sociale'])
+    st.write(f"**Numéro de fournisseur:** {supplier['id_oracle'] or 'N/A'}")
+    st.write(f"**Adresse:** {supplier['adresse']}")
+    st.write(f"**Pays/Canton:** {supplier['pays_canton']}")
+    st.write(f"**Statut Audit:** {supplier['statut_audit']}")
+    st.write(f"**Tags:** {supplier['tags']}")
+    st.write(f"**Prospect:** {'Oui' if supplier['est_prospect'] else 'Non'}")
+    st.write(f"**Contacts:** {supplier['contacts']}")
+    st.write(f"**Commentaires:** {supplier['commentaires']}")
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Modifier", key="grid_edit", use_container_width=True):
+            supplier_form(supplier_id)
+    with col2:
+        if st.button("Supprimer", key="grid_del", type="primary", use_container_width=True):
+            st.session_state.supplier_to_delete = {'id': supplier_id, 'name': supplier['raison_sociale']}
+            st.rerun()
+
+def bulk_actions(key, count, ids=None, search_term=None, filters=None):
+    # Fournisseurs de la liste `ids`, ou à défaut ceux de la recherche et des filtres : toutes les
+    # modifications choisies sont appliquées en une seule transaction.
+    with st.form(f"bulk_form_{key}"):
+        statut_audit = st.selectbox("Statut Audit", [BULK_UNCHANGED] + AUDIT_STATUS_OPTIONS)
+        prospect = st.selectbox("Prospect", list(BULK_PROSPECT_OPTIONS))
+        add_tags = st.multiselect("Ajouter les tags", TAG_OPTIONS)
+        remove_tags = st.multiselect("Retirer les tags", sorted(set(TAG_OPTIONS) | set(db.get_all_tags())))
+        if st.form_submit_button(f"Modifier les {count} fournisseurs", use_container_width=True):
+            updated = db.bulk_update_suppliers(ids, search_term, filters, statut_audit=None if statut_audit == BULK_UNCHANGED else statut_audit,
+                                               est_prospect=BULK_PROSPECT_OPTIONS[prospect], add_tags=add_tags, remove_tags=remove_tags)
+            st.session_state.user_message = {"text": f"{updated} fournisseurs mis à jour.", "icon": "✅"}
+            st.session_state.grid_version += 1
+            st.rerun()
+    if st.button(f"Supprimer les {count} fournisseurs", key=f"bulk_delete_{key}", type="primary", use_container_width=True):
+        st.session_state.suppliers_to_delete = {'ids': ids, 'search_term': search_term, 'filters': filters, 'count': count}
+        st.rerun()
+
+def start_import(new_suppliers, analysis_id=None):
+    st.session_state.import_job = jobs.submit_import(new_suppliers, analysis_id)
+    st.session_state.import_analysis = None
+    st.rerun()
+
+def conflict_changes(conflict):
+    return " ; ".join(f"{IMPORT_FIELD_LABELS[field]} : {conflict[f'old_{field}'] or '–'} → {conflict[f'new_{field}']}"
+                      for field in conflict['changed_columns'].split(','))
+
+@st.fragment
+def conflict_review(analysis_id, new_suppliers):
+    # Les changements de page et les validations ne réexécutent que ce fragment ; chaque validation est écrite
+    # aussitôt dans la table des conflits de l'analyse, d'où l'import lit les conflits approuvés.
+    with st.expander("Règles d'approbation"):
+        only_fields = st.multiselect("Ne modifient que", list(db.IMPORT_FIELDS), format_func=IMPORT_FIELD_LABELS.get, key="rule_only_fields")
+        empty_fields = st.multiselect("Valeur existante vide pour", list(db.IMPORT_FIELDS), format_func=IMPORT_FIELD_LABELS.get, key="rule_empty_fields")
+        fill_only = st.checkbox("Ne complètent que des champs vides", key="rule_fill_only")
+        criteria = {'only_fields': only_fields or None, 'empty_fields': empty_fields, 'fill_only': fill_only}
+        if only_fields or empty_fields or fill_only:
+            matched = jobs.count_conflicts(analysis_id, **criteria)
+            st.caption(f"{matched} conflits correspondent à ces règles.")
+            col1, col2 = st.columns(2)
+            if col1.button("Approuver", key="rule_approve", disabled=not matched, use_container_width=True):
+                jobs.review_conflicts(analysis_id, True, **criteria)
+                st.session_state.conflict_editor += 1
+            if col2.button("Désapprouver", key="rule_reject", disabled=not matched, use_container_width=True):
+                jobs.review_conflicts(analysis_id, False, **criteria)
+                st.session_state.conflict_editor += 1
+
+    view = st.radio("Afficher", list(CONFLICT_VIEWS), horizontal=True, key="conflict_view")
+    approved = CONFLICT_VIEWS[view]
+    total = jobs.count_conflicts(analysis_id, approved=approved)
+    total_pages = max(1, math.ceil(total / CONFLICT_PAGE_SIZE))
+    page = st.number_input(f"Page (sur {total_pages})", min_value=1, max_value=total_pages, value=1, key=f"conflict_page_{view}")
+    conflicts = jobs.get_conflicts_page(analysis_id, CONFLICT_PAGE_SIZE, (page - 1) * CONFLICT_PAGE_SIZE, approved=approved)
+    if not conflicts.empty:
+        review = conflicts[['raison_sociale', 'approuve']].assign(modifications=conflicts.apply(conflict_changes, axis=1))
+        edited = st.data_editor(review, key=f"conflict_editor_{analysis_id}_{st.session_state.conflict_editor}", hide_index=True, use_container_width=True,
+                                disabled=['raison_sociale', 'modifications'], column_order=['approuve', 'raison_sociale', 'modifications'],
+                                column_config={"approuve": st.column_config.CheckboxColumn("Approuver"),
+                                               "raison_sociale": "Fournisseur",
+                                               "modifications": "Données modifiées"})
+        changed = edited['approuve'] != review['approuve']
+        if changed.any():
+            jobs.review_conflicts(analysis_id, True, rows=conflicts.loc[changed & edited['approuve'], 'rang'])
+            jobs.review_conflicts(analysis_id, False, rows=conflicts.loc[changed & ~edited['approuve'], 'rang'])
+            # Nouvelle clé : l'éditeur repart de l'état enregistré au lieu de rejouer ses modifications.
+            st.session_state.conflict_editor += 1
+            st.rerun()
+
+    approved_count = jobs.count_conflicts(analysis_id, approved=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button(f"Appliquer la sélection ({approved_count})", use_container_width=True):
+            start_import(new_suppliers, analysis_id)
+    with col2:
+        if st.button("Approuver TOUT", type="primary", use_container_width=True):
+            jobs.review_conflicts(analysis_id, True)
+            start_import(new_suppliers, analysis_id)
+
 # --- BARRE LATERALE (SIDEBAR) ---
 with st.sidebar:
     st.header("Actions")
@@ -79,80 +261,64 @@ with st.sidebar:
     uploaded_file = st.file_uploader("Importer un fichier (CSV ou Excel)", type=['csv', 'xlsx'])
     
     if uploaded_file:
-        if st.button("Analyser le fichier d'import"):
-            try:
-                if uploaded_file.name.endswith('.csv'):
-                    df = pd.read_csv(uploaded_file).drop_duplicates(subset=['Raison Sociale'])
-                else:
-                    df = pd.read_excel(uploaded_file).drop_duplicates(subset=['Raison Sociale'])
-                
-                required_cols = ['Raison Sociale', 'Numéro de fournisseur', 'Adresse']
-                if all(col in df.columns for col in required_cols):
-                    with st.spinner("Analyse en cours..."):
-                        new, conflicts = db.analyze_import_data(df)
-                        st.session_state.import_analysis = {'new': new, 'conflicts': conflicts}
-                else:
-                    st.error(f"Le fichier doit contenir les colonnes : {', '.join(required_cols)}.")
-                    st.session_state.import_analysis = None
-            except Exception as e:
-                st.error(f"Une erreur est survenue lors de l'analyse : {e}")
-                st.session_state.import_analysis = None
-    
+        if st.button("Analyser le fichier d'import", disabled=st.session_state.import_job is not None):
+            st.session_state.import_job = jobs.submit_analysis(uploaded_file.getvalue(), uploaded_file.name)
+            st.session_state.import_analysis = None
+            st.session_state.import_error = None
+
+    if st.session_state.import_job is not None:
+        import_job_status()
+    if st.session_state.import_error:
+        st.error(st.session_state.import_error)
+
     if st.session_state.import_analysis:
         st.markdown("---")
         st.subheader("Résultat de l'analyse")
         
         analysis = st.session_state.import_analysis
         new_suppliers = analysis['new']
-        conflicts = analysis['conflicts']
+        conflict_count = analysis['conflicts']
 
-        st.info(f"**{len(new_suppliers)}** nouveaux fournisseurs seront ajoutés.")
-        
-        if conflicts:
-            st.warning(f"**{len(conflicts)}** fournisseurs existants ont des données différentes.")
-            with st.form("conflict_form"):
-                col1, col2 = st.columns(2)
-                with col1:
-                    approve_selected_submitted = st.form_submit_button("Appliquer la sélection")
-                with col2:
-                    approve_all_submitted = st.form_submit_button("Approuver TOUT", type="primary")
-
-                st.markdown("---")
-                approved_conflicts = []
-                for i, conflict in enumerate(conflicts):
-                    with st.expander(f"{conflict['raison_sociale']} - Données modifiées"):
-                        if conflict['id_changed']:
-                            st.write(f"**Numéro de fournisseur :** `{conflict['old_id']}` ➡️ `{conflict['new_id']}`")
-                        if conflict['address_changed']:
-                            st.write(f"**Adresse :** `{conflict['old_adresse']}` ➡️ `{conflict['new_adresse']}`")
-                        
-                        approve = st.checkbox("Approuver ce changement", key=f"approve_{i}")
-                        if approve:
-                            approved_conflicts.append(conflict)
-                
-                if approve_selected_submitted:
-                    inserted, updated = db.execute_import(new_suppliers, approved_conflicts)
-                    st.session_state.user_message = {"text": f"Importation terminée : {inserted} fournisseurs ajoutés, {updated} mis à jour.", "icon": "✅"}
-                    st.session_state.import_analysis = None
-                    st.rerun()
-                
-                if approve_all_submitted:
-                    inserted, updated = db.execute_import(new_suppliers, conflicts)
-                    st.session_state.user_message = {"text": f"Importation terminée : {inserted} fournisseurs ajoutés, {updated} mis à jour.", "icon": "✅"}
-                    st.session_state.import_analysis = None
-                    st.rerun()
+        probable_duplicates = new_suppliers[new_suppliers['doublon_raison_sociale'].notna()]
+        if not probable_duplicates.empty:
+            st.warning(f"**{len(probable_duplicates)}** nouveaux fournisseurs ressemblent à un fournisseur existant ou à une autre ligne du fichier.")
+            with st.expander("Doublons probables"):
+                review = probable_duplicates[['raison_sociale', 'doublon_raison_sociale', 'doublon_score']].assign(ne_pas_creer=False)
+                review = st.data_editor(review, key="duplicate_review", hide_index=True, use_container_width=True,
+                                        disabled=['raison_sociale', 'doublon_raison_sociale', 'doublon_score'],
+                                        column_config={"raison_sociale": "Fournisseur importé",
+                                                       "doublon_raison_sociale": "Fournisseur ressemblant",
+                                                       "doublon_score": st.column_config.ProgressColumn("Similarité", min_value=0, max_value=1, format="percent"),
+                                                       "ne_pas_creer": st.column_config.CheckboxColumn("Ne pas créer")})
+                skipped_rows = review.index[review['ne_pas_creer']]
+            new_suppliers = new_suppliers.drop(index=skipped_rows)
+
+        if new_suppliers.empty and not conflict_count:
+            st.info("Fichier vide ou identique à la base : aucun fournisseur à importer.")
         else:
+            st.info(f"**{len(new_suppliers)}** nouveaux fournisseurs seront ajoutés.")
+
+        if conflict_count:
+            st.warning(f"**{conflict_count}** fournisseurs existants ont des données différentes.")
+            conflict_review(analysis['job'], new_suppliers)
+        elif not new_suppliers.empty:
             if st.button("Confirmer l'ajout des nouveaux fournisseurs"):
-                inserted, _ = db.execute_import(new_suppliers, [])
-                st.session_state.user_message = {"text": f"Importation terminée : {inserted} nouveaux fournisseurs ajoutés.", "icon": "✅"}
-                st.session_state.import_analysis = None
-                st.rerun()
+                start_import(new_suppliers)
 
     st.markdown("---")
     st.subheader("Actions dangereuses")
     if st.button("Supprimer tous les fournisseurs", type="primary"):
         st.session_state.show_delete_all_confirmation = True
 
+    # Sauvegardes prises avant les suppressions et imports importants, et chaque jour par la maintenance.
+    backups = db.list_backups()
+    if not backups.empty:
+        labels = {backup['nom']: f"{backup['date']:%d.%m.%Y %H:%M} — {BACKUP_REASONS.get(backup['motif'], backup['motif'])}" for backup in backups.to_dict('records')}
+        backup_name = st.selectbox("Restaurer une sauvegarde", list(labels), format_func=labels.get)
+        if st.button("Restaurer cette sauvegarde"):
+            st.session_state.backup_to_restore = {'name': backup_name, 'label': labels[backup_name]}
+            st.rerun()
+
 # --- Boîtes de dialogue de confirmation ---
 if st.session_state.show_delete_all_confirmation:
     @st.dialog("Confirmation de suppression totale")
@@ -168,7 +334,7 @@ if st.session_state.show_delete_all_confirmation:
         with col2:
             if st.button("Oui, supprimer tout", type="primary"):
                 db.delete_all_suppliers()
-                st.session_state.user_message = {"text": "Tous les fournisseurs ont été supprimés.", "icon": "🗑️"}
+                st.session_state.user_message = {"text": "Tous les fournisseurs ont été supprimés. Une sauvegarde a été faite au préalable.", "icon": "🗑️"}
                 st.session_state.show_delete_all_confirmation = False
                 st.rerun()
     
@@ -196,6 +362,50 @@ if st.session_state.supplier_to_delete:
     
     confirm_delete_single()
 
+if st.session_state.suppliers_to_delete:
+    @st.dialog("Confirmation de suppression groupée")
+    def confirm_delete_bulk():
+        selection = st.session_state.suppliers_to_delete
+        st.warning(f"Voulez-vous vraiment supprimer ces **{selection['count']}** fournisseurs ?")
+        st.error("Cette action est irréversible.")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Annuler"):
+                st.session_state.suppliers_to_delete = None
+                st.rerun()
+        with col2:
+            if st.button("Confirmer la suppression", type="primary"):
+                deleted = db.bulk_delete_suppliers(selection['ids'], selection['search_term'], selection['filters'])
+                st.session_state.user_message = {"text": f"{deleted} fournisseurs ont été supprimés.", "icon": "🗑️"}
+                st.session_state.suppliers_to_delete = None
+                st.session_state.grid_version += 1
+                st.rerun()
+
+    confirm_delete_bulk()
+
+if st.session_state.backup_to_restore:
+    @st.dialog("Confirmation de restauration")
+    def confirm_restore():
+        backup = st.session_state.backup_to_restore
+        st.warning(f"Remplacer toutes les données par la sauvegarde **{backup['label']}** ?")
+        st.write("L'état actuel est sauvegardé avant la restauration.")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Annuler"):
+                st.session_state.backup_to_restore = None
+                st.rerun()
+        with col2:
+            if st.button("Restaurer", type="primary"):
+                db.restore_backup(backup['name'])
+                st.session_state.user_message = {"text": f"Sauvegarde du {backup['label']} restaurée.", "icon": "♻️"}
+                st.session_state.backup_to_restore = None
+                st.session_state.grid_version += 1
+                st.rerun()
+
+    confirm_restore()
+
 # --- AFFICHAGE PRINCIPAL ---
 st.markdown("<h3><i class='bi bi-airplane-fill'></i> Outil de Gestion des Données Fournisseurs</h3>", unsafe_allow_html=True)
 
@@ -206,26 +416,96 @@ if st.session_state.user_message:
 
 col1, col2 = st.columns([3, 1])
 with col1:
-    search_term = st.text_input("Rechercher par raison sociale", placeholder="Rechercher...")
+    search_term = st.text_input("Rechercher (raison sociale, numéro, adresse, contacts, tags, commentaires)", placeholder="Rechercher...")
 with col2:
     st.write("")
     st.write("")
     if st.button("Ajouter un nouveau fournisseur", use_container_width=True):
         supplier_form()
 
-offset = (st.session_state.page_number - 1) * RECORDS_PER_PAGE
-suppliers_df, total_records = db.get_suppliers(RECORDS_PER_PAGE, offset, search_term)
-total_pages = math.ceil(total_records / RECORDS_PER_PAGE) if total_records > 0 else 1
+with st.expander("Filtres et tri"):
+    col_f1, col_f2, col_f3, col_f4, col_f5 = st.columns([2, 2, 1, 2, 1])
+    with col_f1:
+        selected_cantons = st.multiselect("Pays/Canton", CANTON_OPTIONS)
+    with col_f2:
+        selected_status = st.multiselect("Statut Audit", AUDIT_STATUS_OPTIONS)
+    with col_f3:
+        prospect_choice = st.selectbox("Prospect", list(PROSPECT_OPTIONS))
+    with col_f4:
+        sort_label = st.selectbox("Trier par", list(SORT_OPTIONS))
+    with col_f5:
+        ascending = st.selectbox("Ordre", ["Croissant", "Décroissant"]) == "Croissant"
+
+list_filters = {'pays_canton': selected_cantons, 'statut_audit': selected_status, 'est_prospect': PROSPECT_OPTIONS[prospect_choice]}
+sort_by = SORT_OPTIONS[sort_label]
+
 st.header("Liste des Fournisseurs")
+col_m1, col_m2, col_m3, col_m4 = st.columns([3, 1, 1, 1])
+with col_m1:
+    list_mode = st.radio("Affichage", LIST_MODES, horizontal=True)
+with col_m2:
+    page_size = st.selectbox("Lignes par page", GRID_PAGE_SIZES) if list_mode == "Tableau" else RECORDS_PER_PAGE
+with col_m3:
+    with st.popover("Exporter", use_container_width=True):
+        st.caption("Tous les fournisseurs de la recherche et des filtres en cours, dans l'ordre de tri choisi.")
+        # Le fichier n'est produit qu'au clic, et écrit par lots dans un fichier temporaire.
+        for file_format, label in EXPORT_LABELS.items():
+            st.download_button(label, data=functools.partial(db.export_suppliers_file, file_format, search_term=search_term, filters=list_filters, sort_by=sort_by, ascending=ascending),
+                               file_name=f"fournisseurs.{file_format}", mime=db.EXPORT_FORMATS[file_format], on_click="ignore", use_container_width=True)
+
+# Toute modification de la recherche, des filtres, du tri ou de la taille des pages repart de la première page.
+list_query = (search_term, tuple(selected_cantons), tuple(selected_status), prospect_choice, sort_by, ascending, page_size)
+if st.session_state.list_query != list_query:
+    st.session_state.list_query = list_query
+    st.session_state.page_number = 1
+    st.session_state.page_cursors = [None]
+
+if search_term:
+    # Recherche : résultats classés par pertinence, avec les correspondances surlignées.
+    offset = (st.session_state.page_number - 1) * page_size
+    suppliers_df, total_records = db.search_suppliers(search_term, page_size, offset, filters=list_filters)
+    next_cursor = offset + page_size if offset + page_size < total_records else None
+else:
+    page_cursor = st.session_state.page_cursors[st.session_state.page_number - 1]
+    suppliers_df, next_cursor = db.get_suppliers_page(page_size, page_cursor, None, sort_by, ascending, list_filters)
+    total_records = db.count_suppliers(None, list_filters)
+total_pages = math.ceil(total_records / page_size) if total_records > 0 else 1
+with col_m4:
+    with st.popover("Actions groupées", use_container_width=True, disabled=not total_records):
+        st.caption("Tous les fournisseurs de la recherche et des filtres en cours.")
+        bulk_actions("list", total_records, search_term=search_term, filters=list_filters)
 st.write(f"Affichage de {len(suppliers_df)} sur {total_records} fournisseurs.")
 
-if not suppliers_df.empty:
+if not suppliers_df.empty and list_mode == "Tableau":
+    # Une seule grille pour toute la page ; la sélection d'une ligne ouvre sa fiche dans le volet de droite,
+    # celle de plusieurs lignes les actions groupées sur ces fournisseurs.
+    # Le tri par en-tête de colonne de la grille ne porte que sur la page affichée : l'ordre de
+    # l'ensemble des résultats se règle dans « Filtres et tri ».
+    col_grid, col_detail = st.columns([3, 1])
+    with col_grid:
+        event = st.dataframe(suppliers_df, key=f"supplier_grid_{hash(list_query)}_{st.session_state.page_number}_{st.session_state.grid_version}",
+                             on_select="rerun", selection_mode="multi-row", hide_index=True, use_container_width=True,
+                             column_order=list(GRID_COLUMNS), column_config=GRID_COLUMNS)
+    with col_detail:
+        selected_ids = suppliers_df.iloc[event.selection.rows]['id'].tolist()
+        if len(selected_ids) == 1:
+            supplier_detail(int(selected_ids[0]))
+        elif selected_ids:
+            st.subheader(f"{len(selected_ids)} fournisseurs sélectionnés")
+            bulk_actions("selection", len(selected_ids), ids=selected_ids)
+        else:
+            st.caption("Sélectionnez une ligne pour afficher la fiche du fournisseur, ou plusieurs pour les modifier ensemble.")
+
+if not suppliers_df.empty and list_mode == "Fiches":
     for index, row in suppliers_df.iterrows():
         # --- MODIFICATION DE L'AFFICHAGE ---
         supplier_num = row['id_oracle'] if pd.notna(row['id_oracle']) and row['id_oracle'] else "N/A"
-        expander_title = f"{row['raison_sociale']} ({supplier_num})"
+        supplier_name = row['nom_surligne'] if 'nom_surligne' in row else row['raison_sociale']
+        expander_title = f"{supplier_name} ({supplier_num})"
         
         with st.expander(expander_title):
+            if 'extrait' in row and pd.notna(row['extrait']):
+                st.caption(row['extrait'])
             col1, col2, col3 = st.columns([2, 2, 1])
             with col1:
                 st.write(f"**Statut Audit:** {row['statut_audit']}")
@@ -243,6 +523,7 @@ if not suppliers_df.empty:
                     st.session_state.supplier_to_delete = {'id': row['id'], 'name': row['raison_sociale']}
                     st.rerun()
 
+if not suppliers_df.empty:
     st.write("")
     col_nav1, col_nav2, col_nav3 = st.columns([1, 2, 1])
     with col_nav1:
@@ -253,8 +534,9 @@ if not suppliers_df.empty:
     with col_nav2:
         st.write(f"Page **{st.session_state.page_number}** sur **{total_pages}**")
     with col_nav3:
-        if st.session_state.page_number < total_pages:
+        if next_cursor is not None:
             if st.button("Suivant", use_container_width=True):
+                st.session_state.page_cursors = st.session_state.page_cursors[:st.session_state.page_number] + [next_cursor]
                 st.session_state.page_number += 1
                 st.rerun()
 else:
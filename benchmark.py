@@ -0,0 +1,290 @@
+"""
+Banc d'essai hors ligne des fonctions de database.py sur des bases de fournisseurs synthétiques.
+
+Les fournisseurs et fichiers d'import sont générés de façon déterministe (graine fixe) : noms,
+adresses et contacts à la française, cantons, statuts d'audit, mélanges de tags, doublons et
+conflits dans les fichiers d'import. Chaque mesure est répétée et les résultats sont écrits en JSON ;
+comparés à une référence enregistrée, ils font échouer le script (code de sortie 1) en cas de régression.
+
+Exemples :
+    python benchmark.py --sizes 1000,10000 --output resultats.json
+    python benchmark.py --sizes 1000,10000 --save-baseline benchmark_baseline.json
+    python benchmark.py --sizes 1000,10000 --baseline benchmark_baseline.json
+    python benchmark.py --sizes 1000,10000 --baseline benchmark_baseline.json --read-replica
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import database as db
+import importer
+
+# --- Données de génération ---
+ACTIVITIES = ["Boulangerie", "Transports", "Menuiserie", "Garage", "Imprimerie", "Électricité", "Nettoyage",
+              "Sécurité", "Informatique", "Traiteur", "Chauffage", "Peinture", "Serrurerie", "Jardinage",
+              "Logistique", "Conseil", "Télécoms", "Plâtrerie", "Carrosserie", "Fiduciaire"]
+SURNAMES = ["Dupont", "Favre", "Rochat", "Müller", "Girard", "Bonvin", "Pittet", "Perrin", "Lefèvre", "Morel",
+            "Chevalier", "Rey", "Mercier", "Blanc", "Gauthier", "Fournier", "Berset", "Jaquet", "Dubois", "Zürcher"]
+CITIES = {"Genève": ["Genève", "Carouge", "Meyrin", "Vernier", "Lancy", "Onex"],
+          "Vaud": ["Lausanne", "Nyon", "Morges", "Vevey", "Gland", "Renens"],
+          "France": ["Annemasse", "Ferney-Voltaire", "Thonon-les-Bains", "Saint-Julien-en-Genevois"],
+          "Autre": ["Fribourg", "Neuchâtel", "Sion", "Berne"]}
+CANTON_WEIGHTS = {"Genève": 0.55, "Vaud": 0.25, "France": 0.15, "Autre": 0.05}
+LEGAL_FORMS = ["SA", "Sàrl", "SAS", "& Fils", "et Cie", "SNC", ""]
+STREETS = ["Rue du Rhône", "Route de Meyrin", "Chemin des Vignes", "Avenue de la Gare", "Rue de Lausanne",
+           "Quai du Mont-Blanc", "Boulevard Carl-Vogt", "Place du Molard", "Rue de Carouge", "Chemin du Pont"]
+FIRST_NAMES = ["marie", "jean", "sophie", "luc", "claire", "pierre", "anne", "nicolas", "julie", "marc"]
+AUDIT_STATUSES = ["Non concerné", "En attente", "Planifié", "Réalisé", "Non-conformité majeure"]
+AUDIT_WEIGHTS = [0.4, 0.2, 0.15, 0.2, 0.05]
+TAGS = ["Fournisseur critique", "Fournisseur non critique", "Conforme", "Non conforme", "Audit à planifier", "RSE+", "Innovation"]
+TAG_WEIGHTS = [0.15, 0.35, 0.3, 0.05, 0.1, 0.03, 0.02]
+
+# Écart relatif et écart absolu (secondes) au-delà desquels une mesure est une régression.
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_MIN_DELTA = 0.005
+
+def _pick(rng, values, count, weights=None):
+    """Tire `count` valeurs (Series de texte) parmi `values`."""
+    return pd.Series(np.asarray(values, dtype=object)[rng.choice(len(values), size=count, p=weights)])
+
+def generate_suppliers(count, seed=0):
+    """
+    Génère `count` fournisseurs réalistes et reproductibles, avec les colonnes d'un fichier d'import
+    (database.IMPORT_COLUMNS) plus 'Tags' (liste), 'Prospect' (booléen) et 'Date de création'.
+    Les raisons sociales sont uniques (à la casse et aux accents près).
+    """
+    rng = np.random.default_rng(seed)
+    cantons = _pick(rng, list(CANTON_WEIGHTS), count, list(CANTON_WEIGHTS.values()))
+    cities = pd.Series([CITIES[canton][index % len(CITIES[canton])] for canton, index in zip(cantons, rng.integers(0, 60, count))])
+    surnames = _pick(rng, SURNAMES, count)
+    names = (_pick(rng, ACTIVITIES, count) + " " + surnames + " " + cities + " " + _pick(rng, LEGAL_FORMS, count)).str.strip()
+    keys = db.name_keys(names)
+    names = names.where(~keys.duplicated(), names + " " + pd.Series(np.arange(count)).astype(str))
+    first_names = _pick(rng, FIRST_NAMES, count)
+    tag_counts = rng.choice(4, size=count, p=[0.2, 0.4, 0.3, 0.1])
+    tags = [list(rng.choice(TAGS, size=n, replace=False, p=TAG_WEIGHTS)) for n in tag_counts]
+    created = pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 5 * 365 * 24 * 3600, count), unit="s")
+    return pd.DataFrame({
+        'Raison Sociale': names,
+        'Numéro de fournisseur': pd.Series(rng.permutation(count) + 100000).astype(str),
+        'Adresse': (pd.Series(rng.integers(1, 200, count)).astype(str) + " " + _pick(rng, STREETS, count) + ", "
+                    + pd.Series(rng.integers(1200, 1300, count)).astype(str) + " " + cities),
+        'Pays/Canton': cantons,
+        'Contacts': first_names + "." + surnames.str.lower() + "@exemple.ch",
+        'Statut Audit': _pick(rng, AUDIT_STATUSES, count, AUDIT_WEIGHTS),
+        'Commentaires': np.where(rng.random(count) < 0.3, "Contrat cadre renouvelé", None),
+        'Tags': tags,
+        'Prospect': rng.random(count) < 0.1,
+        'Date de création': created.strftime("%Y-%m-%d %H:%M:%S"),
+    })
+
+def generate_import_file(existing, rows, new_ratio=0.3, conflict_ratio=0.2, duplicate_ratio=0.05, seed=1):
+    """
+    Génère un fichier d'import (colonnes de database.IMPORT_COLUMNS) de `rows` lignes à partir des
+    fournisseurs `existing` déjà en base : `new_ratio` de nouveaux fournisseurs, `conflict_ratio` de
+    fournisseurs existants aux adresses et statuts modifiés, `duplicate_ratio` de lignes répétées
+    (raison sociale en majuscules), le reste repris à l'identique.
+    """
+    rng = np.random.default_rng(seed)
+    labels = list(db.IMPORT_COLUMNS)
+    new_count = int(rows * new_ratio)
+    duplicate_count = int(rows * duplicate_ratio)
+    existing_count = min(rows - new_count - duplicate_count, len(existing))
+    conflict_count = min(int(rows * conflict_ratio), existing_count)
+
+    new = generate_suppliers(len(existing) + new_count, seed)[labels].iloc[len(existing):]
+    taken = existing[labels].iloc[rng.choice(len(existing), size=existing_count, replace=False)].reset_index(drop=True)
+    taken.loc[:conflict_count - 1, 'Adresse'] = "Nouvelle adresse " + taken.loc[:conflict_count - 1, 'Adresse']
+    taken.loc[:conflict_count - 1, 'Statut Audit'] = _pick(rng, AUDIT_STATUSES, conflict_count).to_numpy()
+    frame = pd.concat([taken, new], ignore_index=True)
+    duplicates = frame.iloc[rng.choice(len(frame), size=duplicate_count)].copy()
+    duplicates['Raison Sociale'] = duplicates['Raison Sociale'].str.upper()
+    frame = pd.concat([frame, duplicates], ignore_index=True)
+    return frame.iloc[rng.permutation(len(frame))].reset_index(drop=True)
+
+def populate(suppliers):
+    """Charge les fournisseurs générés dans la base courante (import, puis tags, prospects et dates)."""
+    db.init_db()
+    new, conflicts = db.analyze_import_data(suppliers, fuzzy=False)
+    db.execute_import(new, conflicts)
+    with db.transaction() as conn:
+        ids = dict(conn.execute("SELECT cle_fournisseur, id FROM suppliers").fetchall())
+        supplier_ids = [ids[key] for key in db.name_keys(suppliers['Raison Sociale'])]
+        conn.executemany("UPDATE suppliers SET tags = ?, est_prospect = ?, date_creation = ? WHERE id = ?",
+                         zip((','.join(tags) for tags in suppliers['Tags']), suppliers['Prospect'].astype(int).tolist(),
+                             suppliers['Date de création'], supplier_ids))
+        db._store_tags(conn, zip(supplier_ids, suppliers['Tags']))
+    db.clear_cache()
+
+def measure(name, rows, func, repeat, cold=True):
+    """
+    Exécute `func` `repeat` fois et résume les durées : cache de lecture vidé avant chaque essai si `cold`,
+    sinon rempli par un premier appel non mesuré.
+    """
+    durations = []
+    if not cold:
+        func()
+    for _ in range(repeat):
+        if cold:
+            db.clear_cache()
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    result = {'name': name, 'rows': rows, 'repeat': repeat, 'median_s': statistics.median(durations),
+              'min_s': min(durations), 'max_s': max(durations)}
+    print(f"{name:<60} {rows:>9} lignes  médiane {result['median_s'] * 1000:9.2f} ms", file=sys.stderr)
+    return result
+
+def _keyset_walk(pages, page_size, sort_by, ascending):
+    """Parcourt `pages` pages successives par curseur."""
+    cursor = None
+    for _ in range(pages):
+        _, cursor = db.get_suppliers_page(page_size, cursor, sort_by=sort_by, ascending=ascending)
+        if cursor is None:
+            break
+
+def _rebuild_filter_index():
+    """Reconstruit l'index des filtres du Dashboard, comme à la première lecture après une modification."""
+    db._filter_index = None
+    db._load_filter_index()
+
+def _import_csv(frame):
+    """Lit un fichier d'import CSV en flux puis l'analyse, comme depuis l'application."""
+    buffer = io.BytesIO(frame.to_csv(index=False).encode('utf-8'))
+    return db.analyze_import_chunks(importer.read_import_file(buffer, 'import.csv'))
+
+def run_size(rows, repeat, seed, directory, import_ratio):
+    """Génère une base de `rows` fournisseurs dans `directory` et y exécute toutes les mesures."""
+    db.DB_FILE = os.path.join(directory, f"benchmark_{rows}.db")
+    suppliers = generate_suppliers(rows, seed)
+    results = [measure("populate", rows, lambda: populate(suppliers), 1)]
+    page_size = 10
+
+    for sort_by in db.SORT_COLUMNS:
+        for ascending in (True, False):
+            order = 'asc' if ascending else 'desc'
+            for position, offset in (('first', 0), ('middle', rows // 2), ('last', max(rows - page_size, 0))):
+                results.append(measure(f"get_suppliers[{sort_by},{order},{position}]", rows,
+                                       lambda: db.get_suppliers(page_size, offset, sort_by=sort_by, ascending=ascending), repeat))
+            results.append(measure(f"get_suppliers_page[{sort_by},{order},20 pages]", rows,
+                                   lambda: _keyset_walk(20, page_size, sort_by, ascending), repeat))
+
+    for term in ("Genève", "dupont sa", "rue du rhone", "ga"):
+        results.append(measure(f"search_suppliers[{term}]", rows, lambda: db.search_suppliers(term), repeat))
+        results.append(measure(f"suggest_suppliers[{term}]", rows, lambda: db.suggest_suppliers(term), repeat))
+    results.append(measure("get_suppliers[search,filters]", rows,
+                           lambda: db.get_suppliers(page_size, 0, "Genève", filters={'statut_audit': ['En attente'], 'tags': ['Conforme']}), repeat))
+
+    dashboard_filters = {
+        'none': None,
+        'canton': {'pays_canton': ['Genève']},
+        'critical': {'tags_all': [db.CRITICAL_TAG]},
+        'prospects,audit': {'est_prospect': True, 'statut_audit': ['Planifié', 'En attente']},
+    }
+    results.append(measure("get_filter_options", rows, db.get_filter_options, repeat))
+    results.append(measure("filter_index[build]", rows, _rebuild_filter_index, repeat))
+    for label, filters in dashboard_filters.items():
+        results.append(measure(f"get_dashboard_aggregates[{label}]", rows, lambda: db.get_dashboard_aggregates(filters=filters), repeat))
+    results.append(measure("get_dashboard_aggregates[none,cached]", rows, lambda: db.get_dashboard_aggregates(), repeat, cold=False))
+    for dimension in ("statut_audit", "tag"):
+        results.append(measure(f"get_supplier_trends[{dimension}]", rows, lambda: db.get_supplier_trends(dimension, "W"), repeat))
+
+    import_rows = max(int(rows * import_ratio), 100)
+    import_frame = generate_import_file(suppliers, import_rows, seed=seed + 1)
+    # L'index de similarité est construit une fois, à la première analyse, puis tenu à jour.
+    results.append(measure("similarity_index[build]", rows, db._refresh_similarity_index, 1))
+    results.append(measure("find_probable_duplicates", import_rows, lambda: db.find_probable_duplicates(import_frame['Raison Sociale']), repeat))
+    results.append(measure("analyze_import_data", import_rows, lambda: db.analyze_import_data(import_frame), repeat))
+    results.append(measure("read_import_file+analyze[csv]", import_rows, lambda: _import_csv(import_frame), repeat))
+    new, conflicts = db.analyze_import_data(import_frame)
+    # L'import modifie la base : il est mesuré une seule fois, en dernier.
+    results.append(measure("execute_import", import_rows, lambda: db.execute_import(new, conflicts), 1))
+    db.close_all_connections()
+    return results
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE, min_delta=DEFAULT_MIN_DELTA):
+    """Retourne les mesures plus lentes que la référence de plus de `tolerance` (relatif) et `min_delta` (secondes)."""
+    reference = {(entry['name'], entry['rows']): entry for entry in baseline['results']}
+    regressions = []
+    for entry in results:
+        base = reference.get((entry['name'], entry['rows']))
+        if base is None:
+            continue
+        if entry['median_s'] > base['median_s'] * (1 + tolerance) and entry['median_s'] - base['median_s'] > min_delta:
+            regressions.append({'name': entry['name'], 'rows': entry['rows'], 'baseline_s': base['median_s'],
+                                'median_s': entry['median_s'], 'ratio': entry['median_s'] / base['median_s']})
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai des fonctions de database.py sur des données synthétiques.")
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help="tailles de base à mesurer, séparées par des virgules (défaut : 1000,10000,100000)")
+    parser.add_argument('--repeat', type=int, default=5, help="nombre d'essais par mesure (défaut : 5)")
+    parser.add_argument('--seed', type=int, default=42, help="graine du générateur (défaut : 42)")
+    parser.add_argument('--import-ratio', type=float, default=0.2,
+                        help="taille du fichier d'import, en proportion de la base (défaut : 0.2)")
+    parser.add_argument('--output', help="fichier JSON des résultats (sinon sortie standard)")
+    parser.add_argument('--baseline', help="référence JSON à laquelle comparer les résultats")
+    parser.add_argument('--save-baseline', help="enregistre les résultats comme nouvelle référence")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f"ralentissement relatif toléré (défaut : {DEFAULT_TOLERANCE})")
+    parser.add_argument('--min-delta', type=float, default=DEFAULT_MIN_DELTA,
+                        help=f"ralentissement absolu toléré en secondes (défaut : {DEFAULT_MIN_DELTA})")
+    parser.add_argument('--read-replica', action='store_true',
+                        help="sert les lectures depuis la réplique en mémoire (database.READ_REPLICA)")
+    args = parser.parse_args(argv)
+    db.READ_REPLICA = db.READ_REPLICA or args.read_replica
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in sizes:
+            results.extend(run_size(rows, args.repeat, args.seed, directory, args.import_ratio))
+
+    report = {
+        'meta': {
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'sizes': sizes,
+            'repeat': args.repeat,
+            'seed': args.seed,
+            'read_replica': db.READ_REPLICA,
+        },
+        'results': results,
+    }
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            report['regressions'] = compare(results, json.load(file), args.tolerance, args.min_delta)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output)
+    else:
+        print(output)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as file:
+            file.write(output)
+
+    for regression in report.get('regressions', []):
+        print(f"RÉGRESSION {regression['name']} ({regression['rows']} lignes) : "
+              f"{regression['baseline_s'] * 1000:.2f} ms -> {regression['median_s'] * 1000:.2f} ms "
+              f"(x{regression['ratio']:.2f})", file=sys.stderr)
+    return 1 if report.get('regressions') else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
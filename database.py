@@ -1,19 +1,944 @@
+import bisect
+import codecs
+import functools
+import io
+import json
+import os
+import queue
+import re
 import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import numpy as np
 import pandas as pd
 
 DB_FILE = "suppliers.db"
 
+# --- Connexions ---
+# Réglages appliqués à chaque connexion ouverte : journal WAL (les lecteurs ne
+# bloquent plus l'écrivain), cache de pages de ~64 Mo et lecture par mmap.
+# auto_vacuum doit précéder journal_mode : il n'a d'effet que sur une base neuve, avant que son en-tête
+# soit écrit, et la crée en mode incrémental (voir convert_to_incremental_vacuum pour une base existante).
+CONNECTION_PRAGMAS = {
+    "auto_vacuum": "INCREMENTAL",
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+    "foreign_keys": "ON",
+}
+# Nombre maximal de connexions inactives conservées dans le pool.
+POOL_MAX_IDLE = 8
+# Écritures : un thread unique les exécute, en validant dans une même transaction toutes celles
+# arrivées pendant WRITE_BATCH_WINDOW secondes (au plus WRITE_BATCH_MAX à la fois).
+WRITE_BATCH_WINDOW = 0.002
+WRITE_BATCH_MAX = 100
+# Nouvelles tentatives d'ouverture de la transaction quand un autre processus garde la base verrouillée
+# au-delà du busy_timeout, avec une attente doublée à chaque fois.
+WRITE_RETRIES = 3
+WRITE_RETRY_DELAY = 0.1
+# Réplique de lecture (optionnelle, activée par ACHAT_READ_REPLICA=1) : les lectures de l'interface sont
+# servies par une copie de la base en mémoire, recopiée par l'API de sauvegarde de SQLite à la première
+# lecture qui suit un changement de version des données ; les écritures vont toujours au fichier.
+READ_REPLICA = os.environ.get("ACHAT_READ_REPLICA") == "1"
+
+# --- Tri et pagination ---
+# Colonnes de tri autorisées et expression SQL correspondante ; chaque expression
+# est couverte par un index (expression, id) créé par les migrations (voir init_db()).
+SORT_COLUMNS = {
+    'raison_sociale': "raison_sociale",
+    'id_oracle': "IFNULL(id_oracle, '')",
+    'pays_canton': "IFNULL(pays_canton, '')",
+    'statut_audit': "IFNULL(statut_audit, '')",
+    'date_creation': "IFNULL(date_creation, '')",
+    'derniere_modif': "IFNULL(derniere_modif, '')",
+}
+
+# Colonnes indexées telles quelles pour les filtres et les recherches exactes (voir _create_filter_indexes).
+FILTER_INDEX_COLUMNS = ['pays_canton', 'statut_audit', 'id_oracle']
+# Lignes examinées par index lors d'ANALYZE et de PRAGMA optimize : des statistiques approchées,
+# calculées en temps constant quelle que soit la taille de la base.
+ANALYSIS_LIMIT = 1000
+
+# --- Cache de lecture ---
+# Limites du cache partagé des lectures (nombre d'entrées et taille estimée en octets).
+READ_CACHE_MAX_ENTRIES = 256
+READ_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# --- Diagnostics ---
+# Mesure des requêtes SQL (journal, histogrammes, instructions exécutées), activée avec la page de
+# diagnostics par ACHAT_DIAGNOSTICS=1 : sans elle, les connexions n'ont ni curseur instrumenté ni
+# gestionnaire de progression. Le journal garde le texte des requêtes, sans les valeurs des paramètres.
+DIAGNOSTICS = os.environ.get("ACHAT_DIAGNOSTICS") == "1"
+# Durée (ms) à partir de laquelle une requête est journalisée comme lente.
+SLOW_QUERY_MS = 100
+# Nombre de requêtes récentes, et de requêtes lentes, conservées en mémoire.
+QUERY_LOG_SIZE = 1000
+SLOW_QUERY_LOG_SIZE = 200
+# Bornes supérieures (ms) des classes des histogrammes de latence.
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+# Le gestionnaire de progression SQLite est appelé toutes les PROGRESS_STEP instructions.
+PROGRESS_STEP = 1000
+_IN_LIST = re.compile(r'\?\d*(\s*,\s*\?\d*)+')
+_PARAMETER = re.compile(r'\?(\d*)')
+
+# --- Recherche plein texte ---
+# Colonnes indexées dans suppliers_fts et poids bm25 associés (le nom pèse le plus).
+SEARCH_COLUMNS = ['raison_sociale', 'id_oracle', 'adresse', 'contacts', 'tags', 'commentaires']
+SEARCH_WEIGHTS = [10.0, 5.0, 2.0, 1.0, 2.0, 1.0]
+# Le tokenizer trigram ne sait pas retrouver une chaîne de moins de 3 caractères.
+FTS_MIN_TERM_LENGTH = 3
+# Nombre de suggestions proposées par la saisie semi-automatique du formulaire.
+SUGGEST_LIMIT = 10
+
+# Tag compté dans l'indicateur « Fournisseurs Critiques » du Dashboard.
+CRITICAL_TAG = 'Fournisseur critique'
+
+# --- Import ---
+# Colonnes reconnues dans les fichiers d'import et colonne correspondante de la table suppliers.
+IMPORT_COLUMNS = {
+    'Raison Sociale': 'raison_sociale',
+    'Numéro de fournisseur': 'id_oracle',
+    'Adresse': 'adresse',
+    'Pays/Canton': 'pays_canton',
+    'Contacts': 'contacts',
+    'Statut Audit': 'statut_audit',
+    'Commentaires': 'commentaires',
+}
+REQUIRED_IMPORT_COLUMNS = ['Raison Sociale', 'Numéro de fournisseur', 'Adresse']
+# Champs de suppliers qu'un import peut renseigner ou mettre à jour (hors raison sociale).
+IMPORT_FIELDS = [field for field in IMPORT_COLUMNS.values() if field != 'raison_sociale']
+# Nombre de lignes appliquées par transaction lors d'un import.
+IMPORT_CHUNK_SIZE = 5000
+_WHITESPACE = re.compile(r'\s+')
+
+# --- Export ---
+# Nombre de lignes lues (fetchmany) puis écrites à la fois par export_suppliers.
+EXPORT_BATCH_SIZE = 5000
+# Colonnes exportées et leur en-tête : d'abord celles d'un fichier d'import (un export CSV ou Excel
+# peut être réimporté tel quel), puis les autres.
+EXPORT_COLUMNS = {**{field: label for label, field in IMPORT_COLUMNS.items()},
+                  'tags': 'Tags', 'est_prospect': 'Prospect', 'date_creation': 'Date de création', 'derniere_modif': 'Dernière modification'}
+# Formats d'export et leur type MIME.
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'parquet': 'application/vnd.apache.parquet',
+}
+# Nombre maximal de lignes d'une feuille Excel (en-tête compris) ; au-delà, l'export continue sur une nouvelle feuille.
+EXCEL_MAX_ROWS = 1048576
+
+# --- Journal des modifications ---
+# Colonnes de suppliers dont les modifications sont journalisées (table suppliers_log).
+CHANGE_LOG_COLUMNS = ['raison_sociale', 'id_oracle', 'est_prospect', 'adresse', 'pays_canton', 'contacts', 'tags', 'statut_audit', 'commentaires']
+# Dimensions des tendances (table supplier_trends) : nombre de fournisseurs, statut d'audit, prospect et tag.
+TREND_DIMENSIONS = ['total', 'statut_audit', 'est_prospect', 'tag']
+# Durée (jours) de conservation des entrées du journal déjà reportées dans les tendances ; la maintenance
+# supprime les plus anciennes, au plus une fois toutes les CHANGE_LOG_PRUNE_SECONDS.
+CHANGE_LOG_RETENTION_DAYS = 90
+CHANGE_LOG_PRUNE_SECONDS = 24 * 3600
+
+# --- Sauvegardes et maintenance ---
+# Pages copiées par étape de sauvegarde et pause (secondes) après chaque étape : la copie est étalée pour laisser le disque aux autres requêtes.
+BACKUP_STEP_PAGES = 256
+BACKUP_STEP_SLEEP = 0.005
+# Nombre de sauvegardes conservées (les plus anciennes sont supprimées).
+BACKUP_KEEP = 10
+# Nom d'une sauvegarde : date, heure, microsecondes et motif (voir backup_database).
+BACKUP_NAME_PATTERN = re.compile(r'(\d{8}-\d{6})-\d{6}_(.+)\.db')
+# Fichier du dossier des sauvegardes qui garde la date et le seq du journal de la dernière : hors de la base,
+# l'enregistrer ne passe pas par l'écrivain et ne vide donc pas les caches liés à data_version.
+BACKUP_STATE_FILE = 'derniere_sauvegarde.json'
+
+# Une opération qui supprime ou réécrit au moins ce nombre de fournisseurs est précédée d'une sauvegarde.
+SNAPSHOT_MIN_ROWS = 100
+# Intervalle (secondes) entre deux passages du planificateur de maintenance, et entre deux sauvegardes périodiques.
+MAINTENANCE_CHECK_SECONDS = 600
+BACKUP_INTERVAL_SECONDS = 24 * 3600
+# ANALYZE est relancé quand les modifications journalisées depuis le précédent dépassent cette part des fournisseurs (et ce minimum).
+ANALYZE_CHURN_RATIO = 0.1
+ANALYZE_MIN_CHANGES = 1000
+# Les pages libres sont rendues au système au-delà de cette part du fichier (et de ce minimum), par transactions de VACUUM_STEP_PAGES pages.
+VACUUM_FREELIST_RATIO = 0.1
+VACUUM_MIN_PAGES = 256
+VACUUM_STEP_PAGES = 1000
+
+# --- Doublons probables ---
+# Formes juridiques et mots de liaison ignorés par la clé de similarité (voir similarity_key).
+LEGAL_FORM_TOKENS = {'sa', 'sarl', 'sas', 'sasu', 'eurl', 'snc', 'sci', 'sca', 'scs', 'ag', 'gmbh', 'kg',
+                     'ltd', 'llc', 'inc', 'plc', 'cie', 'co', 'et'}
+# Abréviations courantes remplacées par le mot complet dans la clé de similarité.
+NAME_ABBREVIATIONS = {'ste': 'societe', 'sste': 'societe', 'ets': 'etablissements', 'st': 'saint',
+                      'intl': 'international', 'assoc': 'association', 'grpt': 'groupement'}
+# Signature MinHash de FUZZY_PERMUTATIONS valeurs, découpée en FUZZY_BANDS bandes indexées dans supplier_lsh :
+# deux raisons sociales deviennent candidates dès qu'elles partagent une bande. Avec 8 bandes de 8 valeurs,
+# deux noms de similarité de Jaccard 0,8 (trigrammes) le deviennent dans 84 % des cas, à 0,5 dans 3 % des cas.
+FUZZY_PERMUTATIONS = 64
+FUZZY_BANDS = 8
+# Similarité (estimée par MinHash) en dessous de laquelle un candidat n'est pas évalué,
+# et nombre maximal de candidats évalués par raison sociale.
+FUZZY_CANDIDATE_JACCARD = 0.5
+FUZZY_MAX_CANDIDATES = 2
+# Similarité (coefficient de Dice des trigrammes, de 0 à 1) à partir de laquelle un fournisseur
+# est signalé comme doublon probable.
+FUZZY_MATCH_THRESHOLD = 0.8
+# Nombre de raisons sociales hachées, puis comparées aux fournisseurs existants, à la fois.
+_MINHASH_BATCH = 5000
+_MINHASH_COEFFICIENTS = np.random.default_rng(20240601).integers(1, 2**63, size=(2, FUZZY_PERMUTATIONS), dtype=np.uint64) | np.uint64(1)
+_NON_WORD = re.compile(r'[\W_]+')
+_SPLIT_INITIALS = re.compile(r'(?<!\w)(\w) (?=\w(?!\w))')
+
+_pool_lock = threading.Lock()
+_idle_connections = []
+_local = threading.local()
+_initialized_db_file = None
+_version_lock = threading.Lock()
+_version_connection = None
+_replica_generation = 0
+_filter_index_lock = threading.Lock()
+_filter_index = None
+
+def _build_fold_table():
+    """Table de traduction caractère -> caractère en minuscule et sans accent."""
+    table = {}
+    for code in range(0x2000):
+        char = chr(code)
+        folded = unicodedata.normalize('NFD', char)[0].lower()
+        if len(folded) == 1 and folded != char:
+            table[code] = folded
+    return table
+
+_FOLD_TABLE = _build_fold_table()
+
+def _fold(text):
+    """Met un texte en minuscules sans accents, caractère pour caractère ("Société" -> "societe")."""
+    if text is None:
+        return None
+    return str(text).translate(_FOLD_TABLE)
+
+class _InstrumentedCursor(sqlite3.Cursor):
+    """Curseur qui mesure chaque requête (durées, lignes, instructions SQLite) dans le journal des requêtes."""
+    _record = None
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql)
+        self._measure(super().execute, sql, parameters)
+        if self.rowcount > 0:
+            self._record['rows'] = self.rowcount
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql)
+        self._measure(super().executemany, sql, seq_of_parameters)
+        if self.rowcount > 0:
+            self._record['rows'] = self.rowcount
+        return self
+
+    def fetchone(self):
+        row = self._measure(super().fetchone)
+        if row is None:
+            self._finish()
+        elif self._record is not None:
+            self._record['rows'] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._measure(super().fetchmany, self.arraysize if size is None else size)
+        if self._record is not None:
+            self._record['rows'] += len(rows)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._measure(super().fetchall)
+        if self._record is not None:
+            self._record['rows'] += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._measure(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        if self._record is not None:
+            self._record['rows'] += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        if self._record is not None:
+            self._finish()
+
+    def _begin(self, sql):
+        self._finish()
+        self._record = {'time': time.time(), 'function': getattr(_local, "function", None),
+                        'statement': _statement_key(sql), 'sql': sql,
+                        'duration_ms': 0.0, 'rows': 0, 'vm_steps': 0}
+
+    def _measure(self, method, *args):
+        record = self._record
+        if record is None:
+            return method(*args)
+        conn = self.connection
+        steps = conn.vm_steps
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            record['duration_ms'] += (time.perf_counter() - start) * 1000
+            record['vm_steps'] += (conn.vm_steps - steps) * PROGRESS_STEP
+
+    def _finish(self):
+        record, self._record = self._record, None
+        if record is not None:
+            _query_log.add_statement(record)
+
+class _Connection(sqlite3.Connection):
+    """Connexion SQLite qui mémorise son fichier de base (curseur instrumenté si DIAGNOSTICS)."""
+    db_file = None
+    vm_steps = 0
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or (_InstrumentedCursor if DIAGNOSTICS else sqlite3.Cursor))
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def _count_steps(self):
+        """Gestionnaire de progression : compte les instructions exécutées par SQLite."""
+        self.vm_steps += 1
+        return 0
+
+def _open_connection():
+    """Ouvre une nouvelle connexion SQLite configurée (mode autocommit, PRAGMAs réglés)."""
+    conn = sqlite3.connect(DB_FILE, isolation_level=None, check_same_thread=False, factory=_Connection)
+    conn.row_factory = sqlite3.Row
+    # Utilisée par les triggers de l'index plein texte : doit exister sur toute connexion qui écrit.
+    conn.create_function("fold", 1, _fold, deterministic=True)
+    if DIAGNOSTICS:
+        conn.set_progress_handler(conn._count_steps, PROGRESS_STEP)
+    for pragma, value in CONNECTION_PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    conn.db_file = DB_FILE
+    return conn
+
+def _acquire_connection():
+    """Prend une connexion inactive dans le pool, ou en ouvre une nouvelle."""
+    with _pool_lock:
+        while _idle_connections:
+            conn = _idle_connections.pop()
+            if conn.db_file == DB_FILE:
+                return conn
+            conn.close()
+    return _open_connection()
+
+def _release_connection(conn):
+    """Remet une connexion dans le pool (ou la ferme si le pool est plein)."""
+    if conn.in_transaction:
+        conn.rollback()
+    with _pool_lock:
+        if conn.db_file == DB_FILE and len(_idle_connections) < POOL_MAX_IDLE:
+            _idle_connections.append(conn)
+            return
+    conn.close()
+
+def close_all_connections():
+    """Ferme toutes les connexions inactives du pool."""
+    with _pool_lock:
+        while _idle_connections:
+            _idle_connections.pop().close()
+
+@contextmanager
+def connection():
+    """Fournit une connexion du pool pour le bloc `with` (réutilisée par les appels imbriqués du thread)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        yield conn
+        return
+    conn = _acquire_connection()
+    _local.conn = conn
+    try:
+        yield conn
+    finally:
+        _local.conn = None
+        _release_connection(conn)
+
+@contextmanager
+def transaction():
+    """Exécute le bloc `with` dans une transaction (BEGIN IMMEDIATE), rejointe par les transactions imbriquées."""
+    with connection() as conn:
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+@contextmanager
+def read_connection():
+    """Fournit une connexion de lecture : sur la réplique si READ_REPLICA (hors transaction en cours), sinon comme `connection()`."""
+    conn = getattr(_local, "conn", None)
+    if not READ_REPLICA or (conn is not None and conn.in_transaction):
+        with connection() as conn:
+            yield conn
+        return
+    conn = getattr(_local, "read_conn", None)
+    if conn is not None:
+        yield conn
+        return
+    # Rafraîchit la réplique si les données ont changé depuis sa copie.
+    data_version()
+    conn = _replica.acquire()
+    _local.read_conn = conn
+    try:
+        yield conn
+    finally:
+        _local.read_conn = None
+        _replica.release(conn)
+
+class _Writer:
+    """Écrivain unique du processus : un thread qui regroupe les écritures en file dans une seule transaction."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.batches = self.operations = self.retries = 0
+
+    def submit(self, func, args, kwargs):
+        """Met en file l'appel func(conn, *args, **kwargs) et retourne son Future."""
+        future = Future()
+        self._queue.put((func, args, kwargs, future))
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="database-writer", daemon=True)
+                self._thread.start()
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + WRITE_BATCH_WINDOW
+            while len(batch) < WRITE_BATCH_MAX:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            batch = [operation for operation in batch if operation[3].set_running_or_notify_cancel()]
+            while batch:
+                batch = self._execute(batch)
+
+    def _execute(self, batch):
+        """Exécute un lot dans une transaction ; retourne les opérations à rejouer sans celle qui a échoué."""
+        attempt = 0
+        while True:
+            results = []
+            started = False
+            try:
+                with transaction() as conn:
+                    started = True
+                    for func, args, kwargs, _ in batch:
+                        _local.function = func.__name__
+                        try:
+                            results.append(func(conn, *args, **kwargs))
+                        finally:
+                            _local.function = None
+                    _apply_change_log(conn)
+                break
+            except Exception as e:
+                if started and len(results) < len(batch):
+                    # L'opération en cours a échoué : elle seule reçoit l'erreur, les autres sont rejouées.
+                    batch[len(results)][3].set_exception(e)
+                    return batch[:len(results)] + batch[len(results) + 1:]
+                # Échec de l'ouverture (BEGIN IMMEDIATE) ou de la validation : rien n'a été écrit.
+                # Une base verrouillée par un autre processus est réessayée.
+                if not (isinstance(e, sqlite3.OperationalError) and "locked" in str(e)) or attempt == WRITE_RETRIES:
+                    for *_, future in batch:
+                        future.set_exception(e)
+                    return []
+                self.retries += 1
+                time.sleep(WRITE_RETRY_DELAY * 2 ** attempt)
+                attempt += 1
+        _invalidate_cache()
+        with self._lock:
+            self.batches += 1
+            self.operations += len(batch)
+        for (*_, future), value in zip(batch, results):
+            future.set_result(value)
+        return []
+
+    def stats(self):
+        """Statistiques de l'écrivain (transactions validées, opérations, nouvelles tentatives, file d'attente)."""
+        with self._lock:
+            return {'batches': self.batches, 'operations': self.operations, 'retries': self.retries,
+                    'queued': self._queue.qsize()}
+
+_writer = _Writer()
+
+def submit_write(func, *args, **kwargs):
+    """Confie func(conn, *args, **kwargs) à l'écrivain ; retourne un Future résolu une fois la transaction validée."""
+    return _writer.submit(func, args, kwargs)
+
+def _write(func, *args, **kwargs):
+    """Exécute une écriture par l'écrivain et attend son résultat (directement dans la transaction en cours s'il y en a une)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None and conn.in_transaction:
+        value = func(conn, *args, **kwargs)
+        _invalidate_cache()
+        return value
+    return submit_write(func, *args, **kwargs).result()
+
+def write_stats():
+    """Statistiques de l'écrivain : transactions groupées, opérations exécutées, file d'attente."""
+    return _writer.stats()
+
 def get_db_connection():
-    """Crée et retourne une connexion à la base de données SQLite."""
-    conn = sqlite3.connect(DB_FILE)
+    """Crée une connexion indépendante (hors pool) à la base, que l'appelant doit fermer."""
+    return _open_connection()
+
+def data_version():
+    """Version des données (PRAGMA data_version), qui change à chaque transaction validée ; celle de la réplique avec READ_REPLICA."""
+    version = _primary_version()
+    if READ_REPLICA:
+        return _replica.current_version(version)
+    return version
+
+def _primary_version():
+    """Version des données du fichier de base (voir data_version)."""
+    global _version_connection
+    with _version_lock:
+        if _version_connection is None or _version_connection.db_file != DB_FILE:
+            if _version_connection is not None:
+                _version_connection.close()
+            _version_connection = _open_connection()
+            # Les numéros de version repartent de zéro : rien de ce qui est en cache n'est comparable.
+            _read_cache.clear()
+        # Curseur non instrumenté : cette lecture accompagne chaque lecture en cache.
+        return sqlite3.Cursor(_version_connection).execute("PRAGMA data_version").fetchone()[0]
+
+class _Replica:
+    """Réplique de lecture : copie de la base en mémoire (API de sauvegarde), remplacée par une nouvelle copie à chaque rafraîchissement."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._anchor = None
+        self._uri = None
+        self._db_file = None
+        self._idle = []
+        self.version = None
+        self.refreshes = 0
+        self.last_refresh_s = None
+
+    def current_version(self, primary_version):
+        """Version des données copiées, après rafraîchissement si la copie est antérieure à `primary_version`."""
+        if self._db_file == DB_FILE and self.version >= primary_version:
+            return self.version
+        # Un seul rafraîchissement à la fois ; les lectures qui l'attendaient profitent de la nouvelle copie.
+        with self._refresh_lock:
+            if self._db_file != DB_FILE or self.version < primary_version:
+                self._refresh()
+            return self.version
+
+    def _refresh(self):
+        global _replica_generation
+        start = time.perf_counter()
+        # Version relevée avant la copie : une écriture validée entre-temps sera copiée ou fera rafraîchir à nouveau.
+        version = _primary_version()
+        _replica_generation += 1
+        uri = f"file:replica_{_replica_generation}?mode=memory&cache=shared"
+        anchor = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        source = _acquire_connection()
+        try:
+            source.backup(anchor)
+        finally:
+            _release_connection(source)
+        with self._lock:
+            previous, self._anchor = self._anchor, anchor
+            idle, self._idle = self._idle, []
+            self._uri, self._db_file, self.version = uri, DB_FILE, version
+            self.refreshes += 1
+            self.last_refresh_s = time.perf_counter() - start
+        for conn in idle + ([previous] if previous is not None else []):
+            conn.close()
+
+    def acquire(self):
+        """Prend une connexion inactive sur la copie courante, ou en ouvre une nouvelle."""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            # Ouverte sous le verrou : la copie ne peut pas être remplacée (et libérée) entre-temps.
+            return _open_replica_connection(self._uri)
+
+    def release(self, conn):
+        """Remet une connexion dans le pool de la réplique (ou la ferme si elle porte sur une copie remplacée)."""
+        with self._lock:
+            if conn.db_file == self._uri and len(self._idle) < POOL_MAX_IDLE:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def stats(self):
+        """Statistiques de la réplique (version copiée, rafraîchissements, durée du dernier)."""
+        with self._lock:
+            return {'enabled': READ_REPLICA, 'version': self.version, 'refreshes': self.refreshes,
+                    'last_refresh_s': self.last_refresh_s}
+
+_replica = _Replica()
+
+def _open_replica_connection(uri):
+    """Ouvre une connexion en lecture seule sur une copie en mémoire de la base."""
+    conn = sqlite3.connect(uri, uri=True, isolation_level=None, check_same_thread=False, factory=_Connection)
     conn.row_factory = sqlite3.Row
+    conn.create_function("fold", 1, _fold, deterministic=True)
+    if DIAGNOSTICS:
+        conn.set_progress_handler(conn._count_steps, PROGRESS_STEP)
+    conn.execute("PRAGMA query_only = ON")
+    conn.execute(f"PRAGMA temp_store = {CONNECTION_PRAGMAS['temp_store']}")
+    conn.db_file = uri
     return conn
 
-def init_db():
-    """Initialise la base de données et crée la table si elle n'existe pas."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
+def replica_stats():
+    """Statistiques de la réplique de lecture en mémoire (voir READ_REPLICA)."""
+    return _replica.stats()
+
+class _ReadCache:
+    """Cache LRU des résultats de lecture, partagé par les sessions et vidé quand la version des données change."""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._size = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, version):
+        """Retourne (True, valeur) si `key` est en cache pour `version`, sinon (False, None)."""
+        with self._lock:
+            if version != self._version or key not in self._entries:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, self._entries[key][0]
+
+    def put(self, key, version, value):
+        """Met `value` en cache, en évinçant les entrées les moins récemment lues au-delà des limites."""
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if version != self._version:
+                self._clear()
+                self._version = version
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._size += size
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                self._size -= self._entries.popitem(last=False)[1][1]
+                self.evictions += 1
+
+    def clear(self):
+        """Vide le cache."""
+        with self._lock:
+            self._clear()
+            self._version = None
+
+    def _clear(self):
+        self._entries.clear()
+        self._size = 0
+
+    def stats(self):
+        """Statistiques d'utilisation du cache."""
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._size, 'version': self._version,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+_read_cache = _ReadCache(READ_CACHE_MAX_ENTRIES, READ_CACHE_MAX_BYTES)
+
+def _estimate_size(value):
+    """Taille approximative (octets) d'un résultat de lecture."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_estimate_size(key) + _estimate_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+def _copy_result(value):
+    """Copie d'un résultat en cache, que l'appelant peut modifier sans altérer le cache."""
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, dict):
+        return {key: _copy_result(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_result(item) for item in value]
+    if isinstance(value, tuple):
+        return tuple(_copy_result(item) for item in value)
+    return value
+
+def _freeze(value):
+    """Représentation hashable d'un argument (listes, ensembles et dictionnaires de filtres compris)."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(value))
+    return value
+
+def cached_read(func):
+    """Met en cache le résultat d'une lecture par arguments et par version des données (une copie par appel)."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        conn = getattr(_local, "conn", None)
+        if conn is not None and conn.in_transaction:
+            # Une transaction en cours peut voir des écritures non validées : pas de cache.
+            return func(*args, **kwargs)
+        version = data_version()
+        key = (DB_FILE, func.__name__, _freeze(args), _freeze(kwargs))
+        found, value = _read_cache.get(key, version)
+        _query_log.add_cache_result(func.__name__, found)
+        if not found:
+            value = func(*args, **kwargs)
+            _read_cache.put(key, version, value)
+        return _copy_result(value)
+    return timed(wrapper)
+
+def cache_stats():
+    """Statistiques du cache de lecture (entrées, taille estimée, succès, échecs, évictions)."""
+    return _read_cache.stats()
+
+def clear_cache():
+    """Vide le cache de lecture (par exemple pour mesurer une lecture à froid)."""
+    _read_cache.clear()
+
+def _invalidate_cache():
+    """Vide le cache de lecture après une écriture de ce processus."""
+    _read_cache.clear()
+
+# --- Diagnostics ---
+
+def _statement_key(sql):
+    """Forme normalisée d'une requête (espaces réduits, listes de paramètres IN abrégées) pour les statistiques."""
+    return _IN_LIST.sub('?, …', _WHITESPACE.sub(' ', sql).strip())
+
+def _new_histogram():
+    return {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'vm_steps': 0,
+            'cache_hits': 0, 'cache_misses': 0, 'buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1)}
+
+def _add_sample(histogram, duration_ms, rows=0, vm_steps=0):
+    histogram['count'] += 1
+    histogram['total_ms'] += duration_ms
+    histogram['max_ms'] = max(histogram['max_ms'], duration_ms)
+    histogram['rows'] += rows
+    histogram['vm_steps'] += vm_steps
+    histogram['buckets'][bisect.bisect_left(LATENCY_BUCKETS_MS, duration_ms)] += 1
+
+class _QueryLog:
+    """Journal en mémoire des requêtes et appels de fonctions (requêtes récentes et lentes, histogrammes de latence)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.recent = deque(maxlen=QUERY_LOG_SIZE)
+            self.slow = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+            self.statements = {}
+            self.functions = {}
+
+    def add_statement(self, record):
+        with self._lock:
+            self.recent.append(record)
+            if record['duration_ms'] >= SLOW_QUERY_MS:
+                self.slow.append(record)
+            histogram = self.statements.setdefault(record['statement'], _new_histogram())
+            _add_sample(histogram, record['duration_ms'], record['rows'], record['vm_steps'])
+
+    def add_call(self, name, duration_ms):
+        with self._lock:
+            _add_sample(self.functions.setdefault(name, _new_histogram()), duration_ms)
+
+    def add_cache_result(self, name, hit):
+        with self._lock:
+            self.functions.setdefault(name, _new_histogram())['cache_hits' if hit else 'cache_misses'] += 1
+
+    def snapshot(self):
+        """Copie cohérente du journal : (requêtes récentes, requêtes lentes, statistiques par requête, par fonction)."""
+        with self._lock:
+            copy = lambda histograms: {key: dict(value, buckets=list(value['buckets'])) for key, value in histograms.items()}
+            return list(self.recent), list(self.slow), copy(self.statements), copy(self.functions)
+
+_query_log = _QueryLog()
+
+def timed(func):
+    """Mesure la durée de chaque appel de `func`, à qui sont attribuées les requêtes exécutées pendant l'appel."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        caller = getattr(_local, "function", None)
+        _local.function = func.__name__
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.function = caller
+            _query_log.add_call(func.__name__, (time.perf_counter() - start) * 1000)
+    return wrapper
+
+def _histogram_frame(histograms, key_column):
+    """DataFrame des statistiques d'un ensemble d'histogrammes (une ligne par clé, classes de latence en colonnes)."""
+    labels = [f"≤ {bound} ms" for bound in LATENCY_BUCKETS_MS] + [f"> {LATENCY_BUCKETS_MS[-1]} ms"]
+    rows = []
+    for key, histogram in histograms.items():
+        count = histogram['count']
+        # Percentile 95 approché : borne supérieure de la classe qui le contient.
+        cumulated, p95 = 0, None
+        for bound, bucket in zip(LATENCY_BUCKETS_MS + [histogram['max_ms']], histogram['buckets']):
+            cumulated += bucket
+            if count and cumulated >= 0.95 * count:
+                p95 = min(bound, histogram['max_ms'])
+                break
+        rows.append({key_column: key, 'count': count, 'total_ms': histogram['total_ms'],
+                     'mean_ms': histogram['total_ms'] / count if count else None, 'p95_ms': p95,
+                     'max_ms': histogram['max_ms'], 'rows': histogram['rows'], 'vm_steps': histogram['vm_steps'],
+                     'cache_hits': histogram['cache_hits'], 'cache_misses': histogram['cache_misses'],
+                     **dict(zip(labels, histogram['buckets']))})
+    columns = [key_column, 'count', 'total_ms', 'mean_ms', 'p95_ms', 'max_ms', 'rows', 'vm_steps', 'cache_hits', 'cache_misses'] + labels
+    return pd.DataFrame(rows, columns=columns).sort_values('total_ms', ascending=False, ignore_index=True)
+
+def get_query_log(slow_only=False):
+    """Requêtes récentes (ou seulement les lentes), de la plus récente à la plus ancienne, en DataFrame."""
+    recent, slow, _, _ = _query_log.snapshot()
+    columns = ['time', 'function', 'statement', 'duration_ms', 'rows', 'vm_steps', 'sql']
+    df = pd.DataFrame((slow if slow_only else recent)[::-1], columns=columns)
+    df['time'] = pd.to_datetime(df['time'], unit='s')
+    return df
+
+def get_statement_stats():
+    """Statistiques de latence par requête SQL (normalisée), de la plus coûteuse au total à la moins coûteuse."""
+    return _histogram_frame(_query_log.snapshot()[2], 'statement')
+
+def get_function_stats():
+    """Statistiques de latence (et de cache, pour les lectures en cache) par fonction de ce module."""
+    return _histogram_frame(_query_log.snapshot()[3], 'function')
+
+def reset_query_log():
+    """Vide le journal des requêtes et les histogrammes."""
+    _query_log.reset()
+    _query_plan.cache_clear()
+
+def explain_query_plan(sql, params=None):
+    """Plan d'exécution d'une requête (EXPLAIN QUERY PLAN), paramètres NULL par défaut."""
+    if params is None:
+        numbers = [int(number) if number else None for number in _PARAMETER.findall(sql)]
+        count = 0
+        for number in numbers:
+            count = max(count, number) if number else count + 1
+        params = [None] * count
+    with connection() as conn:
+        try:
+            rows = sqlite3.Cursor(conn).execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        except (sqlite3.Error, ValueError) as e:
+            return [f"Plan indisponible : {e}"]
+    return [row[3] for row in rows]
+
+@functools.lru_cache(maxsize=QUERY_LOG_SIZE)
+def _query_plan(db_file, sql):
+    """Plan d'exécution d'une requête du journal, calculé une fois par texte de requête (et par base)."""
+    return ' '.join(explain_query_plan(sql))
+
+def get_index_usage():
+    """Utilisation des index par les requêtes du journal ('index', 'table', 'statements', 'executions')."""
+    recent, _, statements, _ = _query_log.snapshot()
+    latest = {record['statement']: record for record in recent}
+    with connection() as conn:
+        indexes = sqlite3.Cursor(conn).execute(
+            "SELECT name, tbl_name FROM sqlite_master WHERE type = 'index' ORDER BY tbl_name, name").fetchall()
+    usage = {name: {'index': name, 'table': table, 'statements': 0, 'executions': 0} for name, table in indexes}
+    for statement, record in latest.items():
+        plan = _query_plan(DB_FILE, record['sql'])
+        for name in usage:
+            if re.search(rf"INDEX {re.escape(name)}\b", plan):
+                usage[name]['statements'] += 1
+                usage[name]['executions'] += statements.get(statement, {}).get('count', 0)
+    return pd.DataFrame(list(usage.values()), columns=['index', 'table', 'statements', 'executions'])
+
+def get_database_stats():
+    """Taille de la base (fichier, WAL, pages) et place occupée par table et index ('objects', None sans dbstat)."""
+    size = lambda path: os.path.getsize(path) if os.path.exists(path) else 0
+    stats = {'file_bytes': size(DB_FILE), 'wal_bytes': size(DB_FILE + '-wal')}
+    with connection() as conn:
+        cursor = sqlite3.Cursor(conn)
+        for pragma in ('page_size', 'page_count', 'freelist_count', 'user_version'):
+            stats[pragma] = cursor.execute(f"PRAGMA {pragma}").fetchone()[0]
+        try:
+            rows = cursor.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name ORDER BY 2 DESC").fetchall()
+            stats['objects'] = pd.DataFrame(rows, columns=['name', 'bytes'])
+        except sqlite3.OperationalError:
+            stats['objects'] = None
+    return stats
+
+@timed
+def init_db(force=False):
+    """Applique les migrations de MIGRATIONS pas encore reçues (PRAGMA user_version), une fois par processus et par base sauf `force`."""
+    global _initialized_db_file
+    if _initialized_db_file == DB_FILE and not force:
+        return
+    with transaction() as conn:
+        # Lu dans la transaction : un autre processus qui migre en même temps est attendu, pas rejoué.
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for migration in MIGRATIONS[version:]:
+            migration(conn)
+        if version < len(MIGRATIONS):
+            conn.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+            conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+            conn.execute("ANALYZE")
+    with connection() as conn:
+        conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+        conn.execute("PRAGMA optimize")
+    _initialized_db_file = DB_FILE
+
+def schema_version():
+    """Numéro de schéma de la base (PRAGMA user_version : nombre de migrations appliquées)."""
+    with connection() as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+# --- Migrations ---
+# Chaque migration reçoit la connexion, déjà en transaction. Les premières reprennent la création du schéma
+# d'avant la numérotation et n'utilisent que des ordres IF NOT EXISTS : une base créée alors (user_version 0)
+# les rejoue sans effet. Une évolution du schéma s'ajoute en fin de liste, sans modifier les précédentes.
+
+def _create_suppliers_table(conn):
+    """Crée la table des fournisseurs."""
+    conn.execute("""
     CREATE TABLE IF NOT EXISTS suppliers (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         raison_sociale TEXT NOT NULL,
@@ -26,155 +951,1465 @@ def init_db():
         statut_audit TEXT,
         commentaires TEXT,
         date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        derniere_modif TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        derniere_modif TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        cle_fournisseur TEXT
     )
     """)
-    conn.commit()
-    conn.close()
 
-def add_supplier(data):
-    """Ajoute un nouveau fournisseur à la base de données."""
-    conn = get_db_connection()
+def _create_sort_indexes(conn):
+    """Crée un index (expression de tri, id) par colonne de SORT_COLUMNS, pour la pagination par curseur."""
+    for column, expression in SORT_COLUMNS.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_suppliers_tri_{column} ON suppliers ({expression}, id)")
+
+def _create_search_index(conn):
+    """Crée l'index plein texte FTS5 (trigram, texte replié par fold()) et ses triggers de synchronisation."""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'suppliers_fts'").fetchone()
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join(f"fold(new.{column})" for column in SEARCH_COLUMNS)
+    conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS suppliers_fts USING fts5({columns}, tokenize = 'trigram')")
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS suppliers_fts_insert AFTER INSERT ON suppliers BEGIN
+        INSERT INTO suppliers_fts (rowid, {columns}) VALUES (new.id, {new_values});
+    END
+    """)
     conn.execute("""
-        INSERT INTO suppliers (raison_sociale, id_oracle, est_prospect, adresse, pays_canton, contacts, tags, statut_audit, commentaires, derniere_modif)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-    """, (data['raison_sociale'], data['id_oracle'], data['est_prospect'], data['adresse'], data['pays_canton'], data['contacts'], ','.join(data['tags']), data['statut_audit'], data['commentaires']))
-    conn.commit()
-    conn.close()
+    CREATE TRIGGER IF NOT EXISTS suppliers_fts_delete AFTER DELETE ON suppliers BEGIN
+        DELETE FROM suppliers_fts WHERE rowid = old.id;
+    END
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS suppliers_fts_update AFTER UPDATE OF {columns} ON suppliers BEGIN
+        UPDATE suppliers_fts SET ({columns}) = ({new_values}) WHERE rowid = new.id;
+    END
+    """)
+    if not exists:
+        folded = ', '.join(f"fold({column})" for column in SEARCH_COLUMNS)
+        conn.execute(f"INSERT INTO suppliers_fts (rowid, {columns}) SELECT id, {folded} FROM suppliers")
+
+def _create_tag_tables(conn):
+    """Crée les tables tags et supplier_tags (indexée dans les deux sens) et y migre les tags existants."""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'supplier_tags'").fetchone()
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS tags (
+        id INTEGER PRIMARY KEY,
+        nom TEXT NOT NULL UNIQUE
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS supplier_tags (
+        supplier_id INTEGER NOT NULL REFERENCES suppliers(id) ON DELETE CASCADE,
+        tag_id INTEGER NOT NULL REFERENCES tags(id) ON DELETE CASCADE,
+        PRIMARY KEY (supplier_id, tag_id)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_supplier_tags_tag ON supplier_tags (tag_id, supplier_id)")
+    if not exists:
+        rows = conn.execute("SELECT id, tags FROM suppliers WHERE IFNULL(tags, '') != ''").fetchall()
+        _store_tags(conn, [(row['id'], _split_tags(row['tags'])) for row in rows])
+
+def _split_tags(tags):
+    """Découpe une chaîne de tags séparés par des virgules (sans doublons ni vides)."""
+    if isinstance(tags, str):
+        tags = tags.split(',')
+    return list(dict.fromkeys(tag.strip() for tag in tags or [] if tag and tag.strip()))
+
+def _store_tags(conn, supplier_tags):
+    """Remplace dans supplier_tags les tags de chaque (supplier_id, liste de tags) de `supplier_tags`."""
+    supplier_tags = list(supplier_tags)
+    names = {tag for _, tags in supplier_tags for tag in tags}
+    conn.executemany("INSERT OR IGNORE INTO tags (nom) VALUES (?)", [(name,) for name in names])
+    tag_ids = dict(conn.execute("SELECT nom, id FROM tags").fetchall())
+    conn.executemany("DELETE FROM supplier_tags WHERE supplier_id = ?", [(supplier_id,) for supplier_id, _ in supplier_tags])
+    conn.executemany("INSERT INTO supplier_tags (supplier_id, tag_id) VALUES (?, ?)",
+                     [(supplier_id, tag_ids[tag]) for supplier_id, tags in supplier_tags for tag in tags])
+
+def _create_supplier_key(conn):
+    """Ajoute la colonne cle_fournisseur (voir name_key) et son index unique, portée par le plus ancien des homonymes."""
+    columns = [row['name'] for row in conn.execute("PRAGMA table_info(suppliers)")]
+    if 'cle_fournisseur' not in columns:
+        conn.execute("ALTER TABLE suppliers ADD COLUMN cle_fournisseur TEXT")
+    rows = conn.execute("SELECT id, raison_sociale FROM suppliers WHERE cle_fournisseur IS NULL ORDER BY id").fetchall()
+    if rows:
+        taken = {row[0] for row in conn.execute("SELECT cle_fournisseur FROM suppliers WHERE cle_fournisseur IS NOT NULL")}
+        keys = []
+        for row in rows:
+            key = name_key(row['raison_sociale'])
+            if key and key not in taken:
+                taken.add(key)
+                keys.append((key, row['id']))
+        conn.executemany("UPDATE suppliers SET cle_fournisseur = ? WHERE id = ?", keys)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_suppliers_cle ON suppliers (cle_fournisseur)")
+
+def _create_similarity_index(conn):
+    """Crée l'index des doublons probables : supplier_similarite (clé, signature MinHash) et supplier_lsh (seaux LSH)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS supplier_similarite (
+            supplier_id INTEGER PRIMARY KEY REFERENCES suppliers(id) ON DELETE CASCADE,
+            cle TEXT NOT NULL,
+            signature BLOB
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS supplier_lsh (
+            bande INTEGER NOT NULL,
+            seau INTEGER NOT NULL,
+            supplier_id INTEGER NOT NULL REFERENCES suppliers(id) ON DELETE CASCADE,
+            PRIMARY KEY (bande, seau, supplier_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_supplier_lsh_supplier ON supplier_lsh (supplier_id)")
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS supplier_similarite_update AFTER UPDATE OF raison_sociale ON suppliers
+        WHEN old.raison_sociale IS NOT new.raison_sociale BEGIN
+            DELETE FROM supplier_similarite WHERE supplier_id = new.id;
+            DELETE FROM supplier_lsh WHERE supplier_id = new.id;
+        END
+    """)
+
+def _create_filter_indexes(conn):
+    """Indexe telles quelles les colonnes filtrées ou recherchées (pays_canton, statut_audit, id_oracle)."""
+    for column in FILTER_INDEX_COLUMNS:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_suppliers_{column} ON suppliers ({column})")
+
+def _create_change_log(conn):
+    """Crée le journal des modifications suppliers_log (triggers sur suppliers), les tendances supplier_trends et leur position."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS suppliers_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        operation TEXT NOT NULL,
+        supplier_id INTEGER NOT NULL,
+        colonnes TEXT,
+        old_statut_audit TEXT,
+        new_statut_audit TEXT,
+        old_est_prospect BOOLEAN,
+        new_est_prospect BOOLEAN,
+        old_tags TEXT,
+        new_tags TEXT
+    )
+    """)
+    for operation in ('UPDATE', 'DELETE'):
+        conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS suppliers_log_{operation.lower()} BEFORE {operation} ON suppliers_log BEGIN
+            SELECT RAISE(ABORT, 'Le journal des modifications ne peut être que complété.');
+        END
+        """)
+    changed = ' OR '.join(f"old.{column} IS NOT new.{column}" for column in CHANGE_LOG_COLUMNS)
+    changed_list = ' || '.join(f"CASE WHEN old.{column} IS NOT new.{column} THEN '{column},' ELSE '' END" for column in CHANGE_LOG_COLUMNS)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS suppliers_changes_insert AFTER INSERT ON suppliers BEGIN
+        INSERT INTO suppliers_log (operation, supplier_id, new_statut_audit, new_est_prospect, new_tags)
+        VALUES ('INSERT', new.id, new.statut_audit, new.est_prospect, new.tags);
+    END
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS suppliers_changes_update AFTER UPDATE ON suppliers WHEN {changed} BEGIN
+        INSERT INTO suppliers_log (operation, supplier_id, colonnes, old_statut_audit, new_statut_audit, old_est_prospect, new_est_prospect, old_tags, new_tags)
+        VALUES ('UPDATE', new.id, rtrim({changed_list}, ','), old.statut_audit, new.statut_audit, old.est_prospect, new.est_prospect, old.tags, new.tags);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS suppliers_changes_delete AFTER DELETE ON suppliers BEGIN
+        INSERT INTO suppliers_log (operation, supplier_id, old_statut_audit, old_est_prospect, old_tags)
+        VALUES ('DELETE', old.id, old.statut_audit, old.est_prospect, old.tags);
+    END
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS supplier_trends (
+        dimension TEXT NOT NULL,
+        valeur TEXT NOT NULL,
+        jour TEXT NOT NULL,
+        delta INTEGER NOT NULL,
+        PRIMARY KEY (dimension, valeur, jour)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE TABLE IF NOT EXISTS supplier_trends_state (id INTEGER PRIMARY KEY CHECK (id = 0), seq INTEGER NOT NULL)")
+    conn.execute("INSERT OR IGNORE INTO supplier_trends_state (id, seq) VALUES (0, 0)")
+    conn.execute("""
+        INSERT INTO suppliers_log (date, operation, supplier_id, new_statut_audit, new_est_prospect, new_tags)
+        SELECT COALESCE(date_creation, CURRENT_TIMESTAMP), 'INSERT', id, statut_audit, est_prospect, tags FROM suppliers
+        WHERE NOT EXISTS (SELECT 1 FROM suppliers_log)
+        ORDER BY date_creation, id
+    """)
+    _apply_change_log(conn)
+
+def _create_maintenance_table(conn):
+    """Crée la table des dernières opérations de maintenance (date et position dans le journal des modifications)."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS maintenance (
+        tache TEXT PRIMARY KEY,
+        date TIMESTAMP NOT NULL,
+        seq INTEGER NOT NULL
+    )
+    """)
 
+def _create_change_log_retention(conn):
+    """Autorise la suppression des entrées du journal déjà reportées dans les tendances (voir _prune_change_log)."""
+    conn.execute("DROP TRIGGER IF EXISTS suppliers_log_delete")
+    conn.execute("""
+    CREATE TRIGGER suppliers_log_delete BEFORE DELETE ON suppliers_log
+    WHEN old.seq > (SELECT seq FROM supplier_trends_state) BEGIN
+        SELECT RAISE(ABORT, 'Le journal des modifications ne peut être que complété.');
+    END
+    """)
+
+MIGRATIONS = [
+    _create_suppliers_table,
+    _create_sort_indexes,
+    _create_search_index,
+    _create_tag_tables,
+    _create_supplier_key,
+    _create_similarity_index,
+    _create_filter_indexes,
+    _create_change_log,
+    _create_maintenance_table,
+    _create_change_log_retention,
+]
+
+@timed
+def add_supplier(data):
+    """Ajoute un fournisseur (avec sa clé de rapprochement si elle est libre) et retourne son id."""
+    return _write(_insert_supplier, data)
+
+def _insert_supplier(conn, data):
+    tags = _split_tags(data['tags'])
+    cursor = conn.execute("""
+        INSERT INTO suppliers (raison_sociale, id_oracle, est_prospect, adresse, pays_canton, contacts, tags, statut_audit, commentaires, derniere_modif, cle_fournisseur)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, (SELECT ?10 WHERE NOT EXISTS (SELECT 1 FROM suppliers WHERE cle_fournisseur = ?10)))
+    """, (data['raison_sociale'], data['id_oracle'], data['est_prospect'], data['adresse'], data['pays_canton'], data['contacts'], ','.join(tags), data['statut_audit'], data['commentaires'], name_key(data['raison_sociale'])))
+    _store_tags(conn, [(cursor.lastrowid, tags)])
+    return cursor.lastrowid
+
+@timed
 def update_supplier(supplier_id, data):
     """Met à jour un fournisseur existant."""
-    conn = get_db_connection()
+    _write(_update_supplier, supplier_id, data)
+
+def _update_supplier(conn, supplier_id, data):
+    tags = _split_tags(data['tags'])
     conn.execute("""
         UPDATE suppliers
-        SET raison_sociale = ?, id_oracle = ?, est_prospect = ?, adresse = ?, pays_canton = ?, contacts = ?, tags = ?, statut_audit = ?, commentaires = ?, derniere_modif = CURRENT_TIMESTAMP
-        WHERE id = ?
-    """, (data['raison_sociale'], data['id_oracle'], data['est_prospect'], data['adresse'], data['pays_canton'], data['contacts'], ','.join(data['tags']), data['statut_audit'], data['commentaires'], supplier_id))
-    conn.commit()
-    conn.close()
+        SET raison_sociale = ?, id_oracle = ?, est_prospect = ?, adresse = ?, pays_canton = ?, contacts = ?, tags = ?, statut_audit = ?, commentaires = ?, derniere_modif = CURRENT_TIMESTAMP,
+            cle_fournisseur = (SELECT ?11 WHERE NOT EXISTS (SELECT 1 FROM suppliers WHERE cle_fournisseur = ?11 AND id != ?10))
+        WHERE id = ?10
+    """, (data['raison_sociale'], data['id_oracle'], data['est_prospect'], data['adresse'], data['pays_canton'], data['contacts'], ','.join(tags), data['statut_audit'], data['commentaires'], supplier_id, name_key(data['raison_sociale'])))
+    _store_tags(conn, [(supplier_id, tags)])
 
+@cached_read
 def get_supplier_by_id(supplier_id):
     """Récupère un fournisseur par son ID."""
-    conn = get_db_connection()
-    supplier = conn.execute('SELECT * FROM suppliers WHERE id = ?', (supplier_id,)).fetchone()
-    conn.close()
+    with read_connection() as conn:
+        supplier = conn.execute('SELECT * FROM suppliers WHERE id = ?', (supplier_id,)).fetchone()
     return dict(supplier) if supplier else None
 
-def get_suppliers(limit, offset, search_term=None, sort_by='raison_sociale', ascending=True):
-    """Récupère une liste paginée et triée de fournisseurs."""
-    conn = get_db_connection()
-    query = "SELECT * FROM suppliers"
-    count_query = "SELECT COUNT(id) FROM suppliers"
+def _filter_conditions(search_term=None, filters=None, ordered=False):
+    """
+    Conditions WHERE (et paramètres) d'une recherche et de filtres ('pays_canton', 'statut_audit', 'est_prospect', 'tags', 'tags_all').
+    `ordered` : requête d'une page triée, qui doit parcourir l'index de tri plutôt que celui d'un filtre.
+    """
+    conditions = []
     params = []
-
     if search_term:
-        query += " WHERE raison_sociale LIKE ?"
-        count_query += " WHERE raison_sociale LIKE ?"
-        params.append(f'%{search_term}%')
-    
+        match = _fts_query(search_term)
+        if match:
+            conditions.append("id IN (SELECT rowid FROM suppliers_fts WHERE suppliers_fts MATCH ?)")
+            params.append(match)
+        else:
+            # Saisie trop courte pour l'index trigram : raisons sociales qui commencent par elle, lues dans
+            # l'index de cle_fournisseur (repliées, pour les doublons de nom restés sans clé).
+            key = name_key(search_term)
+            column = f"{'+' if ordered else ''}cle_fournisseur"
+            conditions.append(f"({column} >= ? AND {column} < ? OR cle_fournisseur IS NULL AND fold(raison_sociale) LIKE ? ESCAPE '\\')")
+            params += [key, key + '\U0010ffff', re.sub(r'([\\%_])', r'\\\1', key) + '%']
+
+    filters = filters or {}
+    for column in ('pays_canton', 'statut_audit'):
+        values = filters.get(column)
+        if values:
+            # Le + unaire écarte l'index de la colonne (voir `ordered`).
+            conditions.append(f"{'+' if ordered else ''}{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+    if filters.get('est_prospect') is not None:
+        conditions.append("IFNULL(est_prospect, 0) = ?")
+        params.append(int(bool(filters['est_prospect'])))
+    for key, match_all in (('tags', False), ('tags_all', True)):
+        tags = _split_tags(filters.get(key))
+        if tags:
+            conditions.append(f"id IN ({_tagged_suppliers_query(len(tags), match_all)})")
+            params.extend(tags)
+            if match_all:
+                params.append(len(tags))
+    return conditions, params
+
+def _tagged_suppliers_query(tag_count, match_all):
+    """Sous-requête des id de fournisseurs ayant un (ou, si `match_all`, chacun) des `tag_count` tags passés en paramètres."""
+    query = ("SELECT DISTINCT st.supplier_id FROM supplier_tags st JOIN tags t ON t.id = st.tag_id"
+             f" WHERE t.nom IN ({', '.join('?' * tag_count)})")
+    if match_all:
+        query += " GROUP BY st.supplier_id HAVING COUNT(*) = ?"
+    return query
+
+def _where(conditions):
+    """Assemble une liste de conditions en clause WHERE."""
+    return f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+def _sort_expression(sort_by):
+    """Retourne l'expression SQL indexée d'une colonne de tri autorisée."""
+    if sort_by not in SORT_COLUMNS:
+        raise ValueError(f"Colonne de tri non autorisée : {sort_by}")
+    return SORT_COLUMNS[sort_by]
+
+@cached_read
+def count_suppliers(search_term=None, filters=None):
+    """Compte les fournisseurs correspondant à une recherche et des filtres."""
+    conditions, params = _filter_conditions(search_term, filters)
+    with read_connection() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM suppliers{_where(conditions)}", params).fetchone()[0]
+
+@cached_read
+def get_suppliers(limit, offset, search_term=None, sort_by='raison_sociale', ascending=True, filters=None):
+    """Récupère une liste paginée (LIMIT/OFFSET) et triée de fournisseurs."""
+    conditions, params = _filter_conditions(search_term, filters, ordered=True)
     order = "ASC" if ascending else "DESC"
-    query += f" ORDER BY {sort_by} {order}"
-    
-    query += " LIMIT ? OFFSET ?"
-    params.extend([limit, offset])
+    query = (f"SELECT * FROM suppliers{_where(conditions)}"
+             f" ORDER BY {_sort_expression(sort_by)} {order}, id {order} LIMIT ? OFFSET ?")
 
-    df = pd.read_sql_query(query, conn, params=params)
-    total_records = conn.execute(count_query, params[:-2]).fetchone()[0]
+    with read_connection() as conn:
+        df = pd.read_sql_query(query, conn, params=params + [limit, offset])
+    return df, count_suppliers(search_term, filters)
 
-    conn.close()
-    return df, total_records
+@cached_read
+def get_suppliers_page(limit, cursor=None, search_term=None, sort_by='raison_sociale', ascending=True, filters=None):
+    """Récupère la page de fournisseurs qui suit `cursor` (valeur de tri, id) : retourne (DataFrame, curseur suivant ou None)."""
+    sort_expression = _sort_expression(sort_by)
+    conditions, params = _filter_conditions(search_term, filters, ordered=True)
+    if cursor is not None:
+        # Forme développée de (tri, id) > (?, ?) : contrairement à la comparaison de
+        # tuples, elle permet à SQLite de positionner l'index d'expression directement.
+        op = '>' if ascending else '<'
+        conditions.append(f"{sort_expression} {op}= ? AND ({sort_expression} {op} ? OR id {op} ?)")
+        params.extend([cursor[0], cursor[0], cursor[1]])
+
+    order = "ASC" if ascending else "DESC"
+    query = (f"SELECT *, {sort_expression} AS _cle_tri FROM suppliers{_where(conditions)}"
+             f" ORDER BY {sort_expression} {order}, id {order} LIMIT ?")
+
+    with read_connection() as conn:
+        df = pd.read_sql_query(query, conn, params=params + [limit + 1])
+
+    next_cursor = None
+    if len(df) > limit:
+        df = df.iloc[:limit]
+        last = df.iloc[-1]
+        next_cursor = (last['_cle_tri'], int(last['id']))
+    return df.drop(columns='_cle_tri'), next_cursor
+
+def _fts_query(search_term, columns=None):
+    """Traduit une saisie en requête FTS5 (tous les mots, repliés, dans `columns`) ; None si aucun mot n'est assez long."""
+    terms = _fold(search_term).split()
+    if not any(len(term) >= FTS_MIN_TERM_LENGTH for term in terms):
+        return None
+    if any(len(term) < FTS_MIN_TERM_LENGTH for term in terms):
+        terms = [' '.join(terms)]
+    query = ' AND '.join('"' + term.replace('"', '""') + '"' for term in terms)
+    if columns:
+        unknown = set(columns) - set(SEARCH_COLUMNS)
+        if unknown:
+            raise ValueError(f"Colonnes de recherche inconnues : {', '.join(sorted(unknown))}")
+        query = f"{{{' '.join(columns)}}} : ({query})"
+    return query
+
+def _restore_highlight(original, marked, markers):
+    """Reporte sur le texte d'origine les marqueurs posés par highlight() sur le texte replié."""
+    if not isinstance(marked, str) or pd.isna(original):
+        return original
+    original = str(original)
+    output = []
+    position = 0
+    for char in marked:
+        if char == '\x01':
+            output.append(markers[0])
+        elif char == '\x02':
+            output.append(markers[1])
+        else:
+            output.append(original[position])
+            position += 1
+    return ''.join(output)
+
+def _excerpt(text, markers, width=60):
+    """Extrait le passage autour de la première correspondance surlignée d'un texte."""
+    start = text.find(markers[0])
+    if start < 0:
+        return None
+    begin = max(0, start - width)
+    end = min(len(text), start + width)
+    return ('…' if begin > 0 else '') + text[begin:end] + ('…' if end < len(text) else '')
+
+@cached_read
+def search_suppliers(search_term, limit=20, offset=0, columns=None, prefix=False, filters=None, markers=('**', '**')):
+    """
+    Recherche plein texte classée par pertinence (bm25), sans casse ni accents ; `prefix` : la raison sociale commence par la saisie.
+    Retourne (DataFrame avec 'nom_surligne' et 'extrait', nombre total de résultats).
+    """
+    match = _fts_query(search_term, columns)
+    if prefix:
+        name_match = _fts_query(search_term, ['raison_sociale'])
+        match = f"({match}) AND ({name_match})" if match and name_match else name_match
+    conditions, params = _filter_conditions(None, filters)
+
+    if match is None:
+        df, total = get_suppliers(limit, offset, search_term, filters=filters)
+        folded_term = _fold(search_term).strip()
+        df['nom_surligne'] = [_highlight_substring(name, folded_term, markers) for name in df['raison_sociale']]
+        df['extrait'] = None
+        return df, total
+
+    conditions.insert(0, "suppliers_fts MATCH ?")
+    params.insert(0, match)
+    if prefix:
+        conditions.append("suppliers_fts.raison_sociale LIKE ?")
+        params.append(_fold(search_term).strip() + '%')
+    where = _where(conditions)
+    highlights = ', '.join(f"highlight(suppliers_fts, {index}, char(1), char(2)) AS _surligne_{column}"
+                           for index, column in enumerate(SEARCH_COLUMNS))
+    weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS)
+    query = f"""
+        SELECT s.*, {highlights}, bm25(suppliers_fts, {weights}) AS score
+        FROM suppliers_fts JOIN suppliers s ON s.id = suppliers_fts.rowid
+        {where}
+        ORDER BY score LIMIT ? OFFSET ?
+    """
+    with read_connection() as conn:
+        df = pd.read_sql_query(query, conn, params=params + [limit, offset])
+        total = conn.execute(f"SELECT COUNT(*) FROM suppliers_fts JOIN suppliers s ON s.id = suppliers_fts.rowid {where}",
+                             params).fetchone()[0]
+
+    excerpts = [None] * len(df)
+    for column in SEARCH_COLUMNS:
+        restored = [_restore_highlight(original, marked, markers)
+                    for original, marked in zip(df[column], df.pop(f'_surligne_{column}'))]
+        if column == 'raison_sociale':
+            df['nom_surligne'] = restored
+            continue
+        for i, text in enumerate(restored):
+            if excerpts[i] is None and isinstance(text, str):
+                excerpt = _excerpt(text, markers)
+                if excerpt:
+                    excerpts[i] = excerpt
+    df['extrait'] = excerpts
+    return df, total
+
+def _highlight_substring(text, folded_term, markers):
+    """Surligne (sans tenir compte de la casse ni des accents) la première occurrence d'un terme."""
+    if not text or not folded_term:
+        return text
+    start = _fold(text).find(folded_term)
+    if start < 0:
+        return text
+    end = start + len(folded_term)
+    return text[:start] + markers[0] + text[start:end] + markers[1] + text[end:]
+
+@cached_read
+def suggest_suppliers(term, limit=SUGGEST_LIMIT):
+    """Saisie semi-automatique : au plus `limit` fournisseurs dont la raison sociale commence par `term`, puis qui le contiennent."""
+    key = name_key(term or '')
+    columns = ['id', 'raison_sociale', 'id_oracle', 'adresse']
+    if not key:
+        return pd.DataFrame(columns=columns)
+    # U+10FFFF est encodé après tout autre caractère : [clé, clé + U+10FFFF) couvre tous les préfixes.
+    with read_connection() as conn:
+        df = pd.read_sql_query(f"""
+            SELECT {', '.join(columns)} FROM suppliers
+            WHERE cle_fournisseur >= ? AND cle_fournisseur < ?
+            ORDER BY cle_fournisseur LIMIT ?
+        """, conn, params=[key, key + '\U0010ffff', limit])
+        match = _fts_query(key, ['raison_sociale'])
+        if len(df) < limit and match:
+            contained = pd.read_sql_query(f"""
+                SELECT {', '.join(f's.{column}' for column in columns)}
+                FROM suppliers_fts JOIN suppliers s ON s.id = suppliers_fts.rowid
+                WHERE suppliers_fts MATCH ? AND s.id NOT IN ({', '.join('?' * len(df))})
+                LIMIT ?
+            """, conn, params=[match] + df['id'].tolist() + [limit - len(df)])
+            df = pd.concat([df, contained], ignore_index=True) if not df.empty else contained
+    return df
+
+@cached_read
+def get_all_tags():
+    """Retourne la liste triée des tags attribués à au moins un fournisseur."""
+    with read_connection() as conn:
+        rows = conn.execute("""
+            SELECT nom FROM tags
+            WHERE EXISTS (SELECT 1 FROM supplier_tags WHERE tag_id = tags.id)
+            ORDER BY nom
+        """).fetchall()
+    return [row['nom'] for row in rows]
+
+@cached_read
+def get_supplier_ids_by_tags(tags, match='any'):
+    """Retourne les id des fournisseurs ayant au moins un (`match='any'`) ou tous (`match='all'`) les tags donnés."""
+    if match not in ('any', 'all'):
+        raise ValueError(f"Mode de correspondance inconnu : {match}")
+    tags = _split_tags(tags)
+    if not tags:
+        return []
+    params = tags + ([len(tags)] if match == 'all' else [])
+    with read_connection() as conn:
+        rows = conn.execute(_tagged_suppliers_query(len(tags), match == 'all'), params).fetchall()
+    return [row[0] for row in rows]
+
+@cached_read
+def get_tag_counts(search_term=None, filters=None):
+    """Nombre de fournisseurs par tag (DataFrame 'tag', 'count'), calculé en SQL sur la sélection filtrée."""
+    conditions, params = _filter_conditions(search_term, filters)
+    where = f" WHERE st.supplier_id IN (SELECT id FROM suppliers{_where(conditions)})" if conditions else ""
+    query = f"""
+        SELECT t.nom AS tag, COUNT(*) AS count
+        FROM supplier_tags st JOIN tags t ON t.id = st.tag_id{where}
+        GROUP BY t.id ORDER BY count DESC, tag
+    """
+    with read_connection() as conn:
+        return pd.read_sql_query(query, conn, params=params)
+
+@cached_read
+def get_filter_options():
+    """Valeurs proposées dans les filtres ('pays_canton', 'statut_audit', 'tags'), lues dans les index de tri."""
+    options = {}
+    with read_connection() as conn:
+        for column in ('pays_canton', 'statut_audit'):
+            expression = SORT_COLUMNS[column]
+            rows = conn.execute(f"SELECT DISTINCT {expression} FROM suppliers ORDER BY {expression}").fetchall()
+            options[column] = [row[0] for row in rows if row[0] != '']
+    options['tags'] = get_all_tags()
+    return options
+
+def _load_filter_index():
+    """Index des filtres du Dashboard pour la version courante des données, partagé par toutes les sessions."""
+    global _filter_index
+    conn = getattr(_local, "conn", None)
+    if conn is not None and conn.in_transaction:
+        # Écritures non validées visibles : index propre à cette lecture.
+        return _build_filter_index(conn)
+    key = (DB_FILE, data_version())
+    with _filter_index_lock:
+        if _filter_index is None or _filter_index['key'] != key:
+            with read_connection() as conn:
+                _filter_index = _build_filter_index(conn)
+            _filter_index['key'] = key
+        return _filter_index
+
+@timed
+def _build_filter_index(conn):
+    """
+    Encode les champs filtrables de tous les fournisseurs, dans l'ordre des id : codes de catégorie ('codes',
+    'categories', 'lookup'), 'prospect' et masques de bits des tags ('tag_bits', 'word_bits', 'tag_rows').
+    """
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    rows = cursor.execute("""
+        SELECT id, pays_canton, statut_audit, IFNULL(est_prospect, 0), strftime('%Y-%m', date_creation)
+        FROM suppliers ORDER BY id
+    """).fetchall()
+    ids, cantons, statuses, prospects, months = zip(*rows) if rows else ((),) * 5
+    ids = np.array(ids, dtype=np.int64)
+    index = {'ids': ids, 'prospect': np.array(prospects, dtype=bool), 'codes': {}, 'categories': {}, 'lookup': {}}
+    for column, values in (('pays_canton', cantons), ('statut_audit', statuses), ('mois', months)):
+        codes, categories = pd.factorize(pd.Series(values, dtype=object), sort=True)
+        categories = categories.to_numpy(dtype=object)
+        if column == 'mois' and len(categories):
+            # Mois sans ajout inclus : les codes deviennent des positions dans la suite complète des mois.
+            all_months = pd.period_range(categories[0], categories[-1], freq='M').strftime('%Y-%m').to_numpy(dtype=object)
+            codes = np.where(codes >= 0, np.searchsorted(all_months, categories)[codes], -1)
+            categories = all_months
+        # Codes sur 16 bits tant que possible : moins de mémoire à parcourir à chaque filtre.
+        index['codes'][column] = codes.astype(np.int16 if len(categories) < 2**15 else np.int32)
+        index['categories'][column] = categories
+        index['lookup'][column] = {value: code for code, value in enumerate(categories)}
+
+    tags = cursor.execute("""
+        SELECT t.nom, group_concat(st.supplier_id) FROM tags t JOIN supplier_tags st ON st.tag_id = t.id
+        GROUP BY t.id ORDER BY t.nom
+    """).fetchall()
+    index['tags'] = np.array([name for name, _ in tags], dtype=object)
+    index['lookup']['tags'] = {name: position for position, (name, _) in enumerate(tags)}
+    index['tag_rows'] = []
+    # Mots aussi petits que le permet le nombre de tags (un octet par fournisseur jusqu'à 8 tags), en
+    # colonnes contiguës (ordre Fortran) : un filtre ne parcourt que les mots des tags sélectionnés.
+    word = next(dtype for dtype in (np.uint8, np.uint16, np.uint32, np.uint64) if len(tags) <= np.iinfo(dtype).bits or dtype is np.uint64)
+    index['word_bits'] = word_bits = np.iinfo(word).bits
+    index['tag_bits'] = np.zeros((len(ids), max(-(-len(tags) // word_bits), 1)), dtype=word, order='F')
+    for position, (_, members) in enumerate(tags):
+        members = np.array(members.split(','), dtype=np.int64)
+        tag_rows = np.searchsorted(ids, members)
+        # Liens vers un fournisseur ajouté après la lecture de la table : ignorés (l'index sera reconstruit).
+        tag_rows = tag_rows[(tag_rows < len(ids)) & (ids[np.minimum(tag_rows, len(ids) - 1)] == members)]
+        index['tag_bits'][tag_rows, position // word_bits] |= word(1) << word(position % word_bits)
+        index['tag_rows'].append(tag_rows)
+    return index
+
+def _filter_mask(index, search_term=None, filters=None):
+    """Masque booléen (ordre de index['ids']) des fournisseurs retenus par une recherche et des filtres de _filter_conditions."""
+    mask = np.ones(len(index['ids']), dtype=bool)
+    filters = filters or {}
+    for column in ('pays_canton', 'statut_audit'):
+        values = filters.get(column)
+        if values:
+            # Une comparaison d'entiers par valeur retenue (bien plus rapide qu'une table de correspondance).
+            hits = np.zeros(len(mask), dtype=bool)
+            for code in {index['lookup'][column][value] for value in values if value in index['lookup'][column]}:
+                hits |= index['codes'][column] == code
+            mask &= hits
+    if filters.get('est_prospect') is not None:
+        mask &= index['prospect'] == bool(filters['est_prospect'])
+    for key, match_all in (('tags', False), ('tags_all', True)):
+        tags = _split_tags(filters.get(key))
+        if not tags:
+            continue
+        positions = [index['lookup']['tags'].get(tag) for tag in tags]
+        if match_all and None in positions:
+            mask[:] = False
+            continue
+        word, word_bits = index['tag_bits'].dtype.type, index['word_bits']
+        selection = np.zeros(index['tag_bits'].shape[1], dtype=word)
+        for position in positions:
+            if position is not None:
+                selection[position // word_bits] |= word(1) << word(position % word_bits)
+        hits = np.ones(len(mask), dtype=bool) if match_all else np.zeros(len(mask), dtype=bool)
+        for column in np.flatnonzero(selection):
+            bits = index['tag_bits'][:, column] & selection[column]
+            if match_all:
+                hits &= bits == selection[column]
+            else:
+                hits |= bits != 0
+        mask &= hits
+
+    if search_term and mask.any():
+        conditions, params = _filter_conditions(search_term)
+        with read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            matched = np.array([row[0] for row in cursor.execute(f"SELECT id FROM suppliers{_where(conditions)}", params)], dtype=np.int64)
+        mask &= np.isin(index['ids'], matched)
+    return mask
+
+def _category_counts(index, column, mask, label=None):
+    """Nombre de fournisseurs retenus par valeur d'une colonne encodée (DataFrame `label`, 'count', du plus fréquent au moins fréquent)."""
+    counts = np.bincount(index['codes'][column][mask] + 1, minlength=len(index['categories'][column]) + 1)[1:]
+    present = np.flatnonzero(counts)
+    # Catégories triées par valeur : le tri stable par fréquence départage les égalités par ordre alphabétique.
+    order = present[np.argsort(-counts[present], kind='stable')]
+    return pd.DataFrame({label or column: index['categories'][column][order], 'count': counts[order]})
+
+@cached_read
+def get_dashboard_aggregates(search_term=None, filters=None):
+    """
+    Indicateurs du Dashboard pour une sélection filtrée : 'total', 'critiques', 'prospects' et DataFrames
+    'par_canton', 'par_statut', 'par_tag' et 'par_mois' (mois sans ajout inclus), calculés sur l'index des filtres.
+    """
+    index = _load_filter_index()
+    mask = _filter_mask(index, search_term, filters)
+    tag_counts = np.array([np.count_nonzero(mask[tag_rows]) for tag_rows in index['tag_rows']], dtype=np.int64)
+    present = np.flatnonzero(tag_counts)
+    order = present[np.argsort(-tag_counts[present], kind='stable')]
+    critical = index['lookup']['tags'].get(CRITICAL_TAG)
+
+    months = np.bincount(index['codes']['mois'][mask] + 1, minlength=len(index['categories']['mois']) + 1)[1:]
+    active = np.flatnonzero(months)
+    span = slice(active[0], active[-1] + 1) if len(active) else slice(0, 0)
+    return {
+        'total': int(np.count_nonzero(mask)),
+        'critiques': int(tag_counts[critical]) if critical is not None else 0,
+        'prospects': int(np.count_nonzero(index['prospect'] & mask)),
+        'par_canton': _category_counts(index, 'pays_canton', mask),
+        'par_statut': _category_counts(index, 'statut_audit', mask),
+        'par_tag': pd.DataFrame({'tag': index['tags'][order], 'count': tag_counts[order]}),
+        'par_mois': pd.DataFrame({'date_creation': index['categories']['mois'][span], 'count': months[span]}),
+    }
+
+def _change_log_deltas(conn, since):
+    """Variations des tendances ({(dimension, valeur, jour): delta}) des entrées du journal après `since`, et dernière entrée lue."""
+    rows = conn.execute("""
+        SELECT substr(date, 1, 10), operation, old_statut_audit, new_statut_audit,
+               IFNULL(old_est_prospect, 0) != 0, IFNULL(new_est_prospect, 0) != 0, old_tags, new_tags, COUNT(*), MAX(seq)
+        FROM suppliers_log WHERE seq > ? GROUP BY 1, 2, 3, 4, 5, 6, 7, 8
+    """, (since,)).fetchall()
+    deltas = Counter()
+    for day, operation, old_status, new_status, old_prospect, new_prospect, old_tags, new_tags, count, _ in rows:
+        sides = []
+        if operation != 'INSERT':
+            sides.append((-count, old_status, old_prospect, old_tags))
+        if operation != 'DELETE':
+            sides.append((count, new_status, new_prospect, new_tags))
+        for delta, status, prospect, tags in sides:
+            deltas[('total', '', day)] += delta
+            deltas[('statut_audit', status or '', day)] += delta
+            deltas[('est_prospect', str(prospect), day)] += delta
+            for tag in _split_tags(tags):
+                deltas[('tag', tag, day)] += delta
+    return deltas, max((row[-1] for row in rows), default=since)
+
+def _change_log_seq(conn):
+    """Numéro de la dernière entrée du journal des modifications, même si elle a été supprimée depuis."""
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'suppliers_log'").fetchone()
+    return row[0] if row else 0
+
+def _prune_change_log(conn, seq):
+    """Supprime les entrées du journal reportées dans les tendances et plus anciennes que CHANGE_LOG_RETENTION_DAYS."""
+    deleted = conn.execute("""
+        DELETE FROM suppliers_log WHERE seq <= (SELECT seq FROM supplier_trends_state) AND date < datetime('now', ?)
+    """, (f"-{CHANGE_LOG_RETENTION_DAYS} days",)).rowcount
+    _record_maintenance(conn, 'journal', seq)
+    return deleted
+
+def _apply_change_log(conn):
+    """Reporte dans supplier_trends les entrées du journal postérieures à sa position, puis avance celle-ci."""
+    since = conn.execute("SELECT seq FROM supplier_trends_state").fetchone()[0]
+    deltas, last = _change_log_deltas(conn, since)
+    if last == since:
+        return
+    conn.executemany("""
+        INSERT INTO supplier_trends (dimension, valeur, jour, delta) VALUES (?, ?, ?, ?)
+        ON CONFLICT (dimension, valeur, jour) DO UPDATE SET delta = delta + excluded.delta
+    """, [key + (delta,) for key, delta in deltas.items() if delta])
+    conn.execute("UPDATE supplier_trends_state SET seq = ?", (last,))
+
+@cached_read
+def get_supplier_trends(dimension, frequency='D'):
+    """Nombre de fournisseurs par date (fin de période de `frequency`) et par valeur d'une dimension de TREND_DIMENSIONS."""
+    if dimension not in TREND_DIMENSIONS:
+        raise ValueError(f"Dimension de tendance inconnue : {dimension}")
+    with read_connection() as conn:
+        rows = conn.execute("SELECT valeur, jour, delta FROM supplier_trends WHERE dimension = ?", (dimension,)).fetchall()
+        since = conn.execute("SELECT seq FROM supplier_trends_state").fetchone()[0]
+        pending, _ = _change_log_deltas(conn, since)
+    records = [tuple(row) for row in rows] + [(value, day, delta) for (name, value, day), delta in pending.items() if name == dimension]
+    deltas = pd.DataFrame.from_records(records, columns=['valeur', 'jour', 'delta'])
+    if deltas.empty:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name='date'))
+    deltas['jour'] = pd.to_datetime(deltas['jour'])
+    daily = deltas.pivot_table(index='jour', columns='valeur', values='delta', aggfunc='sum', fill_value=0)
+    days = pd.date_range(daily.index.min(), max(daily.index.max(), pd.Timestamp.now(tz='UTC').tz_localize(None).normalize()), freq='D', name='date')
+    counts = daily.reindex(days, fill_value=0).cumsum().resample(frequency).last()
+    return counts.loc[:, (counts != 0).any()].rename_axis(columns=None)
+
+def _export_batches(search_term, filters, sort_by, ascending, batch_size):
+    """Lit par fetchmany les fournisseurs d'une recherche et de filtres : un DataFrame par lot de `batch_size` lignes."""
+    sort_expression = _sort_expression(sort_by)
+    conditions, params = _filter_conditions(search_term, filters)
+    order = "ASC" if ascending else "DESC"
+    query = (f"SELECT {', '.join(EXPORT_COLUMNS)} FROM suppliers{_where(conditions)}"
+             f" ORDER BY {sort_expression} {order}, id {order}")
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            batch = pd.DataFrame.from_records(rows, columns=list(EXPORT_COLUMNS))
+            batch['est_prospect'] = batch['est_prospect'].fillna(0).astype(bool)
+            yield batch
+
+@timed
+def export_suppliers(output, file_format, search_term=None, filters=None, sort_by='raison_sociale', ascending=True,
+                     batch_size=EXPORT_BATCH_SIZE):
+    """
+    Exporte par lots les fournisseurs d'une recherche et de filtres dans `output` ('csv', 'xlsx' ou 'parquet').
+    Retourne le nombre de fournisseurs exportés.
+    """
+    writers = {'csv': _write_csv, 'xlsx': _write_excel, 'parquet': _write_parquet}
+    if file_format not in writers:
+        raise ValueError(f"Format d'export non pris en charge : {file_format}")
+    batches = _export_batches(search_term, filters, sort_by, ascending, batch_size)
+    try:
+        return writers[file_format](output, batches)
+    finally:
+        batches.close()
+
+def export_suppliers_file(file_format, **kwargs):
+    """Variante d'export_suppliers qui retourne un fichier temporaire rembobiné, prêt à être lu."""
+    output = tempfile.TemporaryFile()
+    try:
+        export_suppliers(output, file_format, **kwargs)
+    except Exception:
+        output.close()
+        raise
+    output.seek(0)
+    return output
+
+def _write_csv(output, batches):
+    # BOM écrit une fois pour toutes (le codec utf-8-sig le gère ligne à ligne, bien plus lentement).
+    output.write(codecs.BOM_UTF8)
+    text = io.TextIOWrapper(output, encoding='utf-8', newline='')
+    text.write(','.join(EXPORT_COLUMNS.values()) + '\n')
+    count = 0
+    for batch in batches:
+        batch.to_csv(text, header=False, index=False)
+        count += len(batch)
+    text.flush()
+    # Rend `output` à l'appelant sans le fermer avec l'enveloppe texte.
+    text.detach()
+    return count
 
+def _write_excel(output, batches):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = None
+    sheet_rows = EXCEL_MAX_ROWS
+    count = 0
+    for batch in batches:
+        for row in batch.astype(object).where(batch.notna(), None).itertuples(index=False, name=None):
+            if sheet_rows == EXCEL_MAX_ROWS:
+                sheet = workbook.create_sheet("Fournisseurs" if sheet is None else f"Fournisseurs ({len(workbook.worksheets) + 1})")
+                sheet.append(list(EXPORT_COLUMNS.values()))
+                sheet_rows = 1
+            sheet.append(row)
+            sheet_rows += 1
+        count += len(batch)
+    if sheet is None:
+        workbook.create_sheet("Fournisseurs").append(list(EXPORT_COLUMNS.values()))
+    workbook.save(output)
+    return count
+
+def _write_parquet(output, batches):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(label, pa.bool_() if field == 'est_prospect' else pa.string()) for field, label in EXPORT_COLUMNS.items()])
+    count = 0
+    with pq.ParquetWriter(output, schema) as writer:
+        for batch in batches:
+            writer.write_table(pa.Table.from_pandas(batch.rename(columns=EXPORT_COLUMNS), schema=schema, preserve_index=False))
+            count += len(batch)
+    return count
+
+@timed
 def delete_supplier(supplier_id):
     """Supprime un fournisseur."""
-    conn = get_db_connection()
+    _write(_delete_supplier, supplier_id)
+
+def _delete_supplier(conn, supplier_id):
     conn.execute('DELETE FROM suppliers WHERE id = ?', (supplier_id,))
-    conn.commit()
-    conn.close()
 
-def get_suppliers_prefill_data():
-    """Récupère un dictionnaire de données pour le pré-remplissage du formulaire."""
-    conn = get_db_connection()
-    df = pd.read_sql_query("SELECT raison_sociale, id_oracle, adresse FROM suppliers", conn)
-    conn.close()
-    
-    prefill_data = {}
-    for _, row in df.iterrows():
-        prefill_data[row['raison_sociale']] = {
-            'id_oracle': row['id_oracle'],
-            'adresse': row['adresse']
-        }
-    return prefill_data
-
-def analyze_import_data(df):
-    """
-    Analyse un DataFrame importé et le compare à la base de données.
-    Retourne des listes de nouveaux fournisseurs et de conflits (uniquement les champs modifiés).
-    """
-    conn = get_db_connection()
-    existing_suppliers_df = pd.read_sql_query("SELECT id, raison_sociale, id_oracle, adresse FROM suppliers", conn)
-    conn.close()
+def _bulk_targets(conn, ids=None, search_term=None, filters=None):
+    """Fournisseurs visés par une opération groupée (liste `ids`, ou recherche et filtres), lus dans sa transaction."""
+    if ids is not None:
+        conditions, params = ["id IN (SELECT value FROM json_each(?))"], [json.dumps([int(supplier_id) for supplier_id in ids])]
+    else:
+        conditions, params = _filter_conditions(search_term, filters)
+    return conn.execute(f"SELECT id, statut_audit, est_prospect, tags FROM suppliers{_where(conditions)}", params).fetchall()
 
-    new_suppliers = []
-    conflicts = []
-
-    existing_map = existing_suppliers_df.set_index('raison_sociale').to_dict('index')
-
-    for _, row in df.iterrows():
-        name = row['Raison Sociale']
-        new_data = {
-            'raison_sociale': name,
-            'id_oracle': str(row['Numéro de fournisseur']) if pd.notna(row['Numéro de fournisseur']) else '',
-            'adresse': str(row['Adresse']) if pd.notna(row['Adresse']) else ''
-        }
-
-        if name in existing_map:
-            old_data = existing_map[name]
-            old_id_str = str(old_data['id_oracle']) if pd.notna(old_data['id_oracle']) else ''
-            old_adresse_str = str(old_data['adresse']) if pd.notna(old_data['adresse']) else ''
-
-            id_changed = new_data['id_oracle'] != old_id_str
-            address_changed = new_data['adresse'] != old_adresse_str
-
-            if id_changed or address_changed:
-                conflict_details = {
-                    'raison_sociale': name,
-                    'old_id': old_id_str,
-                    'new_id': new_data['id_oracle'],
-                    'id_changed': id_changed,
-                    'old_adresse': old_adresse_str,
-                    'new_adresse': new_data['adresse'],
-                    'address_changed': address_changed,
-                }
-                conflicts.append(conflict_details)
-        else:
-            new_suppliers.append(new_data)
-            
-    return new_suppliers, conflicts
+@timed
+def bulk_update_suppliers(ids=None, search_term=None, filters=None, statut_audit=None, est_prospect=None, add_tags=None, remove_tags=None):
+    """Modifie en une transaction le statut, le prospect et les tags des fournisseurs visés ; retourne le nombre de modifiés."""
+    _snapshot_before('modification_groupee', len(ids) if ids is not None else count_suppliers(search_term, filters))
+    return _write(_bulk_update_suppliers, ids, search_term, filters, statut_audit, est_prospect, _split_tags(add_tags), _split_tags(remove_tags))
 
-def execute_import(new_suppliers, approved_conflicts):
-    """Exécute les insertions et les mises à jour validées par l'utilisateur."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    for supplier in new_suppliers:
-        cursor.execute(
-            "INSERT INTO suppliers (raison_sociale, id_oracle, adresse, est_prospect) VALUES (?, ?, ?, ?)",
-            (supplier['raison_sociale'], supplier['id_oracle'], supplier['adresse'], False)
-        )
+def _bulk_update_suppliers(conn, ids, search_term, filters, statut_audit, est_prospect, add_tags, remove_tags):
+    updates = []
+    supplier_tags = []
+    for row in _bulk_targets(conn, ids, search_term, filters):
+        tags = _split_tags(row['tags'])
+        new_tags = [tag for tag in tags if tag not in remove_tags] + [tag for tag in add_tags if tag not in tags and tag not in remove_tags]
+        new_status = row['statut_audit'] if statut_audit is None else statut_audit
+        new_prospect = bool(row['est_prospect']) if est_prospect is None else bool(est_prospect)
+        if (new_status, new_prospect, new_tags) == (row['statut_audit'], bool(row['est_prospect']), tags):
+            continue
+        updates.append((new_status, new_prospect, ','.join(new_tags), row['id']))
+        if new_tags != tags:
+            supplier_tags.append((row['id'], new_tags))
+    conn.executemany("""
+        UPDATE suppliers SET statut_audit = ?, est_prospect = ?, tags = ?, derniere_modif = CURRENT_TIMESTAMP WHERE id = ?
+    """, updates)
+    _store_tags(conn, supplier_tags)
+    return len(updates)
 
-    for conflict in approved_conflicts:
-        cursor.execute(
-            "UPDATE suppliers SET id_oracle = ?, adresse = ?, derniere_modif = CURRENT_TIMESTAMP WHERE raison_sociale = ?",
-            (conflict['new_id'], conflict['new_adresse'], conflict['raison_sociale'])
-        )
-    
-    conn.commit()
-    conn.close()
-    return len(new_suppliers), len(approved_conflicts)
+@timed
+def bulk_delete_suppliers(ids=None, search_term=None, filters=None):
+    """Supprime en une transaction les fournisseurs de la liste `ids` ou, si elle est absente, ceux de la recherche et des filtres. Retourne leur nombre."""
+    _snapshot_before('suppression_groupee', len(ids) if ids is not None else count_suppliers(search_term, filters))
+    return _write(_bulk_delete_suppliers, ids, search_term, filters)
+
+def _bulk_delete_suppliers(conn, ids, search_term, filters):
+    targets = _bulk_targets(conn, ids, search_term, filters)
+    conn.executemany('DELETE FROM suppliers WHERE id = ?', [(row['id'],) for row in targets])
+    return len(targets)
+
+def name_key(name):
+    """Clé de rapprochement d'une raison sociale : minuscules, sans accents, espaces normalisés."""
+    return _WHITESPACE.sub(' ', _fold(name)).strip()
+
+def name_keys(names):
+    """Version vectorisée de name_key pour une Series (mêmes opérations, même résultat)."""
+    return (names.astype(str).str.translate(_FOLD_TABLE)
+            .str.replace(_WHITESPACE, ' ', regex=True).str.strip())
+
+def similarity_key(name):
+    """Clé de similarité d'une raison sociale ("SOCIETE GENERALE S.A." -> "societe generale"), plus tolérante que name_key."""
+    return similarity_keys(pd.Series([name]))[0]
+
+def similarity_keys(names):
+    """Version vectorisée de similarity_key pour une Series."""
+    words = (names.astype(str).str.translate(_FOLD_TABLE)
+             .str.replace(_NON_WORD, ' ', regex=True).str.strip()
+             .str.replace(_SPLIT_INITIALS, r'\1', regex=True))
+    # Un nom fait uniquement d'une forme juridique garde sa clé complète.
+    return pd.Series([' '.join(NAME_ABBREVIATIONS.get(word, word) for word in text.split() if word not in LEGAL_FORM_TOKENS) or text
+                      for text in words],
+                     index=names.index, dtype=object)
+
+def _minhash_signatures(keys):
+    """Signatures MinHash (uint32, FUZZY_PERMUTATIONS par clé) des trigrammes de clés non vides."""
+    padded = [f" {key} " for key in keys]
+    counts = np.fromiter((len(text) - 2 for text in padded), dtype=np.int64, count=len(padded))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+    hashes = pd.util.hash_array(np.array([text[i:i + 3] for text in padded for i in range(len(text) - 2)], dtype=object))
+    multipliers, offsets = _MINHASH_COEFFICIENTS
+    signatures = np.empty((len(padded), FUZZY_PERMUTATIONS), dtype=np.uint32)
+    for first in range(0, len(padded), _MINHASH_BATCH):
+        last = min(first + _MINHASH_BATCH, len(padded))
+        low, high = starts[first], starts[last - 1] + counts[last - 1]
+        # Hachage universel (a * x + b, modulo 2**64) dont on garde les 32 bits de poids fort ; une ligne
+        # par permutation, pour que le minimum de chaque nom porte sur des valeurs contiguës en mémoire.
+        values = ((multipliers[:, None] * hashes[None, low:high] + offsets[:, None]) >> np.uint64(32)).astype(np.uint32)
+        signatures[first:last] = np.minimum.reduceat(values, starts[first:last] - low, axis=1).T
+    return signatures
 
+def _trigram_similarity(first, second, trigrams):
+    """Coefficient de Dice des trigrammes de deux clés (`trigrams` mémorise les ensembles déjà calculés)."""
+    sets = []
+    for key in (first, second):
+        if key not in trigrams:
+            text = f" {key} "
+            trigrams[key] = {text[i:i + 3] for i in range(len(text) - 2)}
+        sets.append(trigrams[key])
+    return 2 * len(sets[0] & sets[1]) / (len(sets[0]) + len(sets[1]))
+
+def _lsh_buckets(signatures):
+    """Seau de chaque bande de chaque signature (entiers signés 64 bits), de forme (n, FUZZY_BANDS)."""
+    bands = signatures.reshape(len(signatures), FUZZY_BANDS, -1).astype(np.uint64)
+    buckets = np.zeros(bands.shape[:2], dtype=np.uint64)
+    for row in range(bands.shape[2]):
+        buckets = pd.util.hash_array((buckets ^ bands[:, :, row]).ravel()).reshape(buckets.shape)
+    return buckets.view(np.int64)
+
+def _refresh_similarity_index():
+    """Indexe les fournisseurs ajoutés ou renommés depuis la dernière mise à jour de l'index des doublons."""
+    with connection() as conn:
+        pending = pd.read_sql_query("""
+            SELECT id, raison_sociale FROM suppliers s
+            WHERE NOT EXISTS (SELECT 1 FROM supplier_similarite WHERE supplier_id = s.id)
+        """, conn)
+    for start in range(0, len(pending), _MINHASH_BATCH):
+        part = pending.iloc[start:start + _MINHASH_BATCH]
+        keys = similarity_keys(part['raison_sociale'])
+        indexed = (keys != '').to_numpy()
+        signatures = _minhash_signatures(keys[indexed])
+        blobs = np.full(len(part), None, dtype=object)
+        blobs[indexed] = [signature.tobytes() for signature in signatures]
+        ids = np.repeat(part['id'].to_numpy()[indexed], FUZZY_BANDS)
+        bands = np.tile(np.arange(FUZZY_BANDS), len(signatures))
+        buckets = _lsh_buckets(signatures).ravel()
+        # Insertion dans l'ordre de la clé primaire : les pages du B-tree sont remplies l'une après l'autre.
+        order = np.lexsort((ids, buckets, bands))
+        _write(_store_similarity,
+               list(zip(part['id'].tolist(), keys.tolist(), blobs, part['raison_sociale'].tolist())),
+               list(zip(bands[order].tolist(), buckets[order].tolist(), ids[order].tolist())))
+
+def _store_similarity(conn, entries, buckets):
+    """Enregistre les entrées (id, clé, signature, raison sociale indexée) et les seaux (bande, seau, id) d'un lot."""
+    conn.executemany("""
+        INSERT OR REPLACE INTO supplier_similarite (supplier_id, cle, signature)
+        SELECT ?1, ?2, ?3 WHERE EXISTS (SELECT 1 FROM suppliers WHERE id = ?1 AND raison_sociale = ?4)
+    """, entries)
+    conn.executemany("""
+        INSERT OR IGNORE INTO supplier_lsh (bande, seau, supplier_id)
+        SELECT ?1, ?2, ?3 WHERE EXISTS (SELECT 1 FROM supplier_similarite WHERE supplier_id = ?3)
+    """, buckets)
+
+def _load_similarity_index():
+    """Met à jour puis charge en mémoire l'index des doublons probables ('buckets', 'suppliers', 'signatures')."""
+    _refresh_similarity_index()
+    with connection() as conn:
+        buckets = pd.read_sql_query("SELECT bande, seau, supplier_id FROM supplier_lsh", conn)
+        suppliers = pd.read_sql_query("""
+            SELECT s.supplier_id, s.cle, s.signature, p.raison_sociale
+            FROM supplier_similarite s JOIN suppliers p ON p.id = s.supplier_id
+            WHERE s.signature IS NOT NULL
+        """, conn)
+    signatures = np.frombuffer(b''.join(suppliers.pop('signature')), dtype=np.uint32).reshape(len(suppliers), FUZZY_PERMUTATIONS)
+    # Seaux triés (bande et seau réunis en une clé) : les candidats se trouvent par recherche dichotomique.
+    keys = _bucket_keys(buckets['bande'].to_numpy(), buckets['seau'].to_numpy())
+    positions = pd.Series(np.arange(len(suppliers)), index=suppliers['supplier_id']).reindex(buckets['supplier_id']).to_numpy()
+    order = np.argsort(keys, kind='stable')
+    return {'keys': keys[order], 'positions': positions[order], 'suppliers': suppliers, 'signatures': signatures}
+
+def _bucket_keys(bands, buckets):
+    """Clé unique (uint64) d'un couple (bande, seau)."""
+    return buckets.astype(np.int64).view(np.uint64) ^ (bands.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15))
+
+@timed
+def find_probable_duplicates(names, threshold=FUZZY_MATCH_THRESHOLD, index=None):
+    """
+    Fournisseur existant le plus ressemblant à chaque raison sociale de `names`, parmi ceux de ses seaux LSH.
+    Retourne un DataFrame de même index : 'doublon_id', 'doublon_raison_sociale' et 'doublon_score' (vides sans doublon).
+    """
+    result = pd.DataFrame({'doublon_id': pd.Series(pd.NA, index=names.index, dtype='Int64'),
+                           'doublon_raison_sociale': pd.Series(None, index=names.index, dtype=object),
+                           'doublon_score': pd.Series(np.nan, index=names.index)})
+    keys = similarity_keys(names).reset_index(drop=True)
+    keys = keys[keys != '']
+    if keys.empty:
+        return result
+    if index is None:
+        index = _load_similarity_index()
+    for start in range(0, len(keys), _MINHASH_BATCH):
+        batch = keys.iloc[start:start + _MINHASH_BATCH]
+        best = _best_duplicates(batch, index, threshold)
+        rows = names.index[batch.index[best['ligne'].to_numpy()]]
+        suppliers = index['suppliers'].iloc[best['position'].to_numpy()]
+        result.loc[rows, 'doublon_id'] = suppliers['supplier_id'].to_numpy()
+        result.loc[rows, 'doublon_raison_sociale'] = suppliers['raison_sociale'].to_numpy()
+        result.loc[rows, 'doublon_score'] = best['score'].to_numpy()
+    return result
+
+def _new_file_index():
+    """Index des doublons probables des lignes d'un fichier d'import, au format de _load_similarity_index, vide."""
+    return {'keys': np.empty(0, dtype=np.uint64), 'positions': np.empty(0, dtype=np.int64),
+            'suppliers': pd.DataFrame({'cle': pd.Series(dtype=object), 'raison_sociale': pd.Series(dtype=object)}),
+            'signatures': np.empty((0, FUZZY_PERMUTATIONS), dtype=np.uint32)}
+
+def _find_file_duplicates(names, file_index, searched, threshold=FUZZY_MATCH_THRESHOLD):
+    """Doublon probable des lignes `searched` de `names` parmi les lignes précédentes du fichier, auxquelles elles sont ajoutées."""
+    result = pd.DataFrame({'doublon_raison_sociale': pd.Series(None, index=names.index, dtype=object),
+                           'doublon_score': pd.Series(np.nan, index=names.index)})
+    keys = similarity_keys(names).reset_index(drop=True)
+    keys = keys[keys != '']
+    if keys.empty:
+        return result
+    first = len(file_index['suppliers'])
+    signatures = _minhash_signatures(keys)
+    bucket_keys = _bucket_keys(np.tile(np.arange(FUZZY_BANDS), len(keys)), _lsh_buckets(signatures).ravel())
+    all_keys = np.concatenate([file_index['keys'], bucket_keys])
+    positions = np.concatenate([file_index['positions'], np.repeat(np.arange(first, first + len(keys)), FUZZY_BANDS)])
+    order = np.argsort(all_keys, kind='stable')
+    file_index['keys'], file_index['positions'] = all_keys[order], positions[order]
+    file_index['signatures'] = np.concatenate([file_index['signatures'], signatures])
+    file_index['suppliers'] = pd.concat([file_index['suppliers'], pd.DataFrame(
+        {'cle': keys.to_numpy(), 'raison_sociale': names.to_numpy()[keys.index]})], ignore_index=True)
+    lines = np.flatnonzero(searched.to_numpy()[keys.index])
+    for start in range(0, len(lines), _MINHASH_BATCH):
+        batch_lines = lines[start:start + _MINHASH_BATCH]
+        batch = keys.iloc[batch_lines]
+        best = _best_duplicates(batch, file_index, threshold, signatures[batch_lines], limits=first + batch_lines)
+        rows = names.index[batch.index[best['ligne'].to_numpy()]]
+        result.loc[rows, 'doublon_raison_sociale'] = file_index['suppliers']['raison_sociale'].iloc[best['position'].to_numpy()].to_numpy()
+        result.loc[rows, 'doublon_score'] = best['score'].to_numpy()
+    return result
+
+def _best_duplicates(keys, index, threshold, signatures=None, limits=None):
+    """Meilleur doublon probable ('ligne', 'position', 'score') de chaque clé non vide de `keys` (avant limits[ligne])."""
+    if signatures is None:
+        signatures = _minhash_signatures(keys)
+    bucket_keys = _bucket_keys(np.tile(np.arange(FUZZY_BANDS), len(keys)), _lsh_buckets(signatures).ravel())
+    # Pour chaque seau de chaque clé, plage des fournisseurs du même seau dans l'index trié.
+    first = np.searchsorted(index['keys'], bucket_keys, side='left')
+    counts = np.searchsorted(index['keys'], bucket_keys, side='right') - first
+    if not counts.any():
+        return pd.DataFrame(columns=['ligne', 'position', 'score'])
+    ends = np.cumsum(counts)
+    matches = np.arange(ends[-1]) - np.repeat(ends - counts - first, counts)
+    lines = np.repeat(np.arange(len(keys)), FUZZY_BANDS)[np.repeat(np.arange(len(bucket_keys)), counts)]
+    pairs = np.unique((lines.astype(np.int64) << 32) | index['positions'][matches])
+    candidates = pd.DataFrame({'ligne': pairs >> 32, 'position': pairs & 0xFFFFFFFF})
+    if limits is not None:
+        candidates = candidates[candidates['position'].to_numpy() < limits[candidates['ligne'].to_numpy()]]
+
+    # Similarité de Jaccard estimée : proportion de valeurs communes aux deux signatures.
+    candidates['estimation'] = (signatures[candidates['ligne']] == index['signatures'][candidates['position']]).mean(axis=1)
+    candidates = candidates[candidates['estimation'] >= FUZZY_CANDIDATE_JACCARD]
+
+    # Clés identiques : score 1 sans autre calcul. Sinon, seuls les meilleurs candidats sont comparés.
+    incoming_keys = keys.to_numpy()
+    existing_keys = index['suppliers']['cle'].to_numpy()
+    identical = incoming_keys[candidates['ligne'].to_numpy()] == existing_keys[candidates['position'].to_numpy()]
+    exact = candidates[identical].assign(score=1.0)
+    candidates = (candidates[~identical & ~candidates['ligne'].isin(exact['ligne'])]
+                  .sort_values(['ligne', 'estimation'], ascending=[True, False])
+                  .groupby('ligne').head(FUZZY_MAX_CANDIDATES))
+    trigrams = {}
+    candidates['score'] = [_trigram_similarity(incoming_keys[line], existing_keys[position], trigrams)
+                           for line, position in zip(candidates['ligne'], candidates['position'])]
+    candidates = pd.concat([exact, candidates])
+    best = (candidates[candidates['score'] >= threshold]
+            .sort_values(['ligne', 'score'], ascending=[True, False]).drop_duplicates('ligne'))
+    return best[['ligne', 'position', 'score']]
+
+def _normalize_values(values):
+    """Normalise une colonne pour la comparaison (manquants -> '', espaces superflus retirés, 12345.0 -> '12345')."""
+    if pd.api.types.is_float_dtype(values) and (values.dropna() % 1 == 0).all():
+        values = values.astype('Int64')
+    return values.astype('string').fillna('').str.strip().astype(object)
+
+def _prepare_import_frame(df):
+    """Renomme et normalise les colonnes reconnues d'un import, calcule 'cle_fournisseur' et garde la première ligne par clé."""
+    columns = {label: field for label, field in IMPORT_COLUMNS.items() if label in df.columns}
+    frame = df[list(columns)].rename(columns=columns)
+    for field in frame.columns:
+        frame[field] = _normalize_values(frame[field])
+    frame['cle_fournisseur'] = df['cle_fournisseur'] if 'cle_fournisseur' in df.columns else name_keys(frame['raison_sociale'])
+    frame = frame[frame['cle_fournisseur'] != '']
+    return frame.drop_duplicates('cle_fournisseur').reset_index(drop=True)
+
+@timed
+def analyze_import_data(df, compare_columns=None, fuzzy=True):
+    """
+    Compare un DataFrame importé à la base, par jointure sur la clé de raison sociale (doublons probables signalés avec `fuzzy`).
+    Retourne (nouveaux fournisseurs, conflits avec 'old_<champ>', 'new_<champ>', '<champ>_changed' et 'changed_columns').
+    """
+    return analyze_import_chunks([df], compare_columns, fuzzy)
+
+@timed
+def analyze_import_chunks(chunks, compare_columns=None, fuzzy=True):
+    """Variante d'analyze_import_data pour un fichier lu par lots (déjà dédoublonnés entre eux) : chaque lot est comparé dès sa lecture."""
+    existing = None
+    similarity_index = None
+    file_index = _new_file_index()
+    new_parts = []
+    conflict_parts = []
+    for chunk in chunks:
+        incoming = _prepare_import_frame(chunk)
+        if existing is None:
+            if compare_columns is None:
+                compare_columns = [field for field in incoming.columns if field not in ('raison_sociale', 'cle_fournisseur')]
+            missing = set(compare_columns) - set(incoming.columns)
+            if missing:
+                raise ValueError(f"Champs absents du fichier d'import : {', '.join(sorted(missing))}")
+            existing = _load_import_targets(compare_columns)
+        new_suppliers, conflicts = _diff_import_frame(incoming, existing, compare_columns)
+        if fuzzy:
+            if similarity_index is None:
+                similarity_index = _load_similarity_index()
+            duplicates = find_probable_duplicates(new_suppliers['raison_sociale'], index=similarity_index)
+            # À défaut d'un fournisseur existant, une ligne précédente du fichier (doublon_id vide).
+            in_file = _find_file_duplicates(new_suppliers['raison_sociale'], file_index, duplicates['doublon_raison_sociale'].isna())
+            rows = in_file['doublon_raison_sociale'].notna()
+            duplicates.loc[rows, ['doublon_raison_sociale', 'doublon_score']] = in_file.loc[rows, ['doublon_raison_sociale', 'doublon_score']]
+            new_suppliers = new_suppliers.join(duplicates)
+        new_parts.append(new_suppliers)
+        conflict_parts.append(conflicts)
+
+    if existing is None:
+        # Aucune ligne de données (en-tête seul) : résultat vide, avec les colonnes habituelles.
+        labels = {field: label for label, field in IMPORT_COLUMNS.items()}
+        columns = REQUIRED_IMPORT_COLUMNS + [labels[field] for field in compare_columns or [] if labels[field] not in REQUIRED_IMPORT_COLUMNS]
+        return analyze_import_chunks([pd.DataFrame(columns=columns, dtype=object)], compare_columns, fuzzy)
+    return pd.concat(new_parts, ignore_index=True), pd.concat(conflict_parts, ignore_index=True)
+
+def _load_import_targets(compare_columns):
+    """Charge les fournisseurs rapprochables (clé non nulle) avec leurs champs comparés déjà normalisés."""
+    select = ', '.join(['id', 'raison_sociale', 'cle_fournisseur'] + list(compare_columns))
+    with connection() as conn:
+        existing = pd.read_sql_query(f"SELECT {select} FROM suppliers WHERE cle_fournisseur IS NOT NULL", conn)
+    for field in compare_columns:
+        existing[field] = _normalize_values(existing[field])
+    return existing
+
+def _diff_import_frame(incoming, existing, compare_columns):
+    """Compare un lot préparé (_prepare_import_frame) aux fournisseurs existants ; voir analyze_import_data."""
+    merged = incoming.merge(existing, on='cle_fournisseur', how='left', suffixes=('', '_old'))
+    is_new = merged['id'].isna()
+    new_suppliers = merged.loc[is_new, list(incoming.columns)].reset_index(drop=True)
+
+    matched = merged.loc[~is_new].reset_index(drop=True)
+    conflicts = pd.DataFrame({'id': matched['id'].astype('int64'), 'raison_sociale': matched['raison_sociale_old'],
+                              'cle_fournisseur': matched['cle_fournisseur']})
+    changes = pd.DataFrame(index=matched.index)
+    for field in compare_columns:
+        old = matched[f'{field}_old']
+        new = matched[field]
+        changes[field] = old.ne(new)
+        conflicts[f'old_{field}'] = old
+        conflicts[f'new_{field}'] = new
+        conflicts[f'{field}_changed'] = changes[field]
+
+    has_changes = changes.any(axis=1) if compare_columns else pd.Series(False, index=matched.index)
+    conflicts['changed_columns'] = changes.dot(changes.columns + ',').str.rstrip(',') if compare_columns else ''
+    return new_suppliers, conflicts[has_changes].reset_index(drop=True)
+
+def _import_staging_frame(new_suppliers, approved_conflicts):
+    """Lignes à appliquer ('id' None pour un nouveau fournisseur ; pour un conflit, None dans les champs inchangés)."""
+    columns = ['id', 'cle_fournisseur', 'raison_sociale'] + IMPORT_FIELDS
+    new_suppliers = pd.DataFrame(new_suppliers)
+    if not new_suppliers.empty and 'cle_fournisseur' not in new_suppliers.columns:
+        new_suppliers['cle_fournisseur'] = name_keys(new_suppliers['raison_sociale'])
+    new_suppliers = new_suppliers.reindex(columns=columns[1:])
+    new_suppliers.insert(0, 'id', None)
+
+    conflicts = pd.DataFrame(approved_conflicts)
+    updates = pd.DataFrame(columns=columns)
+    if not conflicts.empty:
+        updates = conflicts[['id', 'cle_fournisseur', 'raison_sociale']].copy()
+        for field in IMPORT_FIELDS:
+            if f'{field}_changed' in conflicts.columns:
+                updates[field] = conflicts[f'new_{field}'].where(conflicts[f'{field}_changed'].astype(bool))
+        updates = updates.reindex(columns=columns)
+
+    frames = [frame for frame in (new_suppliers, updates) if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    frame = pd.concat(frames, ignore_index=True).drop_duplicates('cle_fournisseur')
+    return frame.astype(object).where(frame.notna(), None)
+
+@timed
+def execute_import(new_suppliers, approved_conflicts, chunk_size=IMPORT_CHUNK_SIZE, progress_callback=None):
+    """
+    Applique les nouveaux fournisseurs et les conflits approuvés d'analyze_import_data, par lots de `chunk_size` lignes.
+    Retourne {'inserted', 'updated', 'skipped', 'total', 'chunks'} ; `progress_callback(traitées, total)` suit chaque lot.
+    """
+    frame = _import_staging_frame(new_suppliers, approved_conflicts)
+    columns = list(frame.columns)
+    insert_columns = ', '.join(columns[1:])
+    upsert = f"""
+        INSERT INTO suppliers ({insert_columns}, est_prospect, derniere_modif)
+        SELECT {insert_columns}, 0, CURRENT_TIMESTAMP FROM import_staging WHERE id IS NULL
+        ON CONFLICT (cle_fournisseur) DO UPDATE SET {', '.join(f"{field} = COALESCE(excluded.{field}, {field})" for field in IMPORT_FIELDS)},
+            derniere_modif = CURRENT_TIMESTAMP
+    """
+    update = f"""
+        UPDATE suppliers SET {', '.join(f"{field} = COALESCE(s.{field}, suppliers.{field})" for field in IMPORT_FIELDS)},
+            derniere_modif = CURRENT_TIMESTAMP
+        FROM import_staging s WHERE s.id IS NOT NULL AND suppliers.id = s.id
+    """
+    result = {'inserted': 0, 'updated': 0, 'skipped': 0, 'total': len(frame), 'chunks': 0}
+    rows = list(frame.itertuples(index=False, name=None))
+    _snapshot_before('import', len(rows))
+
+    # Un lot par opération de l'écrivain : les écritures des autres utilisateurs passent entre deux lots.
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        inserted, updated, skipped = _write(_import_chunk, columns, chunk, upsert, update)
+        result['inserted'] += inserted
+        result['updated'] += updated
+        result['skipped'] += skipped
+        result['chunks'] += 1
+        if progress_callback:
+            progress_callback(start + len(chunk), len(rows))
+    return result
+
+def _import_chunk(conn, columns, chunk, upsert, update):
+    """Applique un lot d'import via import_staging ; retourne les nombres de fournisseurs ajoutés, mis à jour et ignorés."""
+    conn.execute("DROP TABLE IF EXISTS temp.import_staging")
+    conn.execute(f"CREATE TEMP TABLE import_staging ({', '.join(columns)}, UNIQUE (cle_fournisseur))")
+    conn.executemany(f"INSERT INTO import_staging VALUES ({', '.join('?' * len(columns))})", chunk)
+    new_rows, matched = conn.execute("""
+        SELECT COUNT(*), COUNT(*) FILTER (WHERE EXISTS (SELECT 1 FROM suppliers WHERE cle_fournisseur = s.cle_fournisseur))
+        FROM import_staging s WHERE id IS NULL
+    """).fetchone()
+    updated = conn.execute(update).rowcount
+    conn.execute(upsert)
+    conn.execute("DROP TABLE temp.import_staging")
+    return new_rows - matched, matched + updated, len(chunk) - new_rows - updated
+
+@timed
 def delete_all_suppliers():
-    """Supprime TOUS les fournisseurs de la base de données."""
-    conn = get_db_connection()
+    """Supprime TOUS les fournisseurs de la base de données, après une sauvegarde si elle n'est pas vide."""
+    if count_suppliers():
+        backup_database('suppression_totale')
+    _write(_delete_all_suppliers)
+
+def _delete_all_suppliers(conn):
     conn.execute('DELETE FROM suppliers')
-    conn.commit()
-    conn.close()
+
+# --- Sauvegardes et maintenance ---
+
+_maintenance_lock = threading.Lock()
+_maintenance_run_lock = threading.Lock()
+_maintenance_thread = None
+_maintenance_error = None
+
+def _backup_dir():
+    """Dossier des sauvegardes, à côté de la base des fournisseurs."""
+    return f"{os.path.splitext(DB_FILE)[0]}_sauvegardes"
+
+@timed
+def backup_database(reason='manuelle'):
+    """Sauvegarde la base en ligne, par étapes espacées, dans un fichier renommé une fois complet ; retourne son chemin."""
+    directory = _backup_dir()
+    os.makedirs(directory, exist_ok=True)
+    now = time.time()
+    path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now * 1000000) % 1000000:06d}_{reason}.db")
+    source = sqlite3.connect(DB_FILE, timeout=CONNECTION_PRAGMAS['busy_timeout'] / 1000, isolation_level=None)
+    target = sqlite3.connect(path + '.tmp')
+    try:
+        # Transaction de lecture ouverte pendant toute la copie : en WAL, la sauvegarde porte sur cet instantané
+        # et les écritures des autres connexions ne la font pas reprendre de zéro.
+        source.execute("BEGIN")
+        seq = _change_log_seq(source)
+        source.backup(target, pages=BACKUP_STEP_PAGES, progress=lambda status, remaining, total: time.sleep(BACKUP_STEP_SLEEP))
+    except Exception:
+        target.close()
+        os.remove(path + '.tmp')
+        raise
+    finally:
+        target.close()
+        source.close()
+    os.replace(path + '.tmp', path)
+    for old in sorted(name for name in os.listdir(directory) if BACKUP_NAME_PATTERN.fullmatch(name))[:-BACKUP_KEEP]:
+        os.remove(os.path.join(directory, old))
+    state = os.path.join(directory, BACKUP_STATE_FILE)
+    with open(state + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'date': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(now)), 'time': now, 'seq': seq}, f)
+    os.replace(state + '.tmp', state)
+    return path
+
+def _last_backup():
+    """Dernière sauvegarde ({'date' (UTC), 'time', 'seq'}), ou None."""
+    try:
+        with open(os.path.join(_backup_dir(), BACKUP_STATE_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _snapshot_before(operation, rows):
+    """Sauvegarde la base avant une opération qui supprime ou réécrit `rows` fournisseurs, à partir de SNAPSHOT_MIN_ROWS."""
+    if rows >= SNAPSHOT_MIN_ROWS:
+        backup_database(operation)
+
+def list_backups():
+    """Sauvegardes disponibles, de la plus récente à la plus ancienne : DataFrame 'nom', 'date', 'motif', 'taille'."""
+    directory = _backup_dir()
+    names = sorted(os.listdir(directory), reverse=True) if os.path.isdir(directory) else []
+    matches = [match for match in map(BACKUP_NAME_PATTERN.fullmatch, names) if match]
+    return pd.DataFrame({
+        'nom': [match.group(0) for match in matches],
+        'date': pd.to_datetime([match.group(1) for match in matches], format='%Y%m%d-%H%M%S'),
+        'motif': [match.group(2) for match in matches],
+        'taille': [os.path.getsize(os.path.join(directory, match.group(0))) for match in matches],
+    })
+
+@timed
+def restore_backup(name):
+    """Remplace la base par la sauvegarde `name` (voir list_backups), après une sauvegarde de l'état actuel."""
+    global _initialized_db_file
+    path = os.path.join(_backup_dir(), os.path.basename(name))
+    if not BACKUP_NAME_PATTERN.fullmatch(os.path.basename(name)) or not os.path.isfile(path):
+        raise ValueError(f"Sauvegarde introuvable : {name}")
+    backup_database('restauration')
+    source = sqlite3.connect(path)
+    target = sqlite3.connect(DB_FILE, timeout=CONNECTION_PRAGMAS['busy_timeout'] / 1000)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    # Le journal restauré n'a plus les mêmes seq : la prochaine maintenance refait une sauvegarde.
+    if os.path.exists(os.path.join(_backup_dir(), BACKUP_STATE_FILE)):
+        os.remove(os.path.join(_backup_dir(), BACKUP_STATE_FILE))
+    _initialized_db_file = None
+    init_db()
+    _invalidate_cache()
+
+def _record_maintenance(conn, task, seq):
+    conn.execute("""
+        INSERT INTO maintenance (tache, date, seq) VALUES (?, CURRENT_TIMESTAMP, ?)
+        ON CONFLICT (tache) DO UPDATE SET date = excluded.date, seq = excluded.seq
+    """, (task, seq))
+
+def _analyze(conn, seq):
+    conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA optimize")
+    _record_maintenance(conn, 'analyse', seq)
+
+def _incremental_vacuum():
+    """Rend au système les pages libres, par transactions de VACUUM_STEP_PAGES pages."""
+    conn = sqlite3.connect(DB_FILE, timeout=CONNECTION_PRAGMAS['busy_timeout'] / 1000, isolation_level=None)
+    try:
+        while conn.execute("PRAGMA freelist_count").fetchone()[0]:
+            conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})")
+    finally:
+        conn.close()
+
+@timed
+def convert_to_incremental_vacuum():
+    """Passe une base existante en auto_vacuum incrémental par un VACUUM complet (bloque les écritures)."""
+    with connection() as conn:
+        seq = _change_log_seq(conn)
+    conn = sqlite3.connect(DB_FILE, timeout=CONNECTION_PRAGMAS['busy_timeout'] / 1000, isolation_level=None)
+    try:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    _write(_record_maintenance, 'vacuum', seq)
+
+@timed
+def run_maintenance(force=False):
+    """Exécute les tâches de maintenance dont le seuil est atteint (toutes les tâches utiles avec `force`) et les retourne."""
+    global _maintenance_error
+    with _maintenance_run_lock:
+        with connection() as conn:
+            seq = _change_log_seq(conn)
+            suppliers = conn.execute("SELECT COUNT(*) FROM suppliers").fetchone()[0]
+            state = {row['tache']: (row['seq'], row['age']) for row in conn.execute(
+                "SELECT tache, seq, (julianday('now') - julianday(date)) * 86400 AS age FROM maintenance")}
+        backup = _last_backup()
+        if backup:
+            state['sauvegarde'] = (backup['seq'], time.time() - backup['time'])
+        done = []
+        backup_seq, backup_age = state.get('sauvegarde', (0, None))
+        if seq > backup_seq and (force or backup_age is None or backup_age >= BACKUP_INTERVAL_SECONDS):
+            backup_database('periodique')
+            done.append('sauvegarde')
+        analyze_seq, _ = state.get('analyse', (0, None))
+        if seq > analyze_seq and (force or seq - analyze_seq >= max(ANALYZE_MIN_CHANGES, suppliers * ANALYZE_CHURN_RATIO)):
+            _write(_analyze, seq)
+            done.append('analyse')
+        _, prune_age = state.get('journal', (0, None))
+        if force or prune_age is None or prune_age >= CHANGE_LOG_PRUNE_SECONDS:
+            if _write(_prune_change_log, seq):
+                done.append('journal')
+        with connection() as conn:
+            cursor = sqlite3.Cursor(conn)
+            page_count, freelist, auto_vacuum = (cursor.execute(f"PRAGMA {pragma}").fetchone()[0]
+                                                 for pragma in ('page_count', 'freelist_count', 'auto_vacuum'))
+        if auto_vacuum == 2 and freelist and (force or (freelist >= VACUUM_MIN_PAGES and freelist >= page_count * VACUUM_FREELIST_RATIO)):
+            _incremental_vacuum()
+            _write(_record_maintenance, 'vacuum', seq)
+            done.append('vacuum')
+        _maintenance_error = None
+        return done
+
+def _maintenance_loop():
+    global _maintenance_error
+    while True:
+        time.sleep(MAINTENANCE_CHECK_SECONDS)
+        try:
+            run_maintenance()
+        except Exception as e:
+            _maintenance_error = f"{type(e).__name__}: {e}"
+
+def start_maintenance():
+    """Démarre (une fois par processus) le planificateur qui lance run_maintenance toutes les MAINTENANCE_CHECK_SECONDS secondes."""
+    global _maintenance_thread
+    with _maintenance_lock:
+        if _maintenance_thread is None:
+            _maintenance_thread = threading.Thread(target=_maintenance_loop, name="database-maintenance", daemon=True)
+            _maintenance_thread.start()
+
+def maintenance_stats():
+    """État de la maintenance : 'running', 'tasks', 'pending_changes', 'incremental_vacuum', 'last_error', 'backups'."""
+    with connection() as conn:
+        tasks = pd.read_sql_query("SELECT tache, date, seq FROM maintenance ORDER BY tache", conn)
+        seq = _change_log_seq(conn)
+        auto_vacuum = sqlite3.Cursor(conn).execute("PRAGMA auto_vacuum").fetchone()[0]
+    backup = _last_backup()
+    if backup:
+        tasks = pd.concat([tasks[tasks['tache'] != 'sauvegarde'], pd.DataFrame([{'tache': 'sauvegarde', 'date': backup['date'], 'seq': backup['seq']}])],
+                          ignore_index=True).sort_values('tache', ignore_index=True)
+    analyzed = tasks.loc[tasks['tache'] == 'analyse', 'seq']
+    return {'running': _maintenance_thread is not None, 'tasks': tasks, 'pending_changes': seq - (int(analyzed.iloc[0]) if len(analyzed) else 0),
+            'incremental_vacuum': auto_vacuum == 2, 'last_error': _maintenance_error, 'backups': len(list_backups())}
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+import database as db
+
+# Nombre de lignes lues (et analysées) à la fois.
+CHUNK_SIZE = 20000
+
+class ImportFileError(ValueError):
+    """Fichier d'import illisible ou auquel il manque des colonnes obligatoires."""
+
+def read_import_file(file, filename, chunk_size=CHUNK_SIZE):
+    """
+    Ouvre un fichier d'import CSV ou Excel et retourne un itérateur de DataFrames d'au plus
+    `chunk_size` lignes, sans jamais charger le fichier entier en mémoire :
+    - le CSV est lu par blocs (pandas, chunksize), l'Excel ligne à ligne (openpyxl en lecture seule) ;
+    - seules les colonnes reconnues (database.IMPORT_COLUMNS) sont conservées, en texte ;
+    - les colonnes obligatoires sont vérifiées sur l'en-tête, avant toute lecture des données
+      (ImportFileError si elles manquent) ;
+    - les raisons sociales en double sont écartées d'un lot à l'autre (première occurrence gardée) ;
+      chaque lot porte leur clé normalisée dans la colonne 'cle_fournisseur'.
+    """
+    if filename.lower().endswith('.csv'):
+        header = list(pd.read_csv(file, nrows=0).columns)
+        file.seek(0)
+        _check_header(header)
+        chunks = _csv_chunks(file, chunk_size)
+    elif filename.lower().endswith('.xlsx'):
+        chunks = _excel_chunks(file, chunk_size)
+        try:
+            _check_header(next(chunks))
+        except ImportFileError:
+            chunks.close()
+            raise
+    else:
+        raise ImportFileError("Format de fichier non pris en charge (CSV ou Excel .xlsx attendu).")
+    return _deduplicate(chunks)
+
+def _check_header(columns):
+    """Vérifie que l'en-tête contient toutes les colonnes obligatoires."""
+    missing = [column for column in db.REQUIRED_IMPORT_COLUMNS if column not in columns]
+    if missing:
+        raise ImportFileError(f"Le fichier doit contenir les colonnes : {', '.join(db.REQUIRED_IMPORT_COLUMNS)}.")
+
+def _csv_chunks(file, chunk_size):
+    """Lit un CSV par blocs, colonnes reconnues uniquement et tout en texte."""
+    yield from pd.read_csv(file, chunksize=chunk_size, dtype=str, usecols=lambda column: column in db.IMPORT_COLUMNS)
+
+def _excel_chunks(file, chunk_size):
+    """
+    Lit la première feuille d'un classeur en lecture seule. Le premier élément produit est
+    la liste des colonnes de l'en-tête, les suivants sont des DataFrames de lignes.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(value) if value is not None else '' for value in next(rows, ())]
+        yield header
+        positions = [(index, column) for index, column in enumerate(header) if column in db.IMPORT_COLUMNS]
+        columns = [column for _, column in positions]
+        batch = []
+        for row in rows:
+            batch.append([_cell_text(row[index]) if index < len(row) else None for index, _ in positions])
+            if len(batch) >= chunk_size:
+                yield pd.DataFrame(batch, columns=columns, dtype=object)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns, dtype=object)
+    finally:
+        workbook.close()
+
+def _cell_text(value):
+    """Convertit une cellule Excel en texte (12345.0 -> '12345'), None si elle est vide."""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def _deduplicate(chunks):
+    """
+    Écarte les raisons sociales (clé normalisée) déjà vues dans le lot ou dans un lot précédent.
+    Les clés vues sont conservées sous forme d'empreintes 64 bits dans un tableau numpy trié
+    (8 octets par fournisseur), plutôt que dans un ensemble de chaînes.
+    """
+    seen = np.empty(0, dtype=np.uint64)
+    for chunk in chunks:
+        names = chunk['Raison Sociale']
+        keys = db.name_keys(names.where(names.notna(), ''))
+        hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+        positions = np.searchsorted(seen, hashes)
+        already_seen = seen[np.minimum(positions, len(seen) - 1)] == hashes if len(seen) else np.zeros(len(hashes), dtype=bool)
+        keep = ~keys.duplicated().to_numpy() & ~already_seen
+        seen = np.sort(np.concatenate([seen, hashes[keep]]))
+        yield chunk[keep].assign(cle_fournisseur=keys[keep])
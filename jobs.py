@@ -0,0 +1,339 @@
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+
+import database as db
+import importer
+
+# Nombre de tâches exécutées en même temps ; les suivantes attendent leur tour.
+JOB_WORKERS = 2
+# Intervalle minimal (secondes) entre deux enregistrements de la progression d'une tâche.
+PROGRESS_INTERVAL = 0.5
+# Nombre de tâches conservées dans la table (les plus anciennes sont supprimées avec leur résultat et leurs conflits).
+JOB_HISTORY = 20
+# Lignes insérées par executemany lors de l'enregistrement des conflits d'une analyse.
+CONFLICT_BATCH_SIZE = 5000
+
+# Statuts d'une tâche.
+QUEUED = 'en_attente'
+RUNNING = 'en_cours'
+DONE = 'terminee'
+FAILED = 'echec'
+
+_lock = threading.Lock()
+_init_lock = threading.Lock()
+_executor = None
+_initialized_file = None
+# Analyses réutilisables : (base, empreinte du fichier) -> (id de la tâche, version des données analysées).
+_analyses = {}
+# Imports en attente ou en cours : (base, empreinte des données) -> id de la tâche.
+_imports = {}
+
+def _jobs_file():
+    """
+    Base SQLite des tâches, à côté de la base des fournisseurs. Les tâches n'y sont pas rangées :
+    chaque écriture y changerait la version des données (database.data_version) et viderait le cache de lecture.
+    """
+    return f"{os.path.splitext(db.DB_FILE)[0]}_jobs.db"
+
+@contextmanager
+def _connection():
+    """Connexion courte (autocommit) à la base des tâches, créée au premier usage."""
+    global _initialized_file
+    conn = sqlite3.connect(_jobs_file(), isolation_level=None, timeout=5)
+    conn.row_factory = sqlite3.Row
+    try:
+        with _init_lock:
+            if _initialized_file != _jobs_file():
+                _create_job_table(conn)
+                _initialized_file = _jobs_file()
+        yield conn
+    finally:
+        conn.close()
+
+def _create_job_table(conn):
+    """
+    Crée la table des tâches et celle des conflits d'import à valider (voir _stage_conflicts).
+    Une tâche restée en attente ou en cours appartient à un processus arrêté depuis
+    (les tâches ne survivent pas au processus) : elle est marquée en échec.
+    """
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL,
+            cle TEXT,
+            statut TEXT NOT NULL,
+            progression REAL NOT NULL DEFAULT 0,
+            message TEXT,
+            resultat TEXT,
+            date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            date_debut TIMESTAMP,
+            date_fin TIMESTAMP
+        )
+    """)
+    fields = ''.join(f"old_{field} TEXT, new_{field} TEXT, {field}_changed INTEGER NOT NULL DEFAULT 0, " for field in db.IMPORT_FIELDS)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS import_conflits (
+            job_id INTEGER NOT NULL,
+            rang INTEGER NOT NULL,
+            id INTEGER NOT NULL,
+            raison_sociale TEXT,
+            cle_fournisseur TEXT NOT NULL,
+            changed_columns TEXT NOT NULL,
+            {fields}
+            approuve INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (job_id, rang)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("UPDATE jobs SET statut = ?, message = ?, date_fin = CURRENT_TIMESTAMP WHERE statut IN (?, ?)",
+                 (FAILED, "Tâche interrompue par l'arrêt de l'application.", QUEUED, RUNNING))
+
+def _submit(job_type, key, func, *args):
+    """
+    Enregistre une tâche en attente et la confie au pool de threads. Retourne son id.
+    À appeler en tenant _lock.
+    """
+    global _executor
+    with _connection() as conn:
+        job_id = conn.execute("INSERT INTO jobs (type, cle, statut) VALUES (?, ?, ?)", (job_type, key, QUEUED)).lastrowid
+        conn.execute("DELETE FROM jobs WHERE id <= ? AND statut NOT IN (?, ?)", (job_id - JOB_HISTORY, QUEUED, RUNNING))
+        conn.execute("DELETE FROM import_conflits WHERE job_id NOT IN (SELECT id FROM jobs)")
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+    _executor.submit(_run, job_id, func, *args)
+    return job_id
+
+def _run(job_id, func, *args):
+    """Exécute une tâche dans un thread du pool et enregistre son résultat ou son erreur."""
+    with _connection() as conn:
+        conn.execute("UPDATE jobs SET statut = ?, date_debut = CURRENT_TIMESTAMP WHERE id = ?", (RUNNING, job_id))
+    try:
+        result = func(job_id, _progress_reporter(job_id), *args)
+    except importer.ImportFileError as e:
+        _finish(job_id, FAILED, str(e))
+    except Exception as e:
+        _finish(job_id, FAILED, f"Une erreur est survenue : {e}")
+    else:
+        _finish(job_id, DONE, None, json.dumps(_encode_result(result)))
+
+def _finish(job_id, status, message, result=None):
+    """Enregistre la fin d'une tâche (progression complète si elle a réussi)."""
+    with _connection() as conn:
+        conn.execute("""
+            UPDATE jobs SET statut = ?, message = ?, resultat = ?, progression = MAX(progression, ?), date_fin = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (status, message, result, 1 if status == DONE else 0, job_id))
+
+def _encode_result(value):
+    """Résultat d'une tâche en valeurs JSON : DataFrames au format 'table' de pandas (avec leur schéma), n-uplets en listes."""
+    if isinstance(value, pd.DataFrame):
+        return {'dataframe': json.loads(value.to_json(orient='table', index=False))}
+    if isinstance(value, (tuple, list)):
+        return [_encode_result(item) for item in value]
+    return value
+
+def _decode_result(value):
+    """Inverse de _encode_result (les n-uplets sont relus en listes)."""
+    if isinstance(value, dict) and list(value) == ['dataframe']:
+        return pd.read_json(io.StringIO(json.dumps(value['dataframe'])), orient='table')
+    if isinstance(value, list):
+        return [_decode_result(item) for item in value]
+    return value
+
+def _progress_reporter(job_id):
+    """
+    Retourne une fonction report(progression, message) qui enregistre l'avancement de la tâche
+    (progression de 0 à 1), au plus une fois par PROGRESS_INTERVAL secondes.
+    """
+    last = [0.0]
+    def report(progress, message):
+        now = time.monotonic()
+        if now - last[0] < PROGRESS_INTERVAL:
+            return
+        last[0] = now
+        with _connection() as conn:
+            conn.execute("UPDATE jobs SET progression = ?, message = ? WHERE id = ?", (min(progress, 1.0), message, job_id))
+    return report
+
+def get_job(job_id):
+    """Retourne l'état d'une tâche (sans son résultat) sous forme de dictionnaire, ou None."""
+    with _connection() as conn:
+        row = conn.execute("""
+            SELECT id, type, statut, progression, message, date_creation, date_debut, date_fin
+            FROM jobs WHERE id = ?
+        """, (job_id,)).fetchone()
+    return dict(row) if row else None
+
+def get_result(job_id):
+    """Retourne le résultat d'une tâche terminée, ou None."""
+    with _connection() as conn:
+        row = conn.execute("SELECT resultat FROM jobs WHERE id = ? AND statut = ?", (job_id, DONE)).fetchone()
+    return _decode_result(json.loads(row['resultat'])) if row else None
+
+def submit_analysis(content, filename):
+    """
+    Lance en arrière-plan la lecture et l'analyse d'un fichier d'import (contenu en octets).
+    Le résultat de la tâche est le couple (nouveaux fournisseurs, nombre de conflits) : les conflits de
+    database.analyze_import_chunks sont enregistrés dans la table import_conflits sous l'id de la tâche,
+    où ils sont consultés par page (get_conflicts_page) et validés (review_conflicts).
+
+    Un fichier identique déjà analysé (ou en cours d'analyse) alors que les données n'ont pas changé
+    depuis n'est pas analysé à nouveau : l'id de la tâche existante est retourné, avec les validations
+    déjà faites sur ses conflits.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    key = (db.DB_FILE, hashlib.sha256(content).hexdigest() + extension)
+    with _lock:
+        job_id, version = _analyses.get(key, (None, None))
+        if job_id is not None:
+            job = get_job(job_id)
+            if job and (job['statut'] in (QUEUED, RUNNING) or (job['statut'] == DONE and version == db.data_version())):
+                return job_id
+        job_id = _submit('analyse', key[1], _analyze, key, content, filename)
+        _analyses[key] = (job_id, None)
+        return job_id
+
+def _analyze(job_id, report, key, content, filename):
+    # L'index de similarité est tenu à jour avant de relever la version des données, pour que
+    # cette mise à jour (une écriture) ne rende pas aussitôt l'analyse obsolète.
+    db._refresh_similarity_index()
+    with _lock:
+        _analyses[key] = (job_id, db.data_version())
+    buffer = io.BytesIO(content)
+    chunks = importer.read_import_file(buffer, filename)
+    report(0, "Lecture du fichier...")
+    new_suppliers, conflicts = db.analyze_import_chunks(_tracked_chunks(chunks, buffer, len(content), report))
+    _stage_conflicts(job_id, conflicts)
+    return new_suppliers, len(conflicts)
+
+def _tracked_chunks(chunks, buffer, size, report):
+    """Transmet les lots lus en signalant l'avancement d'après la position de lecture dans le fichier."""
+    rows = 0
+    for chunk in chunks:
+        yield chunk
+        rows += len(chunk)
+        report(buffer.tell() / size if size else 0, f"{rows} lignes analysées")
+
+def submit_import(new_suppliers, analysis_id=None):
+    """
+    Lance en arrière-plan database.execute_import des nouveaux fournisseurs et des conflits approuvés
+    de l'analyse `analysis_id` (lus dans import_conflits au démarrage de l'import) ; le résultat de la
+    tâche est le dictionnaire {'inserted', 'updated', 'skipped', 'total', 'chunks'} d'execute_import.
+    Un import identique déjà en attente ou en cours (double clic, page rechargée) n'est pas lancé une seconde fois.
+    """
+    new_suppliers = pd.DataFrame(new_suppliers)
+    digest = hashlib.sha256(repr((list(new_suppliers.columns), analysis_id)).encode())
+    digest.update(pd.util.hash_pandas_object(new_suppliers, index=True).to_numpy().tobytes())
+    digest = digest.hexdigest()
+    key = (db.DB_FILE, digest)
+    with _lock:
+        job_id = _imports.get(key)
+        if job_id is not None:
+            job = get_job(job_id)
+            if job and job['statut'] in (QUEUED, RUNNING):
+                return job_id
+        job_id = _submit('import', digest, _import, new_suppliers, analysis_id)
+        _imports[key] = job_id
+        return job_id
+
+def _import(job_id, report, new_suppliers, analysis_id):
+    approved_conflicts = _approved_conflicts(analysis_id) if analysis_id is not None else []
+    return db.execute_import(new_suppliers, approved_conflicts,
+                             progress_callback=lambda done, total: report(done / total, f"{done} / {total} lignes importées"))
+
+# --- Conflits d'import à valider ---
+# Les conflits d'une analyse restent côté serveur, dans la base des tâches (leurs validations n'y changent pas
+# la version des données des fournisseurs) : l'interface n'en charge qu'une page à la fois, et les règles
+# d'approbation s'appliquent en une requête UPDATE.
+
+def _stage_conflicts(job_id, conflicts):
+    """Enregistre les conflits d'une analyse (DataFrame de database.analyze_import_chunks), non approuvés, dans l'ordre du fichier."""
+    columns = ['id', 'raison_sociale', 'cle_fournisseur', 'changed_columns']
+    for field in db.IMPORT_FIELDS:
+        columns += [f'old_{field}', f'new_{field}', f'{field}_changed']
+    frame = conflicts.reindex(columns=columns)
+    for field in db.IMPORT_FIELDS:
+        frame[f'{field}_changed'] = frame[f'{field}_changed'].fillna(False).astype(bool)
+    frame = frame.astype(object).where(frame.notna(), None)
+    rows = [(job_id, rang) + row for rang, row in enumerate(frame.itertuples(index=False, name=None))]
+    insert = f"INSERT INTO import_conflits (job_id, rang, {', '.join(columns)}) VALUES ({', '.join('?' * (len(columns) + 2))})"
+    with _connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM import_conflits WHERE job_id = ?", (job_id,))
+            for start in range(0, len(rows), CONFLICT_BATCH_SIZE):
+                conn.executemany(insert, rows[start:start + CONFLICT_BATCH_SIZE])
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+def _conflict_conditions(job_id, approved=None, rows=None, only_fields=None, empty_fields=None, fill_only=False):
+    """
+    Conditions WHERE (et paramètres) d'une sélection de conflits d'une analyse ; tous les critères donnés s'appliquent :
+    - `approved` : conflits approuvés (True) ou non (False) ;
+    - `rows` : rangs des conflits (sélection explicite) ;
+    - `only_fields` : conflits dont les modifications se limitent à ces champs ;
+    - `empty_fields` : conflits dont la valeur existante de chacun de ces champs est vide ;
+    - `fill_only` : conflits qui ne font que compléter des champs vides.
+    """
+    conditions = ["job_id = ?"]
+    params = [job_id]
+    if approved is not None:
+        conditions.append("approuve = ?")
+        params.append(int(bool(approved)))
+    if rows is not None:
+        rows = [int(row) for row in rows]
+        conditions.append(f"rang IN ({', '.join('?' * len(rows))})" if rows else "0")
+        params.extend(rows)
+    if only_fields is not None:
+        conditions.extend(f"NOT {field}_changed" for field in db.IMPORT_FIELDS if field not in only_fields)
+    conditions.extend(f"IFNULL(old_{field}, '') = ''" for field in db.IMPORT_FIELDS if field in (empty_fields or []))
+    if fill_only:
+        conditions.extend(f"(NOT {field}_changed OR IFNULL(old_{field}, '') = '')" for field in db.IMPORT_FIELDS)
+    return conditions, params
+
+def count_conflicts(job_id, **criteria):
+    """Nombre de conflits d'une analyse retenus par les critères de _conflict_conditions."""
+    conditions, params = _conflict_conditions(job_id, **criteria)
+    with _connection() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM import_conflits WHERE {' AND '.join(conditions)}", params).fetchone()[0]
+
+def get_conflicts_page(job_id, limit, offset=0, **criteria):
+    """
+    Une page de conflits d'une analyse, dans l'ordre du fichier : DataFrame 'rang', 'id', 'raison_sociale',
+    'changed_columns', 'approuve' puis, par champ importé, 'old_<champ>', 'new_<champ>' et '<champ>_changed'.
+    """
+    conditions, params = _conflict_conditions(job_id, **criteria)
+    with _connection() as conn:
+        page = pd.read_sql_query(f"""
+            SELECT * FROM import_conflits WHERE {' AND '.join(conditions)}
+            ORDER BY rang LIMIT ? OFFSET ?
+        """, conn, params=params + [limit, offset])
+    return page.drop(columns='job_id').astype({'approuve': bool})
+
+def review_conflicts(job_id, approved=True, **criteria):
+    """
+    Approuve (ou désapprouve) en une requête les conflits d'une analyse retenus par les critères
+    de _conflict_conditions (tous si aucun critère). Retourne le nombre de conflits modifiés.
+    """
+    conditions, params = _conflict_conditions(job_id, **criteria)
+    with _connection() as conn:
+        return conn.execute(f"UPDATE import_conflits SET approuve = ? WHERE {' AND '.join(conditions)} AND approuve != ?",
+                            [int(bool(approved))] + params + [int(bool(approved))]).rowcount
+
+def _approved_conflicts(job_id):
+    """Conflits approuvés d'une analyse, au format de database.analyze_import_chunks."""
+    with _connection() as conn:
+        conflicts = pd.read_sql_query("SELECT * FROM import_conflits WHERE job_id = ? AND approuve ORDER BY rang", conn, params=(job_id,))
+    changed = [f'{field}_changed' for field in db.IMPORT_FIELDS]
+    return conflicts.drop(columns=['job_id', 'rang', 'approuve']).astype(dict.fromkeys(changed, bool))
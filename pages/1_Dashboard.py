@@ -1,8 +1,6 @@
+import functools
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 import database as db
-import re
 
 st.set_page_config(layout="wide", page_title="Dashboard Fournisseurs")
 
@@ -44,26 +42,23 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- Chargement des données ---
-def load_full_data():
-    conn = db.get_db_connection()
-    df = pd.read_sql_query("SELECT * FROM suppliers", conn)
-    conn.close()
-    df['date_creation'] = pd.to_datetime(df['date_creation'])
-    df['tags'] = df['tags'].astype(str)
-    return df
-
-df = load_full_data()
-
-if df.empty:
+db.init_db()
+if db.count_suppliers() == 0:
     st.warning("Aucune donnée fournisseur à afficher. Veuillez en ajouter via la page de gestion.")
     st.stop()
 
 # --- Génération des listes complètes d'options AVANT tout filtrage ---
-# CORRECTION : Ajout de .dropna() pour supprimer les valeurs vides avant de trier
-all_possible_cantons = sorted(df['pays_canton'].dropna().unique())
-all_possible_status = sorted(df['statut_audit'].dropna().unique())
-all_possible_tags = sorted(df['tags'].str.split(',').explode().str.strip().dropna().unique())
-
+filter_options = db.get_filter_options()
+all_possible_cantons = filter_options['pays_canton']
+all_possible_status = filter_options['statut_audit']
+all_possible_tags = filter_options['tags']
+
+AUDIT_TO_PLAN = "Audit à planifier"
+DETAIL_ROWS = 1000
+EXPORT_LABELS = {"csv": "CSV", "xlsx": "Excel", "parquet": "Parquet"}
+TREND_OPTIONS = {"Statut d'audit": 'statut_audit', "Tags": 'tag', "Prospects": 'est_prospect', "Nombre de fournisseurs": 'total'}
+TREND_PERIODS = {"Jour": 'D', "Semaine": 'W', "Mois": 'ME'}
+TREND_LABELS = {'': "Non renseigné", '0': "Non prospects", '1': "Prospects"}
 
 # --- Filtres rapides ---
 st.write("Filtres rapides :")
@@ -77,15 +72,6 @@ if col_f3.button("Prospects Uniquement", use_container_width=True):
 if col_f4.button("Audits à planifier", use_container_width=True):
     st.session_state.quick_filter = "audit"
 
-df_to_filter = df.copy()
-if 'quick_filter' in st.session_state:
-    if st.session_state.quick_filter == "critical":
-        df_to_filter = df[df['tags'].str.contains('Fournisseur critique', na=False)]
-    elif st.session_state.quick_filter == "prospects":
-        df_to_filter = df[df['est_prospect'] == True]
-    elif st.session_state.quick_filter == "audit":
-        df_to_filter = df[df['statut_audit'] == "Audit à planifier"]
-
 # --- Filtres avancés du Dashboard ---
 st.sidebar.header("Filtres avancés")
 selected_cantons = st.sidebar.multiselect(
@@ -102,22 +88,29 @@ selected_tags = st.sidebar.multiselect(
 )
 
 # --- LOGIQUE DE FILTRAGE ---
-df_filtered = df_to_filter
-
-if selected_cantons:
-    df_filtered = df_filtered[df_filtered['pays_canton'].isin(selected_cantons)]
-if selected_status:
-    df_filtered = df_filtered[df_filtered['statut_audit'].isin(selected_status)]
-if selected_tags:
-    tag_regex = '|'.join([re.escape(tag) for tag in selected_tags])
-    df_filtered = df_filtered[df_filtered['tags'].str.contains(tag_regex, na=False, regex=True)]
+# Les filtres sont traduits dans le format de database.py, qui les évalue en mémoire (codes de catégorie pour canton et statut, masques de bits pour les tags).
+quick_filter = st.session_state.get('quick_filter', "all")
+dashboard_filters = {'pays_canton': selected_cantons, 'statut_audit': selected_status, 'tags': selected_tags}
+if quick_filter == "critical":
+    dashboard_filters['tags_all'] = [db.CRITICAL_TAG]
+elif quick_filter == "prospects":
+    dashboard_filters['est_prospect'] = True
+elif quick_filter == "audit":
+    dashboard_filters['statut_audit'] = [status for status in selected_status or [AUDIT_TO_PLAN] if status == AUDIT_TO_PLAN]
+
+# Filtre rapide « audit » combiné à des statuts qui l'excluent : aucune ligne ne peut correspondre.
+if quick_filter == "audit" and not dashboard_filters['statut_audit']:
+    aggregates = {'total': 0, 'critiques': 0, 'prospects': 0}
+else:
+    aggregates = db.get_dashboard_aggregates(filters=dashboard_filters)
+has_data = aggregates['total'] > 0
 
 
 # --- Affichage des KPIs ---
 st.header("Indicateurs Clés de Performance")
-total_fournisseurs = len(df_filtered)
-nb_critiques = df_filtered['tags'].str.contains('Fournisseur critique', na=False).sum()
-nb_prospects = df_filtered['est_prospect'].sum()
+total_fournisseurs = aggregates['total']
+nb_critiques = aggregates['critiques']
+nb_prospects = aggregates['prospects']
 
 kpi1, kpi2, kpi3 = st.columns(3)
 with kpi1:
@@ -130,19 +123,22 @@ with kpi3:
 st.markdown("---")
 
 # --- Graphiques Dynamiques ---
+# Import différé : les indicateurs s'affichent sans attendre le chargement de plotly (premier affichage de la page).
+import plotly.express as px
+
 st.header("Analyses Visuelles")
 g1_col1, g1_col2 = st.columns(2)
 with g1_col1:
     st.subheader("Répartition par Pays/Canton")
-    if not df_filtered.empty:
-        fig_canton = px.pie(df_filtered['pays_canton'].value_counts().reset_index(), values='count', names='pays_canton', title="Distribution Géographique")
+    if has_data and not aggregates['par_canton'].empty:
+        fig_canton = px.pie(aggregates['par_canton'], values='count', names='pays_canton', title="Distribution Géographique")
         st.plotly_chart(fig_canton, use_container_width=True)
     else:
         st.info("Aucune donnée pour ce filtre.")
 with g1_col2:
     st.subheader("Répartition par Statut d'Audit")
-    if not df_filtered.empty:
-        fig_audit = px.bar(df_filtered['statut_audit'].value_counts().reset_index(), x='statut_audit', y='count', title="Statuts des Audits Fournisseurs", labels={'statut_audit': 'Statut', 'count': 'Nombre'})
+    if has_data and not aggregates['par_statut'].empty:
+        fig_audit = px.bar(aggregates['par_statut'], x='statut_audit', y='count', title="Statuts des Audits Fournisseurs", labels={'statut_audit': 'Statut', 'count': 'Nombre'})
         st.plotly_chart(fig_audit, use_container_width=True)
     else:
         st.info("Aucune donnée pour ce filtre.")
@@ -151,22 +147,44 @@ st.markdown("---")
 g2_col1, g2_col2 = st.columns(2)
 with g2_col1:
     st.subheader("Analyse des Tags")
-    if not df_filtered.empty and not df_filtered['tags'].str.strip().eq('').all():
-        tags_df = df_filtered['tags'].str.split(',').explode().str.strip().value_counts().reset_index()
-        tags_df.columns = ['tag', 'count']
-        fig_tags = px.bar(tags_df, x='count', y='tag', orientation='h', title="Fréquence des Tags")
+    if has_data and not aggregates['par_tag'].empty:
+        fig_tags = px.bar(aggregates['par_tag'], x='count', y='tag', orientation='h', title="Fréquence des Tags")
         st.plotly_chart(fig_tags, use_container_width=True)
     else:
         st.info("Aucun tag à analyser pour la sélection actuelle.")
 with g2_col2:
     st.subheader("Évolution des ajouts de fournisseurs")
-    if not df_filtered.empty:
-        monthly_adds = df_filtered.set_index('date_creation').resample('M').size().reset_index(name='count')
-        monthly_adds['date_creation'] = monthly_adds['date_creation'].dt.strftime('%Y-%m')
-        fig_time = px.line(monthly_adds, x='date_creation', y='count', title="Nouveaux fournisseurs par mois", markers=True)
+    if has_data and not aggregates['par_mois'].empty:
+        fig_time = px.line(aggregates['par_mois'], x='date_creation', y='count', title="Nouveaux fournisseurs par mois", markers=True)
         st.plotly_chart(fig_time, use_container_width=True)
     else:
         st.info("Aucune donnée pour ce filtre.")
 
+st.markdown("---")
+# Tendances de toute la base (les filtres ne s'y appliquent pas), tenues à jour à partir du journal des modifications.
+st.subheader("Tendances")
+col_t1, col_t2 = st.columns([3, 1])
+trend_label = col_t1.radio("Évolution de", list(TREND_OPTIONS), horizontal=True)
+trend_period = col_t2.selectbox("Période", list(TREND_PERIODS))
+trends = db.get_supplier_trends(TREND_OPTIONS[trend_label], TREND_PERIODS[trend_period])
+if trends.empty:
+    st.info("Aucune modification enregistrée.")
+else:
+    trend_data = trends.rename(columns=lambda value: TREND_LABELS.get(value, value)).reset_index().melt(id_vars='date', var_name='valeur', value_name='count')
+    fig_trend = px.line(trend_data, x='date', y='count', color='valeur', markers=True, title=f"{trend_label} : nombre de fournisseurs en fin de {trend_period.lower()}",
+                        labels={'date': 'Date', 'count': 'Nombre', 'valeur': trend_label})
+    st.plotly_chart(fig_trend, use_container_width=True)
+
 with st.expander("Voir les données détaillées de la sélection"):
-    st.dataframe(df_filtered)
+    if has_data:
+        detail_df, _ = db.get_suppliers_page(DETAIL_ROWS, filters=dashboard_filters)
+        if total_fournisseurs > DETAIL_ROWS:
+            st.caption(f"Affichage des {DETAIL_ROWS} premiers fournisseurs sur {total_fournisseurs}.")
+        st.dataframe(detail_df)
+        # Export de toute la sélection (pas seulement des lignes affichées), produit au clic et par lots.
+        export_columns = st.columns(len(EXPORT_LABELS))
+        for column, (file_format, label) in zip(export_columns, EXPORT_LABELS.items()):
+            column.download_button(f"Exporter en {label}", data=functools.partial(db.export_suppliers_file, file_format, filters=dashboard_filters),
+                                   file_name=f"fournisseurs.{file_format}", mime=db.EXPORT_FORMATS[file_format], on_click="ignore", use_container_width=True)
+    else:
+        st.info("Aucune donnée pour ce filtre.")
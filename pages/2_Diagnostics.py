@@ -0,0 +1,125 @@
+import os
+import streamlit as st
+import database as db
+
+st.set_page_config(layout="wide", page_title="Diagnostics")
+
+st.markdown("<h3><i class='bi bi-speedometer2'></i> Diagnostics des performances</h3>", unsafe_allow_html=True)
+st.markdown("""
+<link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/bootstrap-icons.min.css">
+""", unsafe_allow_html=True)
+
+# Page réservée à l'exploitation : activée en lançant l'application avec ACHAT_DIAGNOSTICS=1 (voir database.DIAGNOSTICS).
+if not db.DIAGNOSTICS:
+    st.info("Page de diagnostics désactivée. Lancez l'application avec la variable d'environnement ACHAT_DIAGNOSTICS=1 pour l'activer.")
+    st.stop()
+
+db.init_db()
+
+def megabytes(size):
+    return f"{size / 1024 / 1024:.1f} Mo"
+
+col_a, col_b = st.columns([4, 1])
+col_a.caption(f"Mesures du processus depuis son démarrage ou la dernière réinitialisation. Requêtes lentes : au moins {db.SLOW_QUERY_MS} ms.")
+if col_b.button("Réinitialiser les mesures", use_container_width=True):
+    db.reset_query_log()
+    st.rerun()
+
+# --- Cache et taille de la base ---
+cache = db.cache_stats()
+lookups = cache['hits'] + cache['misses']
+database_stats = db.get_database_stats()
+kpi1, kpi2, kpi3, kpi4 = st.columns(4)
+kpi1.metric("Taux de succès du cache", f"{cache['hits'] / lookups:.0%}" if lookups else "–", help=f"{cache['hits']} succès, {cache['misses']} échecs, {cache['evictions']} évictions")
+kpi2.metric("Entrées en cache", cache['entries'], help=f"{megabytes(cache['bytes'])} (estimation)")
+kpi3.metric("Taille de la base", megabytes(database_stats['file_bytes']), help=f"Journal WAL : {megabytes(database_stats['wal_bytes'])} — schéma version {database_stats['user_version']}")
+kpi4.metric("Pages libres", database_stats['freelist_count'], help=f"{database_stats['page_count']} pages de {database_stats['page_size']} octets")
+
+writes = db.write_stats()
+kpi5, kpi6, kpi7, kpi8 = st.columns(4)
+kpi5.metric("Transactions d'écriture", writes['batches'])
+kpi6.metric("Écritures par transaction", f"{writes['operations'] / writes['batches']:.1f}" if writes['batches'] else "–", help=f"{writes['operations']} écritures au total")
+kpi7.metric("Transactions retentées", writes['retries'], help="Base verrouillée par un autre processus au moment de la transaction.")
+kpi8.metric("Écritures en attente", writes['queued'])
+
+replica = db.replica_stats()
+if replica['enabled']:
+    kpi9, kpi10, kpi11, _ = st.columns(4)
+    kpi9.metric("Version de la réplique", replica['version'] if replica['version'] is not None else "–")
+    kpi10.metric("Copies de la réplique", replica['refreshes'])
+    kpi11.metric("Durée de la dernière copie", f"{replica['last_refresh_s'] * 1000:.0f} ms" if replica['last_refresh_s'] is not None else "–")
+
+st.markdown("---")
+
+# --- Sauvegardes et maintenance ---
+st.subheader("Sauvegardes et maintenance")
+maintenance = db.maintenance_stats()
+last_runs = dict(zip(maintenance['tasks']['tache'], maintenance['tasks']['date']))
+kpi12, kpi13, kpi14, kpi15 = st.columns(4)
+kpi12.metric("Sauvegardes", maintenance['backups'], help=f"Dernière : {last_runs.get('sauvegarde', 'aucune')}")
+kpi13.metric("Modifications depuis ANALYZE", maintenance['pending_changes'], help=f"Dernier ANALYZE : {last_runs.get('analyse', 'jamais')}")
+kpi14.metric("Dernier VACUUM", last_runs.get('vacuum', "–"))
+kpi15.metric("Planificateur", "Actif" if maintenance['running'] else "Arrêté", help=f"Passage toutes les {db.MAINTENANCE_CHECK_SECONDS} s")
+if maintenance['last_error']:
+    st.error(f"Dernière maintenance en échec : {maintenance['last_error']}")
+col_m1, col_m2, col_m3, _ = st.columns([1, 1, 1, 2])
+if col_m1.button("Lancer la maintenance", use_container_width=True):
+    tasks = db.run_maintenance(force=True)
+    st.toast(f"Maintenance : {', '.join(tasks) or 'rien à faire'}.")
+if col_m2.button("Sauvegarder maintenant", use_container_width=True):
+    st.toast(f"Sauvegarde créée : {os.path.basename(db.backup_database())}.")
+if not maintenance['incremental_vacuum']:
+    # Conversion ponctuelle d'une base créée avant l'auto_vacuum incrémental : le VACUUM complet bloque les écritures.
+    if col_m3.button("Passer en vacuum incrémental", use_container_width=True,
+                     help="VACUUM complet, une seule fois : les écritures sont bloquées pendant la réécriture de la base."):
+        db.convert_to_incremental_vacuum()
+        st.toast("La base est passée en auto_vacuum incrémental.")
+        st.rerun()
+st.dataframe(db.list_backups(), use_container_width=True, hide_index=True)
+
+st.markdown("---")
+
+# --- Requêtes lentes ---
+st.subheader("Requêtes lentes")
+slow_queries = db.get_query_log(slow_only=True)
+if slow_queries.empty:
+    st.info("Aucune requête lente enregistrée.")
+else:
+    st.dataframe(slow_queries[['time', 'function', 'duration_ms', 'rows', 'vm_steps', 'statement']], use_container_width=True, hide_index=True)
+    for _, query in slow_queries.head(20).iterrows():
+        with st.expander(f"{query['duration_ms']:.0f} ms — {query['function'] or 'hors fonction'} — {query['statement'][:100]}"):
+            st.code(query['sql'], language="sql")
+            st.write("**Plan d'exécution :**")
+            st.code("\n".join(db.explain_query_plan(query['sql'])))
+
+st.markdown("---")
+
+# --- Statistiques par fonction et par requête ---
+st.subheader("Latence par fonction")
+function_stats = db.get_function_stats()
+st.dataframe(function_stats, use_container_width=True, hide_index=True)
+
+st.subheader("Latence par requête")
+statement_stats = db.get_statement_stats()
+st.dataframe(statement_stats, use_container_width=True, hide_index=True)
+
+if not statement_stats.empty:
+    selected_statement = st.selectbox("Histogramme de la requête", statement_stats['statement'])
+    bucket_columns = [column for column in statement_stats.columns if column.startswith(('≤', '>'))]
+    histogram = statement_stats.loc[statement_stats['statement'] == selected_statement, bucket_columns].iloc[0]
+    st.bar_chart(histogram.rename_axis('latence').rename('requêtes'))
+
+st.markdown("---")
+
+# --- Index et stockage ---
+col_i, col_s = st.columns(2)
+with col_i:
+    st.subheader("Utilisation des index")
+    st.caption("D'après les plans d'exécution des requêtes récentes.")
+    st.dataframe(db.get_index_usage(), use_container_width=True, hide_index=True)
+with col_s:
+    st.subheader("Place occupée par table et index")
+    if database_stats['objects'] is None:
+        st.info("Détail indisponible (SQLite compilé sans la table virtuelle dbstat).")
+    else:
+        st.dataframe(database_stats['objects'], use_container_width=True, hide_index=True)
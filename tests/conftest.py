@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Module database sur une base vide, propre au test."""
+    monkeypatch.setattr(database, "DB_FILE", str(tmp_path / "suppliers.db"))
+    database.clear_cache()
+    database.init_db()
+    yield database
+    database.close_all_connections()
+    database.clear_cache()
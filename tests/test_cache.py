@@ -0,0 +1,42 @@
+def _supplier(name):
+    return {'raison_sociale': name, 'id_oracle': '', 'est_prospect': 0, 'adresse': '', 'pays_canton': '',
+            'contacts': '', 'tags': '', 'statut_audit': '', 'commentaires': ''}
+
+
+def test_repeated_read_is_served_from_cache(db):
+    db.add_supplier(_supplier("Alpha SA"))
+    assert db.count_suppliers() == 1
+    hits = db.cache_stats()['hits']
+
+    assert db.count_suppliers() == 1
+    assert db.cache_stats()['hits'] == hits + 1
+
+
+def test_cache_follows_writes_of_this_process(db):
+    assert db.count_suppliers() == 0
+    version = db.data_version()
+
+    db.add_supplier(_supplier("Beta SA"))
+    assert db.data_version() != version
+    assert db.count_suppliers() == 1
+
+
+def test_cache_follows_writes_of_another_connection(db):
+    assert db.count_suppliers() == 0
+    version = db.data_version()
+
+    db.add_supplier(_supplier("Gamma SA"))
+    # Connexion hors pool et hors écrivain, comme celle d'un autre processus.
+    conn = db.get_db_connection()
+    with conn:
+        conn.execute("UPDATE suppliers SET raison_sociale = 'Gamma Holding SA'")
+    conn.close()
+    assert db.data_version() != version
+    assert db.count_suppliers("Gamma Holding") == 1
+
+
+def test_cached_result_is_a_copy(db):
+    db.add_supplier(_supplier("Delta SA"))
+    df, _ = db.get_suppliers(10, 0)
+    df.loc[0, 'raison_sociale'] = "Modifié"
+    assert db.get_suppliers(10, 0)[0].loc[0, 'raison_sociale'] == "Delta SA"
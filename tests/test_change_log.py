@@ -0,0 +1,43 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+
+def _import(db, count):
+    frame = pd.DataFrame({'Raison Sociale': [f"Fournisseur {i:03d}" for i in range(count)], 'Numéro de fournisseur': '',
+                          'Adresse': '', 'Statut Audit': 'Planifié'})
+    db.execute_import(*db.analyze_import_data(frame, fuzzy=False))
+
+
+def _age_log(db, days):
+    with sqlite3.connect(db.DB_FILE) as conn:
+        conn.execute("DROP TRIGGER suppliers_log_update")
+        conn.execute("UPDATE suppliers_log SET date = datetime(date, ?)", (f"-{days} days",))
+
+
+def test_trends_follow_the_change_log(db):
+    _import(db, 30)
+    trends = db.get_supplier_trends('statut_audit')
+    assert trends['Planifié'].iloc[-1] == 30 == db.count_suppliers()
+    assert db.get_supplier_trends('total')[''].iloc[-1] == 30
+
+
+def test_old_reported_entries_are_pruned_and_trends_kept(db):
+    _import(db, 30)
+    _age_log(db, db.CHANGE_LOG_RETENTION_DAYS + 1)
+    _import(db, 40)
+
+    assert 'journal' in db.run_maintenance(force=True)
+    with db.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM suppliers_log").fetchone()[0] == 10
+        assert db._change_log_seq(conn) == 40
+    assert db.get_supplier_trends('total')[''].iloc[-1] == 40
+
+
+def test_unreported_entries_cannot_be_deleted(db):
+    _import(db, 3)
+    with db.connection() as conn:
+        conn.execute("UPDATE supplier_trends_state SET seq = 1")
+        with pytest.raises(sqlite3.IntegrityError):
+            conn.execute("DELETE FROM suppliers_log WHERE seq = 2")
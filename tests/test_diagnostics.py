@@ -0,0 +1,20 @@
+def test_queries_are_not_instrumented_without_diagnostics(db, monkeypatch):
+    monkeypatch.setattr(db, 'DIAGNOSTICS', False)
+    db.close_all_connections()
+    db.reset_query_log()
+    db.count_suppliers("Alpha")
+    assert db.get_query_log().empty
+
+
+def test_query_log_keeps_sql_without_parameter_values(db, monkeypatch):
+    monkeypatch.setattr(db, 'DIAGNOSTICS', True)
+    db.close_all_connections()
+    db.reset_query_log()
+    db.get_supplier_by_id(42)
+
+    log = db.get_query_log()
+    assert 'params' not in log.columns
+    assert log['sql'].str.contains('WHERE id = ?', regex=False).any()
+    usage = db.get_index_usage()
+    assert set(usage.columns) == {'index', 'table', 'statements', 'executions'}
+    assert any('SEARCH suppliers USING INTEGER PRIMARY KEY' in step for step in db.explain_query_plan('SELECT * FROM suppliers WHERE id = ?'))
@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+CANTONS = ['GE', 'VD', 'VS', '']
+STATUSES = ['Planifié', 'Réalisé', '']
+TAGS = [f"Tag {n:02d}" for n in range(12)] + ['Fournisseur critique']
+
+FILTERS = [
+    {},
+    {'pays_canton': ['GE']},
+    {'pays_canton': ['VD', 'VS'], 'statut_audit': ['Réalisé']},
+    {'statut_audit': ['Inconnu']},
+    {'est_prospect': True},
+    {'tags': ['Tag 01', 'Tag 10']},
+    {'tags_all': ['Tag 02', 'Tag 11']},
+    {'tags_all': ['Tag 03', 'Absent']},
+    {'tags': 'Fournisseur critique', 'est_prospect': False, 'pays_canton': ['GE', 'VS']},
+]
+
+
+@pytest.fixture
+def suppliers(db):
+    for n in range(60):
+        db.add_supplier({'raison_sociale': f"Fournisseur {n}", 'id_oracle': '', 'est_prospect': n % 3 == 0,
+                         'adresse': '', 'pays_canton': CANTONS[n % 4], 'contacts': '',
+                         'tags': ','.join(tag for position, tag in enumerate(TAGS) if n % (position + 2) == 0),
+                         'statut_audit': STATUSES[n % 3], 'commentaires': ''})
+    return db
+
+
+def _sql_counts(db, column, filters):
+    df, _ = db.get_suppliers(1000, 0, filters=filters)
+    counts = df.loc[df[column] != '', column].value_counts()
+    return dict(zip(counts.index, counts))
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_aggregates_match_sql(suppliers, filters):
+    db = suppliers
+    aggregates = db.get_dashboard_aggregates(filters=filters)
+
+    assert aggregates['total'] == db.count_suppliers(filters=filters)
+    prospects = db.count_suppliers(filters={**filters, 'est_prospect': True}) if filters.get('est_prospect') is not False else 0
+    assert aggregates['prospects'] == prospects
+    for column, key in (('pays_canton', 'par_canton'), ('statut_audit', 'par_statut')):
+        counts = aggregates[key].set_index(column)['count']
+        assert {value: count for value, count in counts.items() if value != ''} == _sql_counts(db, column, filters)
+    tags = db.get_tag_counts(filters=filters)
+    pd.testing.assert_frame_equal(aggregates['par_tag'], tags, check_dtype=False)
+    assert aggregates['critiques'] == int(tags.loc[tags['tag'] == 'Fournisseur critique', 'count'].sum())
+
+
+def test_aggregates_follow_writes(suppliers):
+    db = suppliers
+    before = db.get_dashboard_aggregates(filters={'pays_canton': ['GE']})['total']
+    db.add_supplier({'raison_sociale': "Nouveau SA", 'id_oracle': '', 'est_prospect': 0, 'adresse': '',
+                     'pays_canton': 'GE', 'contacts': '', 'tags': '', 'statut_audit': '', 'commentaires': ''})
+    assert db.get_dashboard_aggregates(filters={'pays_canton': ['GE']})['total'] == before + 1
+
+
+def test_search_term_is_combined_with_filters(suppliers):
+    db = suppliers
+    filters = {'pays_canton': ['GE']}
+    assert db.get_dashboard_aggregates("Fournisseur 1", filters)['total'] == db.count_suppliers("Fournisseur 1", filters)
@@ -0,0 +1,52 @@
+import pandas as pd
+
+
+def _frame(rows):
+    return pd.DataFrame([{'Raison Sociale': name, 'Numéro de fournisseur': '', 'Adresse': address} for name, address in rows])
+
+
+def _supplier(db, name):
+    df, _ = db.search_suppliers(name, limit=10)
+    return db.get_supplier_by_id(int(df.loc[df['raison_sociale'] == name, 'id'].iloc[0]))
+
+
+def test_conflicts_are_applied_by_supplier_id(db):
+    db.execute_import(*db.analyze_import_data(_frame([("Alpha SA", "Rue 1"), ("Beta SA", "Rue 2")]), fuzzy=False))
+    alpha, beta = _supplier(db, "Alpha SA"), _supplier(db, "Beta SA")
+
+    new_suppliers, conflicts = db.analyze_import_data(_frame([("Alpha SA", "Rue 10"), ("Beta SA", "Rue 20")]), fuzzy=False)
+    assert len(conflicts) == 2
+
+    # Entre l'analyse et l'import : Alpha est renommé, Beta est supprimé.
+    db.update_supplier(alpha['id'], {**alpha, 'raison_sociale': "Alpha Holding SA"})
+    db.delete_supplier(beta['id'])
+
+    result = db.execute_import(new_suppliers, conflicts)
+    assert (result['inserted'], result['updated'], result['skipped']) == (0, 1, 1)
+
+    renamed = db.get_supplier_by_id(alpha['id'])
+    assert (renamed['raison_sociale'], renamed['adresse']) == ("Alpha Holding SA", "Rue 10")
+    assert db.count_suppliers() == 1
+
+
+def test_new_suppliers_are_inserted_by_key(db):
+    result = db.execute_import(*db.analyze_import_data(_frame([("Gamma SA", "Rue 3")]), fuzzy=False))
+    assert (result['inserted'], result['updated'], result['skipped']) == (1, 0, 0)
+    assert _supplier(db, "Gamma SA")['adresse'] == "Rue 3"
+
+
+def test_near_identical_rows_of_the_same_file_are_flagged(db):
+    db.execute_import(*db.analyze_import_data(_frame([("Société Générale", "Rue 1")]), fuzzy=False))
+    rows = [("ACME SA", "Rue 2"), ("Beta SA", "Rue 3"), ("Acme S.A.", "Rue 4"), ("Société Générale S.A.", "Rue 5")]
+    chunks = [_frame(rows[:2]), _frame(rows[2:3]), _frame(rows[3:])]
+
+    new_suppliers, _ = db.analyze_import_chunks(chunks)
+    flagged = new_suppliers.set_index('raison_sociale')
+    assert flagged['doublon_raison_sociale'].isna()[["ACME SA", "Beta SA"]].all()
+    assert flagged.loc["Acme S.A.", 'doublon_raison_sociale'] == "ACME SA"
+    assert pd.isna(flagged.loc["Acme S.A.", 'doublon_id'])
+    assert flagged.loc["Société Générale S.A.", 'doublon_raison_sociale'] == "Société Générale"
+    assert not pd.isna(flagged.loc["Société Générale S.A.", 'doublon_id'])
+
+    same_chunk, _ = db.analyze_import_data(_frame(rows))
+    assert same_chunk.set_index('raison_sociale').loc["Acme S.A.", 'doublon_raison_sociale'] == "ACME SA"
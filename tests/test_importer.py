@@ -0,0 +1,22 @@
+import io
+
+import pandas as pd
+
+import importer
+
+
+def _xlsx(frame):
+    buffer = io.BytesIO()
+    frame.to_excel(buffer, index=False)
+    buffer.seek(0)
+    return buffer
+
+
+def test_header_only_xlsx_gives_empty_analysis(db):
+    file = _xlsx(pd.DataFrame(columns=db.REQUIRED_IMPORT_COLUMNS))
+    new_suppliers, conflicts = db.analyze_import_chunks(importer.read_import_file(file, "vide.xlsx"))
+
+    assert new_suppliers.empty and conflicts.empty
+    assert {'cle_fournisseur', 'doublon_id', 'doublon_raison_sociale', 'doublon_score'} <= set(new_suppliers.columns)
+    assert {'id', 'cle_fournisseur', 'old_adresse', 'new_adresse', 'adresse_changed', 'changed_columns'} <= set(conflicts.columns)
+    assert new_suppliers['doublon_id'].notna().sum() == 0
@@ -0,0 +1,71 @@
+import time
+
+import pandas as pd
+
+import jobs
+
+
+def _wait(job_id):
+    for _ in range(200):
+        job = jobs.get_job(job_id)
+        if job['statut'] in (jobs.DONE, jobs.FAILED):
+            return job
+        time.sleep(0.05)
+    raise AssertionError("tâche non terminée")
+
+
+def _csv(rows):
+    return pd.DataFrame(rows, columns=['Raison Sociale', 'Numéro de fournisseur', 'Adresse']).to_csv(index=False).encode()
+
+
+def test_analysis_result_round_trips_without_pickle(db):
+    job_id = jobs.submit_analysis(_csv([("Alpha SA", "00123", "Rue 1"), ("Beta SA", None, "Rue 2")]), "liste.csv")
+    assert _wait(job_id)['statut'] == jobs.DONE
+
+    new_suppliers, conflict_count = jobs.get_result(job_id)
+    assert conflict_count == 0
+    assert list(new_suppliers['raison_sociale']) == ["Alpha SA", "Beta SA"]
+    assert new_suppliers['id_oracle'].tolist()[0] == "00123"
+    assert new_suppliers['doublon_id'].isna().all()
+
+    result = jobs.get_result(_wait(jobs.submit_import(new_suppliers))['id'])
+    assert (result['inserted'], result['updated']) == (2, 0)
+    assert db.count_suppliers() == 2
+
+
+def test_identical_import_is_not_submitted_twice(db, monkeypatch):
+    started = []
+    monkeypatch.setattr(jobs, '_submit', lambda job_type, key, func, *args: started.append(key) or len(started))
+    monkeypatch.setattr(jobs, 'get_job', lambda job_id: {'statut': jobs.RUNNING})
+    monkeypatch.setattr(jobs, '_imports', {})
+    frame = pd.DataFrame({'raison_sociale': ["Gamma SA"], 'adresse': [None]})
+
+    assert jobs.submit_import(frame, 7) == jobs.submit_import(frame.copy(), 7) == 1
+    assert jobs.submit_import(frame, 8) == 2
+    assert jobs.submit_import(frame.assign(adresse="Rue 3"), 7) == 3
+
+
+def test_only_approved_conflicts_are_imported(db):
+    job_id = jobs.submit_analysis(_csv([("Alpha SA", None, "Rue 1"), ("Beta SA", "111", "Rue 2"), ("Gamma SA", "222", "Rue 3")]), "liste.csv")
+    new_suppliers, _ = jobs.get_result(_wait(job_id)['id'])
+    _wait(jobs.submit_import(new_suppliers))
+
+    # Alpha : numéro ajouté (champ vide) ; Beta : adresse modifiée ; Gamma : numéro et adresse modifiés.
+    job_id = jobs.submit_analysis(_csv([("Alpha SA", "555", "Rue 1"), ("Beta SA", "111", "Rue 20"), ("Gamma SA", "333", "Rue 30")]), "liste.csv")
+    new_suppliers, conflict_count = jobs.get_result(_wait(job_id)['id'])
+    assert (len(new_suppliers), conflict_count) == (0, 3)
+    assert jobs.count_conflicts(job_id, fill_only=True) == 1
+    assert jobs.count_conflicts(job_id, only_fields=['adresse']) == 1
+    assert jobs.get_conflicts_page(job_id, 10, only_fields=['adresse'])['raison_sociale'].tolist() == ["Beta SA"]
+
+    assert jobs.review_conflicts(job_id, fill_only=True) == 1
+    assert jobs.review_conflicts(job_id, rows=[2]) == 1
+    assert jobs.review_conflicts(job_id, approved=False, rows=[2]) == 1
+    assert jobs.count_conflicts(job_id, approved=True) == 1
+
+    result = jobs.get_result(_wait(jobs.submit_import(new_suppliers, job_id))['id'])
+    assert (result['inserted'], result['updated']) == (0, 1)
+    suppliers = db.get_suppliers(10, 0)[0].set_index('raison_sociale')
+    assert suppliers.loc["Alpha SA", 'id_oracle'] == "555"
+    assert suppliers.loc["Beta SA", 'adresse'] == "Rue 2"
+    assert (suppliers.loc["Gamma SA", 'id_oracle'], suppliers.loc["Gamma SA", 'adresse']) == ("222", "Rue 3")
@@ -0,0 +1,70 @@
+import os
+import sqlite3
+
+import pytest
+
+
+def test_new_database_uses_incremental_vacuum(db):
+    assert sqlite3.connect(db.DB_FILE).execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    assert db.maintenance_stats()['incremental_vacuum']
+
+
+def test_existing_database_is_only_converted_on_request(db, tmp_path, monkeypatch):
+    path = str(tmp_path / "ancienne.db")
+    sqlite3.connect(path).execute("CREATE TABLE t (x)").connection.close()
+    monkeypatch.setattr(db, 'DB_FILE', path)
+    db.clear_cache()
+    db.init_db()
+    db.add_supplier({'raison_sociale': "Delta SA", 'id_oracle': '', 'est_prospect': 0, 'adresse': '', 'pays_canton': '',
+                     'contacts': '', 'tags': '', 'statut_audit': '', 'commentaires': ''})
+    assert not db.maintenance_stats()['incremental_vacuum']
+
+    assert 'vacuum' not in db.run_maintenance(force=True)
+    assert not db.maintenance_stats()['incremental_vacuum']
+
+    db.convert_to_incremental_vacuum()
+    assert db.maintenance_stats()['incremental_vacuum']
+
+
+def test_list_backups_ignores_foreign_files(db):
+    path = db.backup_database()
+    directory = os.path.dirname(path)
+    open(os.path.join(directory, "copie.db"), 'w').close()
+
+    backups = db.list_backups()
+    assert list(backups['nom']) == [os.path.basename(path)]
+    assert list(backups['motif']) == ['manuelle']
+    db.backup_database()
+    assert os.path.exists(os.path.join(directory, "copie.db"))
+
+
+def test_backup_does_not_invalidate_read_cache(db):
+    db.add_supplier({'raison_sociale': "Epsilon SA", 'id_oracle': '', 'est_prospect': 0, 'adresse': '', 'pays_canton': '',
+                     'contacts': '', 'tags': '', 'statut_audit': '', 'commentaires': ''})
+    version = db.data_version()
+    db.backup_database()
+    assert db.data_version() == version
+
+    tasks = db.maintenance_stats()['tasks']
+    assert tasks.loc[tasks['tache'] == 'sauvegarde', 'seq'].tolist() == [1]
+    assert 'sauvegarde' not in db.run_maintenance()
+
+
+
+def test_failed_backup_leaves_no_temporary_file(db, monkeypatch):
+    def full_disk(seconds):
+        raise sqlite3.OperationalError("database or disk is full")
+
+    monkeypatch.setattr(db.time, 'sleep', full_disk)
+    with pytest.raises(sqlite3.OperationalError):
+        db.backup_database()
+    assert os.listdir(db._backup_dir()) == []
+
+
+def test_restore_rejects_files_that_are_not_backups(db):
+    path = db.backup_database()
+    directory = os.path.dirname(path)
+    for name in ("copie.db", os.path.basename(path) + ".tmp"):
+        open(os.path.join(directory, name), 'w').close()
+        with pytest.raises(ValueError):
+            db.restore_backup(name)
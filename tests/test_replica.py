@@ -0,0 +1,44 @@
+import sqlite3
+
+import pytest
+
+
+def _supplier(name):
+    return {'raison_sociale': name, 'id_oracle': '', 'est_prospect': 0, 'adresse': '', 'pays_canton': '',
+            'contacts': '', 'tags': '', 'statut_audit': '', 'commentaires': ''}
+
+
+@pytest.fixture
+def replica_db(db, monkeypatch):
+    """Base du test lue par la réplique en mémoire."""
+    monkeypatch.setattr(db, 'READ_REPLICA', True)
+    yield db
+
+
+def test_replica_sees_committed_writes(replica_db):
+    db = replica_db
+    assert db.count_suppliers() == 0
+    refreshes = db.replica_stats()['refreshes']
+
+    db.add_supplier(_supplier("Alpha SA"))
+    assert db.count_suppliers() == 1
+    assert db.search_suppliers("Alpha")[0]['raison_sociale'].tolist() == ["Alpha SA"]
+    assert db.replica_stats()['refreshes'] > refreshes
+
+
+def test_replica_is_not_refreshed_without_writes(replica_db):
+    db = replica_db
+    db.add_supplier(_supplier("Beta SA"))
+    db.count_suppliers()
+    refreshes = db.replica_stats()['refreshes']
+
+    db.clear_cache()
+    assert db.count_suppliers() == 1
+    assert db.replica_stats()['refreshes'] == refreshes
+
+
+def test_replica_connections_are_read_only(replica_db):
+    db = replica_db
+    with db.read_connection() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM suppliers")
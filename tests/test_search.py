@@ -0,0 +1,43 @@
+import pandas as pd
+
+
+def _import_names(db, names):
+    frame = pd.DataFrame({'Raison Sociale': names, 'Numéro de fournisseur': [''] * len(names), 'Adresse': [''] * len(names)})
+    new_suppliers, conflicts = db.analyze_import_data(frame, fuzzy=False)
+    db.execute_import(new_suppliers, conflicts)
+
+
+def test_short_word_narrows_multi_word_search(db):
+    _import_names(db, [f"Fournisseur {i} SA" for i in range(1, 25)])
+    expected = {"Fournisseur 1 SA"} | {f"Fournisseur {i} SA" for i in range(10, 20)}
+
+    df, total = db.search_suppliers("Fournisseur 1", limit=100)
+    assert set(df['raison_sociale']) == expected
+    assert total == len(expected)
+    assert db.count_suppliers("Fournisseur 1") == len(expected)
+
+    df, _ = db.search_suppliers("fournisseur 10", limit=100)
+    assert list(df['raison_sociale']) == ["Fournisseur 10 SA"]
+
+
+def test_long_words_match_in_any_order(db):
+    _import_names(db, ["Société Générale", "Générale des Eaux"])
+    df, _ = db.search_suppliers("generale societe", limit=10)
+    assert list(df['raison_sociale']) == ["Société Générale"]
+
+
+def test_short_search_is_an_indexed_prefix_match(db):
+    _import_names(db, ["Abc Conseil", "Ábaco SA", "Le Abri", "Zèbre AB"])
+    df, total = db.search_suppliers("ab", limit=10)
+    assert set(df['raison_sociale']) == {"Abc Conseil", "Ábaco SA"}
+    assert total == db.count_suppliers("ab") == 2
+
+    conditions, params = db._filter_conditions("ab")
+    plan = db.explain_query_plan(f"SELECT id FROM suppliers{db._where(conditions)}", params)
+    assert any('idx_suppliers_cle' in step for step in plan)
+
+
+def test_short_suggestions_are_prefixes_only(db):
+    _import_names(db, ["Abc Conseil", "Le Abri"])
+    assert list(db.suggest_suppliers("ab")['raison_sociale']) == ["Abc Conseil"]
+    assert set(db.suggest_suppliers("abr")['raison_sociale']) == {"Le Abri"}
@@ -0,0 +1,41 @@
+import threading
+
+import pytest
+
+
+def _supplier(name):
+    return {'raison_sociale': name, 'id_oracle': '', 'est_prospect': 0, 'adresse': '', 'pays_canton': '',
+            'contacts': '', 'tags': '', 'statut_audit': '', 'commentaires': ''}
+
+
+def test_writes_from_several_threads_all_land(db):
+    operations = db.write_stats()['operations']
+    threads = [threading.Thread(target=lambda t=t: [db.add_supplier(_supplier(f"Fournisseur {t}-{i}")) for i in range(20)])
+               for t in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert db.count_suppliers() == 160
+    stats = db.write_stats()
+    assert stats['operations'] - operations == 160
+    assert stats['queued'] == 0
+
+
+def test_failed_write_does_not_cancel_the_rest_of_the_batch(db):
+    def insert(conn, name):
+        conn.execute("INSERT INTO suppliers (raison_sociale) VALUES (?)", (name,))
+        return name
+
+    def fail(conn):
+        conn.execute("INSERT INTO suppliers (raison_sociale) VALUES ('Annulé SA')")
+        raise ValueError("refusé")
+
+    futures = [db.submit_write(insert, "Alpha SA"), db.submit_write(fail), db.submit_write(insert, "Beta SA")]
+    assert futures[0].result() == "Alpha SA"
+    with pytest.raises(ValueError):
+        futures[1].result()
+    assert futures[2].result() == "Beta SA"
+    assert db.count_suppliers() == 2
+    assert db.count_suppliers("Annulé") == 0